@@ -1,16 +1,54 @@
 import os
+import time
 import tkinter as tk
-from tkinter import ttk
-
-from storage import BookStorage
+from tkinter import messagebox, ttk
+
+from config import load_config, create_storage
+from catalog import BookCatalog, CatalogChange
+from history import History, OrderChange, RecordChange, SnapshotChange
+from instrumentation import instruments
+from remote import RemoteStorage
+from tasks import TaskRunner
+from timing import StartupReport
 from pages.book_list_page import BookListPage
 from pages.book_edit_page import BookEditPage
 from pages.book_sort_page import BookSortPage
+from pages.diagnostics_page import DiagnosticsPage
+from sorting import format_spec, normalize_spec
+
+# widgets with their own Ctrl+Z: undo / redo keys typed into them stay theirs
+TEXT_WIDGETS = (tk.Entry, tk.Text, tk.Spinbox)
 
 
 class MainApp(tk.Tk):
-    def __init__(self):
+    # page key -> class; each page is built the first time it is shown
+    PAGE_CLASSES = {
+        "book_list": BookListPage,
+        "edit_books": BookEditPage,
+        "sort_books": BookSortPage,
+        # not in the sidebar: opened from the Debug menu
+        "diagnostics": DiagnosticsPage,
+    }
+
+    # storage methods timed while instrumentation is on
+    INSTRUMENTED_STORAGE_CALLS = (
+        "load_books", "save_books", "apply_changes", "import_from_csv", "import_csv_with_backup",
+        "merge_csv", "import_books", "backup_to_path", "_backup_to_store",
+        "restore_backup", "export_csv", "restore_defaults", "compact",
+        "load_pinned", "sort_catalog",
+    )
+
+    # page methods timed while instrumentation is on (the _render ones draw after a reload)
+    INSTRUMENTED_PAGE_CALLS = ("refresh", "_render", "_render_filtered")
+
+    # after the input event that ends a profiled action, wait this long (plus any running task)
+    PROFILE_SETTLE_MS = 300
+
+    def __init__(self, started=None):
+        # started: perf_counter() from before the imports (see main.py)
+        self.startup = StartupReport(started)
         super().__init__()
+        self.startup.mark("tk")
 
         # =========================
         # App Title / Window
@@ -58,10 +96,45 @@ class MainApp(tk.Tk):
         # Storage
         # =========================
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        data_path = os.path.join(base_dir, "data", "books.json")
 
-        self.storage = BookStorage(data_path)
-        self.books = self.storage.load_books()
+        # backend (json / journal / sqlite) comes from config.json or LIBRARY_STORAGE
+        self.settings = load_config(base_dir)
+        instruments.enabled = self.settings["instrument"]
+        self.storage = create_storage(self.settings)
+        instruments.wrap_methods(self.storage, self.INSTRUMENTED_STORAGE_CALLS, "storage.")
+        self.remote = isinstance(self.storage, RemoteStorage)
+        self.startup.mark("storage")
+
+        # a binary snapshot is only mapped here, so the first screen does not wait for a full load
+        self._loaded_stamp = self.storage.stamp()
+        if self.remote:
+            # a server's list arrives in the background (see the reload_books at the end)
+            books = ()
+            self.catalog = BookCatalog()
+        else:
+            books = self.storage.load_books()
+            self.catalog = BookCatalog(books, lazy=True)
+        # page listeners outlive catalog swaps (see on_catalog_change)
+        self._catalog_listeners = []
+        self.catalog.subscribe(self._relay_catalog_change)
+        self.startup.mark("catalog")
+        self.startup.info.update(storage=self.settings["storage"], rows=len(self.catalog), lazy=self.catalog.lazy)
+
+        # bumped whenever a freshly loaded catalog replaces self.catalog
+        self._catalog_generation = 0
+
+        # storage I/O runs here, results come back on the Tk thread
+        self.tasks = TaskRunner(self)
+        self.tasks.on_busy_change(self._on_busy)
+        self._pending_writes = 0
+        self._load_waiters = []
+        # set when storage merged in another instance's changes we have not loaded yet
+        self._behind = False
+
+        # Ctrl+Z / Ctrl+Shift+Z: inverse of each edit, sort and bulk replace, capped by memory
+        self.history = History(self.settings["undo_memory_mb"] * 1024 * 1024)
+        # set while an undone / redone snapshot is being restored
+        self._restoring = False
 
         # =========================
         # ttk Theme (macOS)
@@ -97,16 +170,26 @@ class MainApp(tk.Tk):
         # Pages
         # =========================
         self.pages = {}
-        self._build_pages()
 
         # =========================
         # Sidebar Nav
         # =========================
         self.active_page = None
         self._build_sidebar()
+        self._build_menus()
+        self.startup.mark("window")
 
         # default
         self.show_page("book_list")
+        self.startup.mark("first_page")
+
+        # the mapped snapshot gets its full records and indexes after the first screen
+        self._warming = self.catalog.lazy
+        if self._warming:
+            self._warm_catalog(books)
+        if self.remote:
+            self.reload_books(on_done=self._refresh_active_page)
+        self.after_idle(self._startup_mark, "first_idle")
 
     # -------------------------
     # Styles
@@ -161,13 +244,16 @@ class MainApp(tk.Tk):
     # -------------------------
     # Pages
     # -------------------------
-    def _build_pages(self):
-        self.pages["book_list"] = BookListPage(self.container, self)
-        self.pages["edit_books"] = BookEditPage(self.container, self)
-        self.pages["sort_books"] = BookSortPage(self.container, self)
-
-        for page in self.pages.values():
+    def _get_page(self, key: str):
+        page = self.pages.get(key)
+        if page is None and key in self.PAGE_CLASSES:
+            page = self.PAGE_CLASSES[key](self.container, self)
             page.grid(row=0, column=0, sticky="nsew")
+            instruments.wrap_methods(page, self.INSTRUMENTED_PAGE_CALLS, f"page.{key}.")
+            self.pages[key] = page
+            if hasattr(page, "set_busy"):
+                page.set_busy(self.tasks.busy)
+        return page
 
     # -------------------------
     # Sidebar
@@ -239,6 +325,84 @@ class MainApp(tk.Tk):
         exit_lbl.bind("<Leave>", lambda e: exit_lbl.config(bg=self.SIDEBAR_BG))
         exit_lbl.bind("<Button-1>", lambda e: self.destroy())
 
+    # -------------------------
+    # Menus / profiling
+    # -------------------------
+    def _build_menus(self):
+        self.instrument_var = tk.BooleanVar(value=instruments.enabled)
+        self.profile_armed = False
+        self._profile_label = ""
+
+        menubar = tk.Menu(self)
+        # entries 0 and 1 are relabelled with the step they would take each time the menu opens
+        self.edit_menu = tk.Menu(menubar, tearoff=0, postcommand=self._update_edit_menu)
+        self.edit_menu.add_command(label="Undo", accelerator="Ctrl+Z", command=self.undo)
+        self.edit_menu.add_command(label="Redo", accelerator="Ctrl+Shift+Z", command=self.redo)
+        menubar.add_cascade(label="Edit", menu=self.edit_menu)
+
+        debug = tk.Menu(menubar, tearoff=0)
+        debug.add_checkbutton(label="Record Timings", variable=self.instrument_var, command=self.toggle_instruments)
+        debug.add_command(label="Diagnostics", command=lambda: self.show_page("diagnostics"))
+        debug.add_command(label="Profile Next Action", command=self.profile_next_action)
+        menubar.add_cascade(label="Debug", menu=debug)
+        self.configure(menu=menubar)
+
+        # a profiled action starts with a key / button press and ends after its release
+        self.bind_all("<KeyPress>", self._profile_input_start, add="+")
+        self.bind_all("<ButtonPress>", self._profile_input_start, add="+")
+        self.bind_all("<KeyRelease>", self._profile_input_end, add="+")
+        self.bind_all("<ButtonRelease>", self._profile_input_end, add="+")
+
+        # <Control-Z> is what Caps Lock + Ctrl+Z sends, so it is undo too
+        self.bind_all("<Control-z>", self.undo)
+        self.bind_all("<Control-Z>", self.undo)
+        self.bind_all("<Control-Shift-Z>", self.redo)
+        self.bind_all("<Control-Shift-z>", self.redo)
+        self.bind_all("<Control-y>", self.redo)
+        self.bind_all("<Control-Y>", self.redo)
+
+    def _update_edit_menu(self):
+        for index, verb, label in ((0, "Undo", self.history.undo_label), (1, "Redo", self.history.redo_label)):
+            self.edit_menu.entryconfigure(
+                index,
+                label=f"{verb} {label}" if label else verb,
+                state="normal" if label and not self._restoring else "disabled",
+            )
+
+    def toggle_instruments(self):
+        instruments.enabled = bool(self.instrument_var.get())
+
+    def profile_next_action(self):
+        """Run cProfile around the next keystroke or click and whatever it triggers."""
+        self.profile_armed = True
+
+    def _profile_input_start(self, event):
+        if not self.profile_armed or instruments.profiling:
+            return
+        self.profile_armed = False
+        kind = getattr(event.type, "name", str(event.type))
+        detail = event.keysym if kind == "KeyPress" else f"button {event.num}"
+        self._profile_label = f"{kind} ({detail}) on {event.widget}"
+        instruments.start_profile()
+
+    def _profile_input_end(self, event):
+        if instruments.profiling:
+            self.after(self.PROFILE_SETTLE_MS, self._finish_profile)
+
+    def _finish_profile(self):
+        if not instruments.profiling:
+            return
+        if self.tasks.busy:
+            # the action started background work: its on_done is part of the action too
+            self.after(50, self._finish_profile)
+            return
+        dump_dir = os.path.dirname(self.settings["json_path"])
+        dump = os.path.join(dump_dir, time.strftime("profile-%Y%m%d-%H%M%S.prof"))
+        instruments.stop_profile(self._profile_label, dump)
+        page = self.pages.get("diagnostics")
+        if page is not None:
+            page.refresh()
+
     def _nav_hover(self, key: str, enter: bool):
         if key == self.active_page:
             return
@@ -259,22 +423,282 @@ class MainApp(tk.Tk):
     # Navigation
     # -------------------------
     def show_page(self, key: str):
-        page = self.pages.get(key)
+        page = self._get_page(key)
         if not page:
             return
 
         self._set_active_nav(key)
         page.tkraise()
 
-        # Always refresh when showing a page
-        if hasattr(page, "refresh") and callable(getattr(page, "refresh")):
-            page.refresh()
+        # refresh only if the catalog (or storage) moved on since this page last rendered
+        stale = getattr(page, "data_version_seen", None) != self.data_version
+        if stale or self.storage.stamp() != self._loaded_stamp:
+            if hasattr(page, "refresh") and callable(getattr(page, "refresh")):
+                page.refresh()
+
+    # -------------------------
+    # Background tasks
+    # -------------------------
+    def run_task(self, fn, *args, on_done=None, on_error=None, channel=None, ordered=False):
+        """
+        Run fn(*args) on the I/O pool; on_done(result) / on_error(exc) run on the Tk thread.
+        ordered=True queues it behind pending writes (e.g. an export that must see them).
+        """
+        return self.tasks.submit(fn, *args, on_done=on_done, on_error=on_error, channel=channel, write=ordered)
+
+    def run_write(self, fn, *args, on_done=None, on_error=None, in_sync=True):
+        """
+        Run a storage write in order with the other writes.
+        in_sync=True means self.catalog already shows what is being written
+        (edits, sort, save), so no reload is needed afterwards. Imports and
+        restores pass False and the next reload_books picks the result up.
+        Reloads are held back while a write is in flight.
+        A save that had to merge another instance's changes (the storage
+        returns True) triggers a reload once the writes are done.
+        """
+        self._pending_writes += 1
+
+        def finished(merged=False):
+            self._pending_writes -= 1
+            self._behind = self._behind or merged
+            if in_sync and self._pending_writes == 0:
+                if self._behind:
+                    self.reload_books()
+                else:
+                    self._loaded_stamp = self.storage.stamp()
+
+        def done(result):
+            finished(in_sync and result is True)
+            if on_done:
+                on_done(result)
+
+        def failed(error):
+            finished()
+            if on_error:
+                on_error(error)
+            else:
+                self.report_callback_exception(type(error), error, error.__traceback__)
+
+        return self.tasks.submit(fn, *args, on_done=done, on_error=failed, write=True)
+
+    def _on_busy(self, busy):
+        self.configure(cursor="watch" if busy else "")
+        for page in self.pages.values():
+            if hasattr(page, "set_busy"):
+                page.set_busy(busy)
+
+    def destroy(self):
+        # pending writes land before the window goes away
+        self.tasks.shutdown()
+        super().destroy()
 
     # -------------------------
     # Data Helpers
     # -------------------------
-    def reload_books(self):
-        self.books = self.storage.load_books()
+    def reload_books(self, on_done=None):
+        """
+        Bring self.catalog up to date with storage, then call on_done() on the Tk thread.
+        Loading and indexing run in the background; only the newest load
+        is installed, and never over local edits made while it ran.
+        """
+        if on_done:
+            self._load_waiters.append(on_done)
+
+        stamp = self.storage.stamp()
+        # None: a catalog server not heard from yet, so there is no telling: load
+        if self._pending_writes or (stamp is not None and stamp == self._loaded_stamp):
+            # our catalog is already as new as (or newer than) storage
+            self.tasks.invalidate("load")
+            self._flush_load_waiters()
+            return
+
+        version = self.data_version
+
+        def load():
+            if self.remote:
+                # the pages all come from one server version: that is the stamp this catalog has
+                books, pinned = self.storage.load_pinned()
+                return BookCatalog(books), pinned
+            return BookCatalog(self.storage.load_books()), stamp
+
+        def loaded(result):
+            catalog, loaded_stamp = result
+            if self.data_version == version:
+                self._loaded_stamp = loaded_stamp
+                self._behind = False
+                self._install_catalog(catalog)
+            else:
+                # local edits won; what this load brought in comes back after they are saved
+                self._behind = True
+            self._flush_load_waiters()
+
+        self.run_task(load, on_done=loaded, channel="load")
+
+    def _warm_catalog(self, books):
+        """Index a lazily mapped catalog in the background and swap it in if nothing changed meanwhile."""
+        version = self.data_version
+
+        def loaded(catalog):
+            if self.data_version == version:
+                self._install_catalog(catalog)
+            self._warming = False
+            self._startup_mark("catalog_indexed")
+
+        self.run_task(BookCatalog, books, on_done=loaded, channel="warm")
+
+    def _install_catalog(self, catalog):
+        self.catalog.unsubscribe(self._relay_catalog_change)
+        self.catalog = catalog
+        self._catalog_generation += 1
+        catalog.subscribe(self._relay_catalog_change)
+        self._relay_catalog_change(CatalogChange("reset"))
+
+    def on_catalog_change(self, callback):
+        """callback(CatalogChange) for every change to self.catalog, across reloads ("reset" on a swap)."""
+        self._catalog_listeners.append(callback)
+
+    def _relay_catalog_change(self, change):
+        for callback in self._catalog_listeners:
+            callback(change)
+
+    def _startup_mark(self, name):
+        self.startup.mark(name)
+        # report once the window is idle and the catalog fully indexed
+        if "first_idle" in self.startup.marks and not self._warming:
+            target = self.settings.get("startup_report")
+            if target:
+                self.startup.write(target)
+
+    @property
+    def data_version(self):
+        """Changes whenever the catalog contents change (reload, edit, sort)."""
+        return (self._catalog_generation, self.catalog.version)
+
+    def _flush_load_waiters(self):
+        waiters, self._load_waiters = self._load_waiters, []
+        for callback in waiters:
+            callback()
+
+    def save_books(self, on_done=None):
+        if self.remote:
+            # every edit already went to the server as it was made; a full
+            # PUT would overwrite what other desks changed since
+            if on_done:
+                self.after_idle(on_done, None)
+            return
+        self.run_write(self.storage.save_books, self.catalog.to_list(), on_done=on_done)
+
+    def upsert_book(self, book):
+        before = self.catalog.get(book.no)
+        self.catalog.upsert(book)
+        self.history.record(RecordChange(f"Edit {book.no}", [(book.no, before, book, None)]))
+        # record edits only: the JSON storage replays them onto its cached list off the Tk thread
+        self.run_write(self.storage.apply_changes, None, [book], ())
+
+    def apply_batch(self, upserts=(), deletes=(), record=True):
+        """
+        Many upserts / deletes as one catalog update and a single storage commit.
+        record=False leaves it out of the undo history (undo / redo themselves).
+        """
+        upserts, deletes = list(upserts), list(deletes)
+        if record:
+            get, next_no = self.catalog.get, self.catalog.next_no
+            changes = [(b.no, get(b.no), b, None) for b in upserts]
+            # a deleted record keeps its successor so undo can put it back in place
+            gone = [(no, get(no), next_no(no)) for no in deletes]
+            changes += [(no, before, None, following) for no, before, following in gone if before is not None]
+        self.catalog.apply(upserts, deletes)
+        if record and changes:
+            label = f"Edit {len(changes):,} books" if len(changes) > 1 else f"Edit {changes[0][0]}"
+            self.history.record(RecordChange(label, changes))
+        self.run_write(self.storage.apply_changes, None, upserts, deletes)
+
+    def delete_book(self, no):
+        following = self.catalog.next_no(no)
+        before = self.catalog.delete(no)
+        if before is None:
+            return
+        self.history.record(RecordChange(f"Delete {no}", [(no, before, None, following)]))
+        self.run_write(self.storage.apply_changes, None, (), [no])
+
+    def sort_catalog(self, spec):
+        """Reorder the catalog (and storage) by spec; the order before is kept for undo."""
+        if self.remote:
+            # the server sorts its copy the same way; putting an old order back
+            # would mean overwriting the shared list, so this is not undoable
+            self.catalog.sort_by(spec)
+            self.run_write(self.storage.sort_catalog, normalize_spec(spec))
+            return
+        order = [b.no for b in self.catalog]
+        self.catalog.sort_by(spec)
+        self.history.record(OrderChange(f"Sort by {format_spec(spec)}", order))
+        self.save_books()
+
+    def record_snapshot(self, label, backup):
+        """
+        Make a bulk replace (import, merge, default restore) undoable through
+        the backup storage took just before it. No-op without a backup.
+        """
+        if backup and not self.remote:
+            self.history.record(SnapshotChange(label, backup))
+
+    # -------------------------
+    # Undo / redo
+    # -------------------------
+    def undo(self, event=None):
+        if event is not None and isinstance(event.widget, TEXT_WIDGETS):
+            return None
+        if not self._restoring:
+            self._apply_history(self.history.undo(), "Undo")
+        return "break"
+
+    def redo(self, event=None):
+        if event is not None and isinstance(event.widget, TEXT_WIDGETS):
+            return None
+        if not self._restoring:
+            self._apply_history(self.history.redo(), "Redo")
+        return "break"
+
+    def _apply_history(self, entry, verb):
+        # the entry holds the other side of its change; applying it swaps the two
+        if entry is None:
+            return
+        if isinstance(entry, RecordChange):
+            upserts, deletes, placed = entry.swap()
+            if placed and not self.remote:
+                # records coming back go where they were, which apply_changes
+                # (appending at the end) cannot do: save the whole list instead
+                self.catalog.apply(upserts, deletes)
+                self.catalog.insert_before(placed)
+                self.save_books(on_done=self._refresh_active_page)
+            else:
+                self.apply_batch(upserts + [book for book, _following in placed], deletes, record=False)
+        elif isinstance(entry, OrderChange):
+            self.catalog.reorder(entry.swap([b.no for b in self.catalog]))
+            self.history.resize(entry)
+            self.save_books(on_done=self._refresh_active_page)
+        else:
+            self._restore_snapshot(entry, verb)
+
+    def _refresh_active_page(self, _result=None):
+        # pages only notice a reset when shown again; redraw the one on screen now
+        page = self.pages.get(self.active_page)
+        if page is not None and hasattr(page, "refresh"):
+            page.refresh()
+
+    def _restore_snapshot(self, entry, verb):
+        self._restoring = True
+
+        def done(backup_used):
+            # the backup restore_backup took of the state just replaced is the way back
+            self._restoring = False
+            entry.backup = backup_used
+            self.reload_books(on_done=self._refresh_active_page)
+
+        def failed(error):
+            # e.g. the backup was pruned meanwhile: this step (and those before it) are gone
+            self._restoring = False
+            self.history.clear()
+            messagebox.showerror(f"{verb} Error", f"Could not {verb.lower()} {entry.label}:\n\n{error}")
 
-    def save_books(self):
-        self.storage.save_books(self.books)
\ No newline at end of file
+        self.run_write(self.storage.restore_backup, entry.backup, on_done=done, on_error=failed, in_sync=False)
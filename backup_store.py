@@ -0,0 +1,240 @@
+# backup_store.py
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import time
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Set
+
+from filelock import FileLock
+
+# Deduplicated backups of books.json (or any byte stream).
+#
+#   store = BackupStore("data/backups")
+#   manifest = store.add(blocks, reason="import_csv")  # data/backups/manifests/<id>.json
+#   store.restore(manifest, "restored.json")
+#
+# The bytes are cut into chunks at points chosen by their content: before
+# a record ("\n    {" in the books.json layout) whose first bytes hash to
+# 0 mod CUT_EVERY, once the chunk is MIN_CHUNK long (MAX_CHUNK at most, so
+# other data still splits). An edit changes only the chunk around it; the
+# rest hash as before and are not stored again. Each chunk is stored once
+# under chunks/<2 hex>/<sha256>[.gz], and a backup is a manifest listing its
+# chunks in order, so frequent backups of a large, slowly changing catalog
+# cost only the changed bytes. Adding and pruning hold
+# store.lock, so a prune never drops a chunk a new backup is still linking to.
+
+MIN_CHUNK = 16 * 1024
+MAX_CHUNK = 256 * 1024
+CUT_EVERY = 64
+RECORD_MARK = b"\n    {"
+# bytes of a record that decide whether a chunk ends before it
+CUT_WINDOW = 64
+
+READ_BLOCK = 1024 * 1024
+
+# backups kept by default; older manifests (and chunks only they used) are pruned
+KEEP_BACKUPS = 20
+
+# gzip level for new chunks: JSON shrinks ~5x even at 1, and backups run before imports
+COMPRESS_LEVEL = 1
+
+
+def split_chunks(blocks: Iterable[bytes]) -> Iterator[bytes]:
+    """The content-defined chunks of a stream of byte blocks, in order."""
+    buf = b""
+    for block in blocks:
+        buf = buf + block if buf else block
+        start = 0
+        while True:
+            cut = _find_cut(buf, start)
+            if cut < 0:
+                break
+            yield buf[start:cut]
+            start = cut
+        buf = buf[start:]
+    if buf:
+        yield buf
+
+
+def _find_cut(buf: bytes, start: int) -> int:
+    """End of the chunk beginning at start, or -1 until buf holds enough to tell."""
+    pos = start + MIN_CHUNK
+    limit = start + MAX_CHUNK
+    while True:
+        mark = buf.find(RECORD_MARK, pos, limit)
+        if mark < 0:
+            return limit if len(buf) >= limit + len(RECORD_MARK) else -1
+        window = buf[mark + 1:mark + 1 + CUT_WINDOW]
+        if len(window) < CUT_WINDOW:
+            return -1
+        if zlib.crc32(window) % CUT_EVERY == 0:
+            return mark + 1  # the newline stays with the chunk before
+        pos = mark + 1
+
+
+class BackupStore:
+    def __init__(self, root: str | Path, compress: bool = True, keep: int = KEEP_BACKUPS):
+        self.root = Path(root)
+        self.compress = compress
+        self.keep = keep
+        self.lock = FileLock(self.root / "store.lock")
+
+    # ---------- writing ----------
+    def add(self, blocks: Iterable[bytes], reason: str = "backup", source: str = "") -> str:
+        """Store one backup of the bytes in blocks; returns the path of its manifest."""
+        digests: List[str] = []
+        whole = hashlib.sha256()
+        size = 0
+        new_bytes = 0
+
+        with self.lock.exclusive():
+            for chunk in split_chunks(blocks):
+                digest = hashlib.sha256(chunk).hexdigest()
+                whole.update(chunk)
+                size += len(chunk)
+                if self._put(digest, chunk):
+                    new_bytes += len(chunk)
+                digests.append(digest)
+
+            created = time.time()
+            stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(created))
+            path = self.root / "manifests" / f"{stamp}-{reason}-{uuid.uuid4().hex[:8]}.json"
+            manifest = {
+                "created": created,
+                "reason": reason,
+                "source": source,
+                "size": size,
+                "sha256": whole.hexdigest(),
+                "new_bytes": new_bytes,
+                "chunks": digests,
+            }
+            _write_atomic(path, json.dumps(manifest, indent=2).encode("utf-8"))
+
+            if self.keep:
+                self.prune(self.keep)
+        return str(path)
+
+    def _put(self, digest: str, chunk: bytes) -> bool:
+        """Store a chunk unless it is already there; True if it was new."""
+        plain = self._chunk_path(digest)
+        packed = plain.with_name(plain.name + ".gz")
+        if plain.exists() or packed.exists():
+            return False
+        if self.compress:
+            _write_atomic(packed, gzip.compress(chunk, COMPRESS_LEVEL, mtime=0))
+        else:
+            _write_atomic(plain, chunk)
+        return True
+
+    def _chunk_path(self, digest: str) -> Path:
+        return self.root / "chunks" / digest[:2] / digest
+
+    # ---------- reading ----------
+    def manifest_path(self, ref: str | Path) -> Path:
+        """A manifest given by path or by file name (with or without .json)."""
+        path = Path(ref)
+        if path.exists():
+            return path
+        name = path.name if path.name.endswith(".json") else path.name + ".json"
+        path = self.root / "manifests" / name
+        if not path.exists():
+            raise FileNotFoundError(f"No backup '{ref}' in {self.root}")
+        return path
+
+    def read_manifest(self, ref: str | Path) -> Dict[str, Any]:
+        with self.manifest_path(ref).open("r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def backups(self) -> List[Dict[str, Any]]:
+        """Manifests without their chunk lists, newest first; "path" says where each one is."""
+        found = []
+        for path in (self.root / "manifests").glob("*.json"):
+            try:
+                m = self.read_manifest(path)
+            except (OSError, ValueError):
+                continue
+            m.pop("chunks", None)
+            m["path"] = str(path)
+            found.append(m)
+        found.sort(key=lambda m: m.get("created", 0), reverse=True)
+        return found
+
+    def iter_backup(self, ref: str | Path) -> Iterator[bytes]:
+        """The backed-up bytes, one chunk at a time, each checked against its hash."""
+        manifest = self.read_manifest(ref)
+        whole = hashlib.sha256()
+        for digest in manifest["chunks"]:
+            chunk = self._get(digest)
+            if hashlib.sha256(chunk).hexdigest() != digest:
+                raise ValueError(f"Backup chunk {digest} is damaged.")
+            whole.update(chunk)
+            yield chunk
+        if whole.hexdigest() != manifest["sha256"]:
+            raise ValueError(f"Backup {ref} does not reassemble to what was stored.")
+
+    def _get(self, digest: str) -> bytes:
+        plain = self._chunk_path(digest)
+        try:
+            with plain.with_name(plain.name + ".gz").open("rb") as f:
+                return gzip.decompress(f.read())
+        except FileNotFoundError:
+            pass
+        except (OSError, EOFError, zlib.error):
+            raise ValueError(f"Backup chunk {digest} is damaged.") from None
+        try:
+            with plain.open("rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            raise ValueError(f"Backup chunk {digest} is missing.") from None
+
+    def restore(self, ref: str | Path, dest: str | Path) -> str:
+        """Reassemble a backup into dest (a temp file renamed once complete and checked)."""
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=dest.name + ".", suffix=".tmp", dir=dest.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for chunk in self.iter_backup(ref):
+                    f.write(chunk)
+            os.replace(tmp, dest)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return str(dest)
+
+    # ---------- pruning ----------
+    def prune(self, keep: int) -> int:
+        """Drop all but the newest keep backups and the chunks nothing else uses; returns backups dropped."""
+        with self.lock.exclusive():
+            listed = self.backups()
+            old = listed[keep:]
+            for m in old:
+                os.unlink(m["path"])
+
+            if old:
+                used: Set[str] = set()
+                for m in listed[:keep]:
+                    used.update(self.read_manifest(m["path"])["chunks"])
+                for path in (self.root / "chunks").glob("*/*"):
+                    if path.name.split(".")[0] not in used:
+                        path.unlink()
+        return len(old)
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
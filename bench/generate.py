@@ -0,0 +1,190 @@
+# bench/generate.py
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import random
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+from models import FIELDS, Book
+
+# "1k" -> 1000, "5m" -> 5_000_000
+_SUFFIX = {"k": 1_000, "m": 1_000_000}
+
+GENRES = (
+    "Fiction", "Mystery", "Thriller", "Romance", "Fantasy", "Science Fiction", "Horror",
+    "Historical Fiction", "Biography", "Memoir", "History", "Science", "Philosophy",
+    "Poetry", "Drama", "Travel", "Cooking", "Art", "Religion", "Self-Help", "Business",
+    "Economics", "Politics", "Psychology", "Children", "Young Adult", "Graphic Novel",
+    "Reference", "Health", "Sports",
+)
+
+_FIRST = (
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William",
+    "Elizabeth", "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah",
+    "Charles", "Karen", "Omar", "Fatima", "Ahmed", "Leila", "Yusuf", "Amira", "Hiro", "Yuki",
+    "Chen", "Mei", "Ivan", "Olga", "Pierre", "Camille", "Hans", "Greta", "Diego", "Lucia",
+    "Kwame", "Ama", "Ravi", "Priya", "Noah", "Emma", "Liam", "Olivia", "Lucas", "Sofia",
+)
+_LAST = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez",
+    "Martinez", "Hernandez", "Lopez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson",
+    "Martin", "Lee", "Alezzi", "Haddad", "Khalil", "Nasser", "Tanaka", "Suzuki", "Wang", "Zhang",
+    "Ivanov", "Petrova", "Dubois", "Laurent", "Muller", "Schmidt", "Rossi", "Ferrari", "Silva",
+    "Santos", "Mensah", "Owusu", "Patel", "Sharma", "Kowalski", "Novak", "Andersson", "Nielsen",
+    "O'Brien", "Murphy", "Kim", "Park", "Nguyen", "Tran", "Cohen", "Levi", "Okafor", "Adeyemi",
+)
+_WORDS = (
+    "Shadow", "River", "Night", "Garden", "Silent", "Empire", "Last", "Secret", "House", "Light",
+    "Winter", "Stone", "Glass", "Road", "Memory", "Fire", "Sea", "Crown", "Forgotten", "City",
+    "Letters", "Storm", "Island", "Dream", "Iron", "Summer", "Blood", "Song", "Mountain", "Star",
+    "Hidden", "Broken", "Golden", "Wild", "Dark", "Long", "Little", "Lost", "Black", "Red",
+    "Journey", "Orchard", "Machine", "Theory", "History", "Art", "Mind", "World", "Time", "Way",
+)
+_PATTERNS = ("The {a} {b}", "{a} of the {b}", "{a} and {b}", "A {a} {b}", "{a}", "The {a} of {b}", "{a} {b}")
+
+
+def parse_size(text: str) -> int:
+    """"100k" / "1M" / "2500" -> row count."""
+    text = text.strip().lower().replace("_", "")
+    if text and text[-1] in _SUFFIX:
+        return int(float(text[:-1]) * _SUFFIX[text[-1]])
+    return int(text)
+
+
+def size_label(n: int) -> str:
+    for suffix, mult in (("m", 1_000_000), ("k", 1_000)):
+        if n >= mult and n % mult == 0:
+            return f"{n // mult}{suffix}"
+    return str(n)
+
+
+def _authors(n: int, rng: random.Random) -> List[str]:
+    # roughly one author per 8 books, like a real catalog, capped so big runs stay realistic
+    count = max(10, min(n // 8, 250_000))
+    plain = len(_FIRST) * len(_LAST)
+    names = set()
+    while len(names) < count:
+        first, last = rng.choice(_FIRST), rng.choice(_LAST)
+        if len(names) >= plain // 2:
+            # past the plain combinations: middle initials, then double-barrelled surnames
+            first += f" {rng.choice('ABCDEFGHJKLMNOPRSTW')}."
+        if len(names) >= plain * 5:
+            last += f"-{rng.choice(_LAST)}"
+        names.add(f"{first} {last}")
+    names = sorted(names)
+    rng.shuffle(names)
+    return names
+
+
+def generate_books(n: int, seed: int = 1) -> Iterator[Book]:
+    """
+    n synthetic Books, same output for the same (n, seed).
+
+    Genres follow a skewed (Zipf-like) mix of 30 values, authors a long
+    tail of about n/8 names where a few write many books, titles are
+    short word combinations (plenty of repeats), and about 1% of prices /
+    years are blank or unparsable, as in hand-maintained data.
+    """
+    rng = random.Random(seed)
+    authors = _authors(n, rng)
+    genre_weights = [1.0 / (i + 1) for i in range(len(GENRES))]
+    genre_cum = _cumulative(genre_weights)
+
+    for i in range(1, n + 1):
+        title = rng.choice(_PATTERNS).format(a=rng.choice(_WORDS), b=rng.choice(_WORDS))
+        if rng.random() < 0.1:
+            title += f" {rng.choice(('II', 'III', 'Vol. 2', 'Revised Edition'))}"
+        genre = rng.choices(GENRES, cum_weights=genre_cum)[0]
+        # skewed towards the front of the list: a few prolific authors, a long tail of one-book ones
+        author = authors[int(len(authors) * rng.random() ** 1.6)]
+
+        r = rng.random()
+        if r < 0.005:
+            price = ""
+        elif r < 0.01:
+            price = "n/a"
+        else:
+            price = f"{rng.lognormvariate(2.7, 0.5):.2f}"
+
+        r = rng.random()
+        year = "" if r < 0.01 else str(int(min(2025, max(1450, rng.gauss(1995, 25)))))
+
+        yield Book(no=str(i), title=title, genre=genre, author=author, price=price, year=year)
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total, out = 0.0, []
+    for w in weights:
+        total += w
+        out.append(total)
+    return out
+
+
+def write_json(path: str | Path, books: Iterator[Book]) -> int:
+    """Stream books into path in the books.json layout BookStorage writes. Returns the row count."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        f.write('{\n  "books": [')
+        sep = "\n"
+        for b in books:
+            f.write(sep + "    " + json.dumps(b.to_dict(), ensure_ascii=False, indent=2).replace("\n", "\n    "))
+            sep = ",\n"
+            rows += 1
+        f.write("\n  ]\n}" if rows else "]\n}")
+    os.replace(tmp, path)
+    return rows
+
+
+def write_csv(path: str | Path, books: Iterator[Book]) -> int:
+    """Stream books into path as an importable CSV (header no,title,genre,author,price,year)."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    rows = 0
+    tmp = path.with_name(path.name + ".tmp")
+    with tmp.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(FIELDS)
+        for b in books:
+            w.writerow(b.values())
+            rows += 1
+    os.replace(tmp, path)
+    return rows
+
+
+def ensure_catalog(workdir: str | Path, n: int, seed: int = 1) -> tuple[Path, Path]:
+    """
+    books_<size>_<seed>.json and .csv in workdir, generated only if missing,
+    so repeated runs (and the 1M / 5M sizes) reuse the same files.
+    """
+    workdir = Path(workdir)
+    stem = f"books_{size_label(n)}_{seed}"
+    json_path = workdir / f"{stem}.json"
+    csv_path = workdir / f"{stem}.csv"
+    if not json_path.exists():
+        write_json(json_path, generate_books(n, seed))
+    if not csv_path.exists():
+        write_csv(csv_path, generate_books(n, seed))
+    return json_path, csv_path
+
+
+def main(argv: List[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description="Write synthetic catalogs (books.json + CSV).")
+    parser.add_argument("sizes", nargs="+", help="row counts, e.g. 1k 100k 1m 5m")
+    parser.add_argument("--out", default="bench/data", help="output directory (default: bench/data)")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    for size in args.sizes:
+        json_path, csv_path = ensure_catalog(args.out, parse_size(size), args.seed)
+        print(f"{json_path}  {csv_path}")
+
+
+if __name__ == "__main__":
+    main()
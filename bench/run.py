@@ -0,0 +1,333 @@
+# bench/run.py
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from bench.generate import ensure_catalog, parse_size, size_label
+from catalog import BookCatalog
+from config import create_storage
+from models import FIELDS, Book
+from search_index import SEARCH_LIMIT
+from sorting import parse_spec
+
+DEFAULT_SIZES = "1k,100k"
+DEFAULT_BASELINE = Path(__file__).with_name("baseline.json")
+
+# Search-box queries: broad, selective, numeric, shorter than a trigram
+QUERIES = ("the", "golden orchard", "1999", "sc")
+
+# Sort page orders: one column (SortIndex walk) and a "Then by" spec (sort_books)
+SORT_SPECS = ("title", "price desc", "genre, author, year desc")
+
+# a timing only counts as a regression when it is this much slower in absolute terms too
+MIN_DELTA = 0.005
+
+
+def _timed(fn: Callable[[], Any], repeat: int = 1, setup: Optional[Callable[[], Any]] = None) -> float:
+    """Best of `repeat` runs of fn(), in seconds. setup() runs untimed before each."""
+    best = float("inf")
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return round(best, 6)
+
+
+# ---------- Treeview ----------
+class _StubTree:
+    """Just enough of ttk.Treeview for VirtualTable, keeping the items in a list."""
+
+    def __init__(self):
+        self.items: List[str] = []
+        self.values: Dict[str, Tuple] = {}
+        self._auto = 0
+
+    def insert(self, parent, index, iid=None, values=()):
+        if iid is None:
+            self._auto += 1
+            iid = f"I{self._auto}"
+        self.items.insert(len(self.items) if index == "end" else index, iid)
+        self.values[iid] = values
+        return iid
+
+    def delete(self, *iids):
+        gone = set(iids)
+        self.items = [i for i in self.items if i not in gone]
+        for i in iids:
+            del self.values[i]
+
+    def item(self, iid, values=()):
+        self.values[iid] = values
+
+    def get_children(self):
+        return tuple(self.items)
+
+    def selection_set(self, items):
+        pass
+
+    def selection_add(self, items):
+        pass
+
+    def yview_moveto(self, fraction):
+        pass
+
+
+class _StubScrollbar:
+    def set(self, first, last):
+        pass
+
+
+def _make_table(tk_mode: str) -> Tuple[Any, Callable[[], None], str]:
+    """
+    (VirtualTable, flush, mode used). "real" needs a display (an Xvfb one is fine),
+    "stub" swaps the Tk widgets for _StubTree, "auto" tries real first.
+    flush() lets Tk finish pending work so it is part of the timing.
+    """
+    from pages.virtual_table import VirtualTable
+
+    columns = FIELDS
+    if tk_mode in ("auto", "real"):
+        import tkinter as tk
+
+        try:
+            root = tk.Tk()
+        except tk.TclError:
+            if tk_mode == "real":
+                raise
+        else:
+            root.withdraw()
+            table = VirtualTable(root, columns, {c: c for c in columns}, {c: 100 for c in columns}, "white")
+            table.grid(row=0, column=0, sticky="nsew")
+            return table, root.update_idletasks, "real"
+
+    class StubTable(VirtualTable):
+        def __init__(self):  # no Tk: only the state VirtualTable.__init__ sets up
+            self.columns = tuple(columns)
+            self.key = "no"
+            self._rows = []
+            self._offset = 0
+            self._visible = 20
+            self._item_rows = {}
+            self._selected = {}
+            self._anchor = None
+            self._select_callbacks = []
+            self.tree = _StubTree()
+            self.scroll = _StubScrollbar()
+
+    return StubTable(), lambda: None, "stub"
+
+
+# ---------- one catalog size ----------
+def bench_size(
+    n: int,
+    workdir: Path,
+    storage_kind: str = "json",
+    repeat: int = 3,
+    seed: int = 1,
+    tk_mode: str = "auto",
+) -> Tuple[Dict[str, float], Dict[str, Any]]:
+    """Timings in seconds for one catalog size, plus notes (tk mode, row counts)."""
+    src_json, src_csv = ensure_catalog(workdir, n, seed)
+    run_dir = workdir / f"run_{size_label(n)}_{storage_kind}"
+    results: Dict[str, float] = {}
+    notes: Dict[str, Any] = {"rows": n}
+
+    # the big sizes take minutes per pass: time them once
+    big = n >= 1_000_000
+    rep = 1 if big else repeat
+
+    cfg = {
+        "storage": storage_kind,
+        "json_path": str(run_dir / "books.json"),
+        "db_path": str(run_dir / "books.db"),
+        "binary_snapshot": True,
+    }
+
+    def fresh() -> None:
+        # the generated books.json and nothing else (no snapshot, journal or db)
+        if run_dir.exists():
+            shutil.rmtree(run_dir)
+        run_dir.mkdir(parents=True)
+        shutil.copyfile(src_json, run_dir / "books.json")
+
+    # ---- storage ----
+    storages: List[Any] = []
+
+    def cold_load() -> None:
+        storages[-1].load_books()
+
+    def cold_setup() -> None:
+        fresh()
+        storages.append(create_storage(cfg))
+
+    results["load_books_cold"] = _timed(cold_load, rep, cold_setup)
+    storage = storages[-1]
+    results["load_books_cached"] = _timed(storage.load_books, repeat)
+    # a new process: binary snapshot (json / journal) or SQLite read
+    results["load_books_restart"] = _timed(lambda: create_storage(cfg).load_books(), rep)
+    results["load_books_restart_full"] = _timed(lambda: list(create_storage(cfg).load_books()), rep)
+
+    books: List[Book] = list(storage.load_books())
+    results["save_books"] = _timed(lambda: storage.save_books(books), rep)
+    results["import_from_csv"] = _timed(lambda: storage.import_from_csv(src_csv), rep)
+    backup = run_dir / "backup.json"
+    results["import_csv_with_backup"] = _timed(lambda: storage.import_csv_with_backup(src_csv, backup), rep)
+    out_csv = run_dir / "export.csv"
+    results["export_csv"] = _timed(lambda: storage.export_csv(out_csv), rep)
+    results["export_csv_filtered_sorted"] = _timed(
+        lambda: storage.export_csv(out_csv, query=QUERIES[0], sort=parse_spec(SORT_SPECS[-1])), rep
+    )
+    books = list(storage.load_books())
+
+    # ---- catalog: search and Sort page ----
+    catalogs: List[BookCatalog] = []
+    results["catalog_build"] = _timed(lambda: catalogs.append(BookCatalog(books)), rep)
+    catalog = catalogs[-1]
+    del catalogs[:-1]
+
+    for q in QUERIES:
+        results[f"search[{q}]"] = _timed(lambda: catalog.search(q), repeat)
+        notes[f"hits[{q}]"] = len(catalog.search(q))
+        # what a Search box asks for: the first SEARCH_LIMIT matches (+1 to know there are more)
+        results[f"search_box[{q}]"] = _timed(lambda: catalog.search(q, SEARCH_LIMIT + 1), repeat)
+    results["search_scan[the]"] = _timed(lambda: sum(1 for _ in storage.iter_books(QUERIES[0])), rep)
+
+    for text in SORT_SPECS:
+        spec = parse_spec(text)
+        # first view of a single column builds its SortIndex; later ones walk it
+        results[f"sort_view_first[{text}]"] = _timed(lambda: catalog.sorted_view(spec), 1)
+        results[f"sort_view[{text}]"] = _timed(lambda: catalog.sorted_view(spec), repeat)
+        results[f"sort_view_filtered[{text}]"] = _timed(lambda: catalog.sorted_view(spec, QUERIES[0]), repeat)
+    # "Sort" without "View only": reorder the catalog and save that order
+    spec = parse_spec(SORT_SPECS[-1])
+    results["sort_and_save"] = _timed(lambda: (catalog.sort_by(spec), storage.save_books(catalog.to_list())), rep)
+
+    # ---- Treeview ----
+    table, flush, notes["tk"] = _make_table(tk_mode)
+    rows = catalog.to_list()
+    results["tree_set_rows"] = _timed(lambda: (table.set_rows(rows), flush()), repeat)
+    offsets = random.Random(seed).sample(range(len(rows)), min(100, len(rows)))
+    results["tree_scroll_100"] = _timed(lambda: ([table.scroll_to(o) for o in offsets], flush()), repeat)
+
+    def patch_100() -> None:
+        # edits reaching an open list page: catalog upsert + in-place table patch
+        for b in rows[:100]:
+            catalog.upsert(Book(b.no, b.title + "!", b.genre, b.author, b.price, b.year))
+        flush()
+
+    def listener(change) -> None:
+        if not table.apply_change(change, lambda b: True, catalog.position):
+            table.set_rows(catalog.to_list())
+
+    table.set_rows(catalog.to_list())
+    table.scroll_to(0)
+    catalog.subscribe(listener)
+    results["tree_patch_100"] = _timed(patch_100, repeat)
+    catalog.unsubscribe(listener)
+
+    shutil.rmtree(run_dir, ignore_errors=True)
+    return results, notes
+
+
+# ---------- baseline ----------
+def compare(
+    current: Dict[str, Dict[str, float]],
+    baseline: Dict[str, Dict[str, float]],
+    tolerance: float = 0.25,
+) -> List[Tuple[str, str, float, float]]:
+    """(size, name, baseline, current) for every timing more than tolerance (and MIN_DELTA) slower."""
+    slower = []
+    for size, timings in current.items():
+        for name, secs in timings.items():
+            base = baseline.get(size, {}).get(name)
+            if base is None:
+                continue
+            if secs > base * (1.0 + tolerance) and secs - base > MIN_DELTA:
+                slower.append((size, name, base, secs))
+    return slower
+
+
+def _print_report(current: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> None:
+    # human-readable summary on stderr; stdout / --out carry the JSON
+    for size, timings in current.items():
+        print(f"\n== {size} ==", file=sys.stderr)
+        for name, secs in timings.items():
+            base = baseline.get(size, {}).get(name)
+            ratio = f"  x{secs / base:.2f} vs baseline" if base else ""
+            print(f"  {name:<46} {secs * 1000:>11.1f} ms{ratio}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench",
+        description="Time storage, search, sorting and table code on synthetic catalogs.",
+    )
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma separated, e.g. 1k,100k,1m,5m (default {DEFAULT_SIZES})")
+    parser.add_argument("--storage", default="json", choices=("json", "journal", "sqlite"))
+    parser.add_argument("--repeat", type=int, default=3, help="best of N for each timing (1M+ rows: always 1)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--tk", default="auto", choices=("auto", "real", "stub"), help="Treeview: real Tk (needs a display) or stubbed")
+    parser.add_argument("--workdir", default="bench/data", help="generated catalogs are kept here and reused")
+    parser.add_argument("--out", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="results file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before failing (0.25 = 25%%)")
+    args = parser.parse_args(argv)
+
+    workdir = Path(args.workdir)
+    results: Dict[str, Dict[str, float]] = {}
+    notes: Dict[str, Dict[str, Any]] = {}
+    for size in args.sizes.split(","):
+        n = parse_size(size)
+        label = size_label(n)
+        print(f"benchmarking {label} rows ({args.storage})...", file=sys.stderr)
+        results[label], notes[label] = bench_size(n, workdir, args.storage, args.repeat, args.seed, args.tk)
+
+    report = {
+        "meta": {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "repeat": args.repeat,
+            "seed": args.seed,
+            "notes": notes,
+        },
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        Path(args.out).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+
+    baseline_path = Path(args.baseline)
+    baseline: Dict[str, Any] = {}
+    if baseline_path.exists():
+        with baseline_path.open("r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("meta", {}).get("storage", "json") != args.storage:
+            print(f"note: baseline was recorded with storage={baseline['meta']['storage']}", file=sys.stderr)
+
+    old = baseline.get("results", {})
+    _print_report(results, old)
+    slower = compare(results, old, args.tolerance)
+
+    if args.save_baseline:
+        baseline_path.write_text(text + "\n", encoding="utf-8")
+        print(f"baseline saved to {baseline_path}", file=sys.stderr)
+        return 0
+
+    for size, name, base, secs in slower:
+        print(f"REGRESSION {size} {name}: {base * 1000:.1f} ms -> {secs * 1000:.1f} ms", file=sys.stderr)
+    return 1 if slower else 0
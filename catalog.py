@@ -0,0 +1,375 @@
+# catalog.py
+from __future__ import annotations
+
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from instrumentation import instruments
+from models import Book
+from search_index import SearchIndex
+from snapshot import SnapshotBooks
+from sort_index import SortIndex
+from sorting import SortSpec, normalize_spec, sort_books
+
+
+class CatalogChange(NamedTuple):
+    """One change, as passed to BookCatalog.subscribe() listeners."""
+
+    kind: str                    # "inserted" | "updated" | "deleted" | "reset" (load / sort)
+    no: str = ""
+    book: Optional[Book] = None  # the new record (None when deleted / reset)
+    position: int = -1           # its slot; for "deleted" the slot it had
+
+
+class BookCatalog:
+    """
+    In-memory list of books keyed by "no".
+
+    Records keep their insertion / sort order (the order save_books persists)
+    and a dict maps each "no" to its slot, so get / upsert / delete are O(1).
+    Deleted slots are left as holes and squeezed out once they pile up.
+    A SearchIndex is kept in step with every change for the Search boxes,
+    a SortIndex for column orders, and `version` goes up on every change so
+    views can tell when to redraw.
+
+    Loaded lazily from a binary snapshot, the catalog only wraps the
+    memory-mapped rows: len(), iteration and the unfiltered list read
+    straight from them, and everything else first builds the records and
+    indexes (materialize()).
+
+    Listeners added with subscribe() get a CatalogChange after every change
+    (after `version` moved), so views can patch the affected row.
+    """
+
+    # compact when more than this share of the slots are holes
+    COMPACT_RATIO = 0.5
+
+    # apply() batches up to this size notify per record, bigger ones with one "reset"
+    BATCH_PATCH_LIMIT = 200
+
+    def __init__(self, books: Optional[Sequence[Book]] = None, lazy: bool = False):
+        self._base: Optional[SnapshotBooks] = None
+        self._records: List[Optional[Book]] = []
+        self._index: Dict[str, int] = {}
+        self._holes = 0
+        self.version = 0
+        self.search_index = SearchIndex()
+        # the SearchIndex ids still follow catalog order, so its hits come out in it
+        self._hits_in_order = True
+        self.sort_index = SortIndex(self)
+        self._listeners: List[Callable[[CatalogChange], None]] = []
+        if books:
+            self.load(books, lazy=lazy)
+
+    # ---------- bulk ----------
+    def load(self, books: Sequence[Book], lazy: bool = False) -> None:
+        """
+        Replace the whole catalog.
+        A repeated "no" keeps the slot of its first occurrence and the
+        values of its last one (same result as upserting row by row).
+        lazy=True with a SnapshotBooks defers all of that until needed.
+        """
+        self._base = None
+        if lazy and isinstance(books, SnapshotBooks):
+            self._base = books
+            self._records = []
+            self._index = {}
+            self._holes = 0
+            self.search_index.build(())
+            self._hits_in_order = True
+            self.sort_index.clear()
+            self.version += 1
+            self._emit(CatalogChange("reset"))
+            return
+
+        self._records = []
+        self._index = {}
+        self._holes = 0
+        for b in books:
+            self._put(b)
+        self.search_index.build(self)
+        self._hits_in_order = True
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+
+    @property
+    def lazy(self) -> bool:
+        """True while the records are still only the mapped snapshot."""
+        return self._base is not None
+
+    def materialize(self) -> None:
+        """Build records and indexes for a lazily loaded catalog (no-op otherwise)."""
+        base = self._base
+        if base is None:
+            return
+        self._base = None
+        for b in base:
+            self._put(b)
+        self.search_index.build(self)
+        self._hits_in_order = True
+
+    def to_list(self) -> List[Book]:
+        """Records in order, ready for storage.save_books()."""
+        if self._base is not None:
+            return list(self._base)
+        return [b for b in self._records if b is not None]
+
+    def sort(self, key: Callable[[Book], Any], reverse: bool = False) -> None:
+        self.materialize()
+        books = self.to_list()
+        books.sort(key=key, reverse=reverse)
+        self._records = books
+        self._holes = 0
+        self._reindex()
+        self._hits_in_order = False
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+
+    def sort_by(self, spec: SortSpec) -> None:
+        """Reorder by [(column, descending), ...], same order sorted_view(spec) shows."""
+        self._records = self.sorted_view(spec)
+        self._holes = 0
+        self._reindex()
+        self._hits_in_order = False
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+
+    def reorder(self, nos: Sequence[str]) -> None:
+        """
+        Put the records in the order of nos (e.g. [b.no for b in catalog] from
+        before a sort). Numbers no longer here are skipped; records not in
+        nos keep their relative order after the listed ones.
+        """
+        self.materialize()
+        index, records = self._index, self._records
+        books = [records[index[no]] for no in nos if no in index]
+        if len(books) < len(index):
+            listed = set(nos)
+            books += [b for b in self if b.no not in listed]
+        self._records = books
+        self._holes = 0
+        self._reindex()
+        self._hits_in_order = False
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+
+    def insert_before(self, placed: Sequence[Tuple[Book, Optional[str]]]) -> None:
+        """
+        Put records back where they were, each in front of the "no" that
+        followed it (an undone delete). A successor may itself be one of the
+        placed records; records whose successor is gone (or None) go last.
+        """
+        self.materialize()
+        before: Dict[str, Book] = {}
+        tail = []
+        for book, following in placed:
+            pos = self._index.get(book.no)
+            if pos is not None:
+                self._records[pos] = book  # came back meanwhile: replace in place
+            elif following is None or following in before:
+                tail.append(book)
+            else:
+                before[following] = book
+            self.search_index.add(book)
+
+        books = []
+        for b in [*self, *tail]:
+            # b and the chain of records that went right in front of it
+            run = [b]
+            while run[-1].no in before:
+                run.append(before.pop(run[-1].no))
+            books.extend(reversed(run))
+        books.extend(before.values())
+
+        self._records = books
+        self._holes = 0
+        self._reindex()
+        self._hits_in_order = False
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+
+    # ---------- change notifications ----------
+    def subscribe(self, callback: Callable[[CatalogChange], None]) -> None:
+        self._listeners.append(callback)
+
+    def unsubscribe(self, callback: Callable[[CatalogChange], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _emit(self, change: CatalogChange) -> None:
+        for callback in list(self._listeners):
+            callback(change)
+
+    # ---------- single record ----------
+    def get(self, no: str) -> Optional[Book]:
+        self.materialize()
+        pos = self._index.get(no)
+        if pos is None:
+            return None
+        return self._records[pos]
+
+    def upsert(self, book: Book) -> bool:
+        """Insert or replace by "no". Returns True if a record was replaced."""
+        self.materialize()
+        replaced = self._put(book)
+        self.search_index.add(book)
+        self.sort_index.add(book)
+        self.version += 1
+        self._emit(CatalogChange("updated" if replaced else "inserted", book.no, book, self._index[book.no]))
+        return replaced
+
+    def delete(self, no: str) -> Optional[Book]:
+        """Remove by "no". Returns the removed record (or None)."""
+        self.materialize()
+        pos = self._index.pop(no, None)
+        if pos is None:
+            return None
+
+        book = self._records[pos]
+        self._records[pos] = None
+        self._holes += 1
+        self.search_index.remove(no)
+        self.sort_index.remove(no)
+        self.version += 1
+        # before compacting, so listeners still see the old slots
+        self._emit(CatalogChange("deleted", no, None, pos))
+
+        if self._holes > len(self._records) * self.COMPACT_RATIO:
+            self._compact()
+        return book
+
+    def apply(self, upserts: Iterable[Book] = (), deletes: Iterable[str] = ()) -> Tuple[int, int]:
+        """
+        Many upserts / deletes at once (a storage batch). Small batches notify
+        record by record like upsert() / delete(); big ones update the indexes
+        in one go and notify a single "reset". Returns (upserted, deleted).
+        """
+        upserts, deletes = list(upserts), list(deletes)
+        if len(upserts) + len(deletes) <= self.BATCH_PATCH_LIMIT:
+            for b in upserts:
+                self.upsert(b)
+            return len(upserts), sum(self.delete(no) is not None for no in deletes)
+
+        self.materialize()
+        for b in upserts:
+            self._put(b)
+        deleted = 0
+        for no in deletes:
+            pos = self._index.pop(no, None)
+            if pos is None:
+                continue
+            self._records[pos] = None
+            self._holes += 1
+            deleted += 1
+        self.search_index.apply(upserts, deletes)
+        if self._holes > len(self._records) * self.COMPACT_RATIO:
+            self._compact()
+        self.sort_index.clear()
+        self.version += 1
+        self._emit(CatalogChange("reset"))
+        return len(upserts), deleted
+
+    @instruments.timed("catalog.search")
+    def search(self, query: str, limit: Optional[int] = None) -> Sequence[Book]:
+        """
+        Records whose search text contains query (lowercased), in catalog order;
+        limit returns only the first that many. An empty query on a lazy
+        catalog returns the mapped snapshot itself (read-only).
+        """
+        query = query.strip().lower()
+        if not query:
+            if self._base is not None:
+                return self._base if limit is None else list(islice(self._base, limit))
+            return self.to_list() if limit is None else list(islice(self, limit))
+
+        self.materialize()
+        index, records = self._index, self._records
+        if self._hits_in_order:
+            # only the first `limit` hits are looked for
+            return [records[index[no]] for no in self.search_index.matches(query, limit)]
+
+        # reordered since the index was built: collect every hit, then order them
+        hits = self.search_index.matches(query)
+        if len(hits) * 4 > len(index):
+            # broad query: one ordered pass is cheaper than sorting the hits
+            hits = set(hits)
+            return list(islice((b for b in self if b.no in hits), limit))
+        return [records[pos] for pos in sorted(index[no] for no in hits)[:limit]]
+
+    @instruments.timed("catalog.sorted_view")
+    def sorted_view(self, spec: SortSpec, query: str = "") -> List[Book]:
+        """
+        search(query) ordered by [(column, descending), ...], without changing
+        the catalog order. A single column walks the maintained SortIndex;
+        more keys run sorting.sort_books over the hits (keys cached per record).
+        """
+        spec = normalize_spec(spec)
+        query = query.strip().lower()
+        self.materialize()
+        if len(spec) > 1:
+            return sort_books(self.search(query), spec)
+
+        col, desc = spec[0]
+        hits = set(self.search_index.matches(query)) if query else None
+        index, records = self._index, self._records
+        return [records[index[no]] for no in self.sort_index.ordered(col, desc, only=hits)]
+
+    def position(self, no: str) -> int:
+        """Slot of "no" in display order (-1 if missing). Only meaningful for comparisons."""
+        self.materialize()
+        return self._index.get(no, -1)
+
+    def next_no(self, no: str) -> Optional[str]:
+        """The "no" of the record after "no" in display order (None if it is last or missing)."""
+        self.materialize()
+        pos = self._index.get(no)
+        if pos is None:
+            return None
+        records = self._records
+        for i in range(pos + 1, len(records)):
+            if records[i] is not None:
+                return records[i].no
+        return None
+
+    # ---------- container protocol ----------
+    def __len__(self) -> int:
+        if self._base is not None:
+            return len(self._base)
+        return len(self._index)
+
+    def __iter__(self) -> Iterator[Book]:
+        if self._base is not None:
+            yield from self._base
+            return
+        for b in self._records:
+            if b is not None:
+                yield b
+
+    def __contains__(self, no: object) -> bool:
+        self.materialize()
+        return no in self._index
+
+    # ---------- internals ----------
+    def _put(self, book: Book) -> bool:
+        no = book.no
+        pos = self._index.get(no)
+        if pos is not None:
+            self._records[pos] = book
+            return True
+
+        self._index[no] = len(self._records)
+        self._records.append(book)
+        return False
+
+    def _compact(self) -> None:
+        self._records = [b for b in self._records if b is not None]
+        self._holes = 0
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._index = {b.no: i for i, b in enumerate(self._records)}
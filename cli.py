@@ -0,0 +1,279 @@
+# cli.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+from typing import IO, Iterator, List, Optional
+
+from core import OUTPUT_FORMATS, catalog_stats, open_storage, select_books, write_books
+from models import FIELDS, Book
+from sorting import parse_spec
+from storage import MERGE_POLICIES, BookStorage, read_csv_books
+
+# Batch access to the library without Tk, e.g.
+#
+#   python cli.py import books.csv
+#   python cli.py search "tolkien" --sort "year desc" > hits.csv
+#   zcat dump.csv.gz | python cli.py sort "author, year desc" --input - --format jsonl
+#   python cli.py stats
+#
+# Rows stream from stdin / storage to stdout; only sort holds them all.
+# Messages go to stderr so stdout stays clean for pipes.
+
+
+def _open_input(path: str) -> IO[str]:
+    if path == "-":
+        # csv wants newline="" (quoted fields may contain line breaks)
+        sys.stdin.reconfigure(encoding="utf-8", newline="")
+        return sys.stdin
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _open_output(path: str) -> IO[str]:
+    if path == "-":
+        sys.stdout.reconfigure(encoding="utf-8", newline="")
+        return sys.stdout
+    return open(path, "w", encoding="utf-8", newline="", buffering=1024 * 1024)
+
+
+def _source(args: argparse.Namespace) -> Optional[Iterator[Book]]:
+    # --input FILE / - reads a CSV instead of the library
+    if not getattr(args, "input", None):
+        return None
+    return read_csv_books(_open_input(args.input))
+
+
+def _columns(text: Optional[str]) -> Optional[List[str]]:
+    return [c.strip().lower() for c in text.split(",") if c.strip()] if text else None
+
+
+def _storage(args: argparse.Namespace) -> BookStorage:
+    return open_storage(
+        args.base_dir, storage=args.storage, json_path=args.json_path, db_path=args.db_path,
+        import_workers=getattr(args, "workers", None),
+    )
+
+
+def _info(message: str) -> None:
+    print(message, file=sys.stderr)
+
+
+# ---------- commands ----------
+def cmd_import(args: argparse.Namespace) -> int:
+    storage = _storage(args)
+    rows = 0
+
+    if args.merge:
+        if args.csv == "-":
+            raise ValueError("--merge needs a CSV file, not stdin.")
+        s = storage.merge_csv(args.csv, args.merge, args.delete_missing, args.backup)
+        _info(
+            f"Merged: {s.inserted:,} inserted, {s.updated:,} updated, {s.unchanged:,} unchanged, "
+            f"{s.skipped:,} skipped, {s.deleted:,} deleted. Backup of the previous books: {s.backup}"
+        )
+        return 0
+
+    if args.csv != "-":
+        # a file can be split across processes (--workers)
+        def progress(done: int, _bytes_done: int, _total: int) -> None:
+            nonlocal rows
+            rows = done
+
+        backup = storage.import_csv_with_backup(args.csv, args.backup, progress)
+        _info(f"Imported {rows:,} rows. Backup of the previous books: {backup}")
+        return 0
+
+    def counted(books: Iterator[Book]) -> Iterator[Book]:
+        nonlocal rows
+        for b in books:
+            rows += 1
+            yield b
+
+    books = read_csv_books(_open_input(args.csv))
+    backup = storage.import_books(counted(books), args.backup)
+    _info(f"Imported {rows:,} rows. Backup of the previous books: {backup}")
+    return 0
+
+
+def cmd_export(args: argparse.Namespace) -> int:
+    storage = _storage(args)
+    sort = parse_spec(args.sort) if args.sort else None
+    books = select_books(storage, None, args.query, sort)
+    out = _open_output(args.out)
+    try:
+        rows = write_books(out, books, args.format, _columns(args.columns))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if args.out != "-":
+        _info(f"Exported {rows:,} rows to {args.out}")
+    return 0
+
+
+def cmd_search(args: argparse.Namespace) -> int:
+    source = _source(args)
+    storage = None if source is not None else _storage(args)
+    sort = parse_spec(args.sort) if args.sort else None
+    books = select_books(storage, source, args.query, sort)
+    if args.limit is not None:
+        books = _take(books, args.limit)
+    write_books(_open_output("-"), books, args.format, _columns(args.columns))
+    return 0
+
+
+def cmd_sort(args: argparse.Namespace) -> int:
+    spec = parse_spec(args.spec)
+    if not spec:
+        raise ValueError("Give at least one sort key, e.g. \"author, year desc\".")
+
+    if args.save:
+        # what the Sort page's "Sort" button does: reorder the library itself
+        if args.input:
+            raise ValueError("--save sorts the library; it can't be combined with --input.")
+        storage = _storage(args)
+        books = list(select_books(storage, None, None, spec))
+        storage.save_books(books)
+        _info(f"Saved {len(books):,} rows in the new order.")
+        return 0
+
+    source = _source(args)
+    storage = None if source is not None else _storage(args)
+    books = select_books(storage, source, args.query, spec)
+    write_books(_open_output("-"), books, args.format, _columns(args.columns))
+    return 0
+
+
+def cmd_stats(args: argparse.Namespace) -> int:
+    source = _source(args)
+    if source is None:
+        source = iter(_storage(args).load_books())
+    stats = catalog_stats(source, top=args.top)
+    print(json.dumps(stats, indent=2, ensure_ascii=False))
+    return 0
+
+
+def cmd_backups(args: argparse.Namespace) -> int:
+    storage = _storage(args)
+    for m in storage.backup_store().backups():
+        when = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(m["created"]))
+        print(f'{Path(m["path"]).stem}  {when}  {m["reason"]:<12} {m["size"]:>14,} bytes  {m["new_bytes"]:>14,} new')
+    return 0
+
+
+def cmd_restore(args: argparse.Namespace) -> int:
+    storage = _storage(args)
+    backup = storage.restore_backup(args.backup)
+    _info(f"Restored {args.backup}. Backup of the replaced books: {backup}")
+    return 0
+
+
+def cmd_compact(args: argparse.Namespace) -> int:
+    storage = _storage(args)
+    paths = [p for p in _storage_files(storage) if p.exists()]
+    before = sum(p.stat().st_size for p in paths)
+    storage.compact()
+    after = sum(p.stat().st_size for p in _storage_files(storage) if p.exists())
+    _info(f"Compacted: {before:,} -> {after:,} bytes")
+    return 0
+
+
+def _storage_files(storage: BookStorage) -> List[Path]:
+    return [
+        Path(p)
+        for p in (
+            storage.data_path,
+            getattr(storage, "journal_path", None),
+            getattr(storage, "binary_snapshot_path", None),
+        )
+        if p
+    ]
+
+
+def _take(books: Iterator[Book], limit: int) -> Iterator[Book]:
+    for i, b in enumerate(books):
+        if i >= limit:
+            return
+        yield b
+
+
+# ---------- arguments ----------
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python cli.py", description="Library Manager without the window.")
+    parser.add_argument("--base-dir", help="where config.json and data/ live (default: next to cli.py)")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), help="override the configured backend")
+    parser.add_argument("--json-path", help="override books.json")
+    parser.add_argument("--db-path", help="override books.db")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def add_output(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--format", choices=OUTPUT_FORMATS, default="csv")
+        p.add_argument("--columns", help=f"comma separated, any of {','.join(FIELDS)} (default: all)")
+
+    p = sub.add_parser("import", help="replace the library with a CSV (backed up first)")
+    p.add_argument("csv", help="CSV file, or - for stdin")
+    p.add_argument("--backup", help="write the backup to this file instead of the backup store (see the backups command)")
+    p.add_argument("--merge", choices=MERGE_POLICIES, help="merge the rows in by no instead of replacing the library")
+    p.add_argument("--delete-missing", action="store_true", help="with --merge: also delete books not in the CSV")
+    p.add_argument("--workers", type=int, help="processes parsing the file (default: one per core for big files, 1 = serial)")
+    p.set_defaults(func=cmd_import)
+
+    p = sub.add_parser("export", help="write the library (or a filtered / sorted part) out")
+    p.add_argument("out", nargs="?", default="-", help="output file (default: stdout)")
+    p.add_argument("--query", help="only rows matching this search")
+    p.add_argument("--sort", help='sort keys, e.g. "genre, year desc"')
+    add_output(p)
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("search", help="rows matching a search, to stdout")
+    p.add_argument("query")
+    p.add_argument("--sort", help='sort keys, e.g. "title"')
+    p.add_argument("--limit", type=int, help="stop after this many rows")
+    p.add_argument("--input", help="search this CSV (or - for stdin) instead of the library")
+    add_output(p)
+    p.set_defaults(func=cmd_search)
+
+    p = sub.add_parser("sort", help="rows in a sort order, to stdout (or --save it)")
+    p.add_argument("spec", help='sort keys, e.g. "author, year desc"')
+    p.add_argument("--query", help="only rows matching this search")
+    p.add_argument("--input", help="sort this CSV (or - for stdin) instead of the library")
+    p.add_argument("--save", action="store_true", help="store the library in this order")
+    add_output(p)
+    p.set_defaults(func=cmd_sort)
+
+    p = sub.add_parser("stats", help="row counts, genres, authors, price / year ranges (JSON)")
+    p.add_argument("--input", help="summarise this CSV (or - for stdin) instead of the library")
+    p.add_argument("--top", type=int, default=10, help="how many top genres / authors to list")
+    p.set_defaults(func=cmd_stats)
+
+    p = sub.add_parser("backups", help="list the automatic backups, newest first")
+    p.set_defaults(func=cmd_backups)
+
+    p = sub.add_parser("restore", help="replace the library with an automatic backup (backed up first)")
+    p.add_argument("backup", help="backup name from the backups command, or its manifest path")
+    p.set_defaults(func=cmd_restore)
+
+    p = sub.add_parser("compact", help="fold the journal / merge duplicates / VACUUM")
+    p.set_defaults(func=cmd_compact)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except BrokenPipeError:
+        # reader went away (e.g. | head): stop quietly, without a second error at exit
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        _info(f"error: {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+# config.py
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict
+
+from backup_store import KEEP_BACKUPS, BackupStore
+from storage import BookStorage
+from journal_storage import JournaledBookStorage
+from sqlite_storage import SqliteBookStorage, migrate_json_to_sqlite
+from remote import RemoteStorage
+
+DEFAULTS: Dict[str, Any] = {
+    # "json" | "journal" | "sqlite"
+    "storage": "json",
+    "json_path": "data/books.json",
+    "db_path": "data/books.db",
+    # keep books.json.snap (memory-mapped, see snapshot.py) for fast startup
+    "binary_snapshot": True,
+    # "" (off), "stderr", or a file that gets one JSON line per start (see timing.py)
+    "startup_report": "",
+    # record timings for the Diagnostics page (also switchable from the Debug menu)
+    "instrument": False,
+    # http://host:port of a running server.py: use its shared catalog instead of local files
+    "server_url": "",
+    # processes parsing a CSV import: 0 = one per core for big files, 1 = always serial
+    "import_workers": 0,
+    # automatic backups (before imports, restores, ...): deduplicated chunk store, see backup_store.py
+    "backup_dir": "data/backups",
+    "backup_keep": 20,
+    "backup_compress": True,
+    # memory the undo / redo history may keep alive (oldest steps are dropped past it)
+    "undo_memory_mb": 32,
+}
+
+
+def load_config(base_dir: str | Path) -> Dict[str, Any]:
+    """
+    Defaults, then <base_dir>/config.json (optional), then LIBRARY_<KEY> env vars
+    for any key in DEFAULTS (LIBRARY_STORAGE, LIBRARY_JSON_PATH, LIBRARY_DB_PATH,
+    LIBRARY_SERVER_URL, LIBRARY_IMPORT_WORKERS, LIBRARY_BACKUP_DIR, ...).
+    Relative paths are resolved against base_dir.
+    """
+    base_dir = Path(base_dir)
+    cfg = dict(DEFAULTS)
+
+    cfg_path = base_dir / "config.json"
+    if cfg_path.exists():
+        with cfg_path.open("r", encoding="utf-8") as f:
+            cfg.update(json.load(f))
+
+    for key in DEFAULTS:
+        env = os.environ.get(f"LIBRARY_{key.upper()}")
+        if env:
+            cfg[key] = env
+
+    for key in ("json_path", "db_path", "backup_dir"):
+        cfg[key] = str(base_dir / cfg[key])
+    if cfg["startup_report"] not in ("", "stderr"):
+        cfg["startup_report"] = str(base_dir / cfg["startup_report"])
+    cfg["binary_snapshot"] = _flag(cfg["binary_snapshot"])
+    cfg["instrument"] = _flag(cfg["instrument"])
+    cfg["import_workers"] = int(cfg["import_workers"])
+    cfg["backup_keep"] = int(cfg["backup_keep"])
+    cfg["backup_compress"] = _flag(cfg["backup_compress"])
+    cfg["undo_memory_mb"] = int(cfg["undo_memory_mb"])
+    return cfg
+
+
+def _flag(value: Any) -> bool:
+    # env vars arrive as strings: "0", "false", "no" and "off" turn an option off
+    if isinstance(value, str):
+        return value.strip().lower() not in ("0", "false", "no", "off", "")
+    return bool(value)
+
+
+def create_storage(cfg: Dict[str, Any]) -> BookStorage:
+    storage = _open_storage(cfg)
+    storage.import_workers = cfg.get("import_workers", 0)
+    if cfg.get("backup_dir"):
+        storage.backups = BackupStore(cfg["backup_dir"], cfg.get("backup_compress", True), cfg.get("backup_keep", KEEP_BACKUPS))
+    return storage
+
+
+def _open_storage(cfg: Dict[str, Any]) -> BookStorage:
+    if cfg.get("server_url"):
+        return RemoteStorage(cfg["server_url"])
+    kind = cfg.get("storage", "json")
+    if kind == "json":
+        return BookStorage(cfg["json_path"], binary_snapshot=cfg.get("binary_snapshot", True))
+    if kind == "journal":
+        return JournaledBookStorage(cfg["json_path"], binary_snapshot=cfg.get("binary_snapshot", True))
+    if kind == "sqlite":
+        # first run on SQLite: bring the existing books.json across once
+        if not Path(cfg["db_path"]).exists() and Path(cfg["json_path"]).exists():
+            migrate_json_to_sqlite(cfg["json_path"], cfg["db_path"])
+        return SqliteBookStorage(cfg["db_path"])
+    raise ValueError(f"Unknown storage backend '{kind}'. Use json, journal or sqlite.")
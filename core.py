@@ -0,0 +1,138 @@
+# core.py
+from __future__ import annotations
+
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Sequence
+
+from config import create_storage, load_config
+from models import FIELDS, PRICE_OK, YEAR_OK, Book
+from search_index import search_text
+from sorting import SortSpec, sort_books
+from storage import BookStorage, write_csv_books
+
+# Everything the app does to a catalog that has nothing to do with Tk:
+# opening the configured storage, filtering / sorting / writing streams
+# of books and summarising them. cli.py is built on it; the pages use
+# the same storage calls through MainApp.
+
+BASE_DIR = Path(__file__).resolve().parent
+
+OUTPUT_FORMATS = ("csv", "jsonl")
+
+
+def open_storage(base_dir: Optional[str | Path] = None, **overrides: Any) -> BookStorage:
+    """
+    The storage the app would open from base_dir (config.json, LIBRARY_* env
+    vars), with overrides such as storage="sqlite" or json_path=... on top.
+    Overrides that are None are ignored.
+    """
+    cfg = load_config(base_dir or BASE_DIR)
+    cfg.update({k: v for k, v in overrides.items() if v is not None})
+    return create_storage(cfg)
+
+
+# ---------- streams ----------
+def filter_books(books: Iterable[Book], query: Optional[str]) -> Iterator[Book]:
+    """Same matching as the Search boxes: case-insensitive substring of any field."""
+    query = (query or "").strip().lower()
+    if not query:
+        yield from books
+        return
+    for b in books:
+        if query in search_text(b):
+            yield b
+
+
+def select_books(
+    storage: Optional[BookStorage] = None,
+    source: Optional[Iterable[Book]] = None,
+    query: Optional[str] = None,
+    sort: Optional[SortSpec] = None,
+) -> Iterator[Book]:
+    """
+    Books from source (e.g. read_csv_books(sys.stdin)) or else from storage,
+    filtered by query and ordered by sort. Only sorting holds the rows in memory;
+    on storage the backend's own search / order is used.
+    """
+    if source is None:
+        if storage is None:
+            raise ValueError("Need a storage or a source of books.")
+        yield from storage.iter_books(query, sort)
+        return
+
+    books: Iterable[Book] = filter_books(source, query)
+    if sort:
+        books = sort_books(list(books), sort)
+    yield from books
+
+
+def write_books(f: IO[str], books: Iterable[Book], fmt: str = "csv", columns: Optional[Sequence[str]] = None) -> int:
+    """Write books as CSV (with header) or JSON lines to an open text stream. Returns the row count."""
+    if fmt == "csv":
+        return write_csv_books(f, books, columns)
+    if fmt != "jsonl":
+        raise ValueError(f"Unknown format '{fmt}'. Use one of: {', '.join(OUTPUT_FORMATS)}")
+
+    columns = list(columns or FIELDS)
+    for c in columns:
+        if c not in FIELDS:
+            raise ValueError(f"Unknown column '{c}'. Use any of: {', '.join(FIELDS)}")
+    rows = 0
+    for b in books:
+        f.write(json.dumps({c: getattr(b, c) for c in columns}, ensure_ascii=False) + "\n")
+        rows += 1
+    return rows
+
+
+# ---------- summaries ----------
+def catalog_stats(books: Iterable[Book], top: int = 10) -> Dict[str, Any]:
+    """One pass over books: counts, repeated nos, top genres / authors, price and year ranges."""
+    rows = 0
+    seen = set()
+    duplicates = 0
+    genres: Counter = Counter()
+    authors: Counter = Counter()
+    prices = {"count": 0, "missing": 0, "invalid": 0, "min": None, "max": None, "sum": 0.0}
+    years = {"count": 0, "missing": 0, "invalid": 0, "min": None, "max": None}
+
+    for b in books:
+        rows += 1
+        if b.no in seen:
+            duplicates += 1
+        else:
+            seen.add(b.no)
+        genres[b.genre] += 1
+        authors[b.author] += 1
+        _tally(prices, b.price, b.price_num, b.valid & PRICE_OK)
+        _tally(years, b.year, b.year_num, b.valid & YEAR_OK)
+
+    if prices["count"]:
+        prices["mean"] = round(prices["sum"] / prices["count"], 2)
+    prices["sum"] = round(prices["sum"], 2)
+
+    return {
+        "rows": rows,
+        "unique_nos": len(seen),
+        "duplicate_nos": duplicates,
+        "genres": len(genres),
+        "authors": len(authors),
+        "top_genres": genres.most_common(top),
+        "top_authors": authors.most_common(top),
+        "price": prices,
+        "year": years,
+    }
+
+
+def _tally(acc: Dict[str, Any], text: str, value: float, ok: int) -> None:
+    if not ok:
+        acc["missing" if not text.strip() else "invalid"] += 1
+        return
+    acc["count"] += 1
+    if acc["min"] is None or value < acc["min"]:
+        acc["min"] = value
+    if acc["max"] is None or value > acc["max"]:
+        acc["max"] = value
+    if "sum" in acc:
+        acc["sum"] += value
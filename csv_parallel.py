@@ -0,0 +1,177 @@
+# csv_parallel.py
+from __future__ import annotations
+
+import csv
+import io
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Deque, Iterator, List, Optional, Sequence, Tuple
+
+from storage import ImportCancelled, ProgressCallback, csv_columns, csv_rows
+
+# Parallel CSV import for files too big to parse on one core.
+#
+# The parent scans the file once for cut points: the first newline after
+# every RANGE_BYTES that is not inside a quoted field (an even number of
+# '"' so far). That scan is bytes.count() over large blocks, so it runs at
+# disk speed and hands out ranges while it goes. Each worker reads its own
+# byte range, parses and validates it with the same csv_rows() as the
+# serial import and sends back plain row tuples. Results are consumed in
+# file order, so rows keep their order and the first bad row reported is
+# the first one in the file, with its line number in the whole file.
+
+# bytes per parsed range; a few times more ranges than workers keeps them all busy
+RANGE_BYTES = 8 * 1024 * 1024
+
+# files smaller than this are parsed serially when workers are chosen automatically
+PARALLEL_MIN_BYTES = 32 * 1024 * 1024
+
+# block size of the parent's cut-point scan
+SCAN_BLOCK = 16 * 1024 * 1024
+
+# (start, end, first_line): a byte range of whole records and the file line it starts on
+ByteRange = Tuple[int, int, int]
+
+
+def auto_workers(csv_path: str | Path, workers: int = 0) -> int:
+    """
+    Processes to parse csv_path with: workers if given (1 = serial),
+    otherwise one per core once the file is big enough to pay for them.
+    """
+    if workers > 0:
+        return workers
+    if Path(csv_path).stat().st_size < PARALLEL_MIN_BYTES:
+        return 1
+    return os.cpu_count() or 1
+
+
+def read_header(csv_path: str | Path) -> Tuple[List[str], int, int]:
+    """The header row, the byte offset just after it and the number of lines it took."""
+    with open(csv_path, "rb") as f:
+        head = b""
+        while True:
+            line = f.readline()
+            if not line:
+                break
+            head += line
+            if head.count(b'"') % 2 == 0:
+                break
+
+    rows = list(csv.reader(io.StringIO(head.decode("utf-8"), newline="")))
+    if not rows or not rows[0]:
+        raise ValueError("CSV has no header row.")
+    return rows[0], len(head), head.count(b"\n")
+
+
+def plan_ranges(csv_path: str | Path, start: int, first_line: int, range_bytes: int = RANGE_BYTES) -> Iterator[ByteRange]:
+    """
+    Split csv_path from byte `start` (line `first_line`) to the end into
+    ranges of about range_bytes, each ending on a newline outside quotes.
+    Yields them as the scan finds them.
+    """
+    size = Path(csv_path).stat().st_size
+    cut = start + range_bytes
+    quotes = 0  # '"' seen since start, mod 2: 1 = inside a quoted field
+    line = first_line
+
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        base = start
+        while True:
+            block = f.read(SCAN_BLOCK)
+            if not block:
+                break
+            end = base + len(block)
+            i = 0
+            while cut < end:
+                j = max(cut - base, i)
+                quotes ^= block.count(b'"', i, j) & 1
+                line += block.count(b"\n", i, j)
+                i = j
+                while True:
+                    nl = block.find(b"\n", i)
+                    if nl < 0:
+                        break
+                    quotes ^= block.count(b'"', i, nl) & 1
+                    line += 1
+                    i = nl + 1
+                    if not quotes:
+                        break
+                if nl < 0:
+                    # no clean newline left in this block: keep looking in the next one
+                    cut = end
+                    break
+                yield start, base + i, first_line
+                start, first_line = base + i, line
+                cut = start + range_bytes
+            quotes ^= block.count(b'"', i) & 1
+            line += block.count(b"\n", i)
+            base = end
+
+    if start < size:
+        yield start, size, first_line
+
+
+def parse_range(csv_path: str, start: int, end: int, first_line: int, columns: Sequence[int]) -> List[Tuple[str, ...]]:
+    """Validated rows of one byte range (runs in a worker process)."""
+    with open(csv_path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    reader = csv.reader(io.StringIO(data.decode("utf-8"), newline=""))
+    return list(csv_rows(reader, columns, first_line - 1))
+
+
+def iter_csv_rows_parallel(
+    csv_path: str | Path,
+    workers: int,
+    progress: Optional[ProgressCallback] = None,
+    cancel: Optional[Any] = None,
+    range_bytes: int = RANGE_BYTES,
+) -> Iterator[List[Tuple[str, ...]]]:
+    """
+    Chunks of validated row tuples (FIELDS order) from csv_path, in file
+    order, parsed by `workers` processes. Raises the first ValueError in
+    the file (with its line number) when the parse reaches it; setting
+    cancel raises ImportCancelled. Only a few ranges per worker are in
+    flight at once, so memory stays bounded.
+    """
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(f"CSV file not found: {csv_path}")
+
+    header, offset, header_lines = read_header(csv_path)
+    columns = csv_columns(header)
+    total = csv_path.stat().st_size
+    ranges = plan_ranges(csv_path, offset, header_lines + 1, range_bytes)
+
+    # spawn, not fork: the app forks from a process with Tk and worker threads running
+    pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+    pending: Deque[Tuple[ByteRange, Future]] = deque()
+
+    def submit() -> None:
+        r = next(ranges, None)
+        if r is not None:
+            pending.append((r, pool.submit(parse_range, str(csv_path), *r, columns)))
+
+    try:
+        for _ in range(workers * 2):
+            submit()
+        rows = 0
+        while pending:
+            r, future = pending.popleft()
+            chunk = future.result()
+            submit()
+            if cancel is not None and cancel.is_set():
+                raise ImportCancelled()
+            rows += len(chunk)
+            if chunk:
+                yield chunk
+            if progress:
+                progress(rows, r[1], total)
+        if progress:
+            progress(rows, total, total)
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
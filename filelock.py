@@ -0,0 +1,74 @@
+# filelock.py
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, one instance per data file
+    fcntl = None
+
+# Advisory lock shared by every process (and thread) that writes one data
+# file. It lives on a sidecar (books.json.lock) because books.json itself is
+# replaced by rename on every save, which would leave a lock on the old inode.
+#
+#   with lock.exclusive():   # writers: read-check-write as one step
+#   with lock.shared():      # readers that touch more than one file
+#
+# Holding is per thread and re-entrant; an exclusive request inside a
+# shared hold upgrades it until the inner block ends.
+
+_SHARED = 1
+_EXCLUSIVE = 2
+
+
+class FileLock:
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._local = threading.local()
+
+    def shared(self):
+        return self._hold(_SHARED)
+
+    def exclusive(self):
+        return self._hold(_EXCLUSIVE)
+
+    @contextmanager
+    def _hold(self, want: int) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+
+        state = self._local
+        if not getattr(state, "depth", 0):
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            state.fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+            state.mode = 0
+            state.depth = 0
+
+        outer = state.mode
+        try:
+            if want > outer:
+                # flock() on our own descriptor: threads of this process exclude each other too
+                fcntl.flock(state.fd, fcntl.LOCK_EX if want == _EXCLUSIVE else fcntl.LOCK_SH)
+                state.mode = want
+        except BaseException:
+            if not state.depth:
+                os.close(state.fd)
+            raise
+
+        state.depth += 1
+        try:
+            yield
+        finally:
+            state.depth -= 1
+            if not state.depth:
+                os.close(state.fd)  # releases the lock
+                state.mode = 0
+            elif state.mode != outer:
+                fcntl.flock(state.fd, fcntl.LOCK_SH)
+                state.mode = outer
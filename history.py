@@ -0,0 +1,147 @@
+# history.py
+from __future__ import annotations
+
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+from models import Book
+
+# Undo / redo for the app. Each entry holds the other side of one change,
+# sized by the change rather than by the catalog:
+#
+#   RecordChange    edits, deletes, bulk edits: (no, before, after) per record,
+#                   plus the "no" that followed it, so a delete undoes in place
+#   OrderChange     a sort: the order of "no"s before it (a permutation)
+#   SnapshotChange  imports, merges, default restores: the backup taken
+#                   just before (see backup_store.py)
+#
+# Applying an entry swaps what it holds with the current state, so the same
+# entry, applied again, is its redo. MainApp does the applying; here are
+# only the stacks and their memory cap (the oldest entries go first).
+
+# default cap on what the history keeps alive
+HISTORY_BYTES = 32 * 1024 * 1024
+
+# rough per-object costs used for the cap
+_BOOK_BYTES = 480
+_ENTRY_BYTES = 200
+_REF_BYTES = 8
+
+
+# (no, before, after, following): None = the record did not exist on that
+# side; following = the "no" after it while it existed (None = it was last)
+Change = Tuple[str, Optional[Book], Optional[Book], Optional[str]]
+
+
+class RecordChange:
+    def __init__(self, label: str, changes: Sequence[Change]):
+        self.label = label
+        self.changes: List[Change] = list(changes)
+        self.size = _ENTRY_BYTES + sum(
+            3 * _REF_BYTES + _book_bytes(before) + _book_bytes(after) for _no, before, after, _f in self.changes
+        )
+
+    def swap(self) -> Tuple[List[Book], List[str], List[Tuple[Book, Optional[str]]]]:
+        """
+        (upserts, deletes, placed) that bring back the before images: placed
+        are records to re-add in front of their old successor (see
+        BookCatalog.insert_before). Afterwards the entry reverses them.
+        """
+        upserts, deletes, placed = [], [], []
+        for no, before, after, following in self.changes:
+            if before is None:
+                deletes.append(no)
+            elif after is None:
+                placed.append((before, following))
+            else:
+                upserts.append(before)
+        self.changes = [(no, after, before, following) for no, before, after, following in self.changes]
+        return upserts, deletes, placed
+
+
+class OrderChange:
+    def __init__(self, label: str, order: List[str]):
+        self.label = label
+        # the "no"s in the order to go back to (the strings are the catalog's own)
+        self.order = order
+        self.size = _ENTRY_BYTES + _REF_BYTES * len(order)
+
+    def swap(self, current: List[str]) -> List[str]:
+        """The order to restore; current (the order now) is kept for the way back."""
+        order, self.order = self.order, current
+        return order
+
+
+class SnapshotChange:
+    def __init__(self, label: str, backup: str):
+        self.label = label
+        # backup-store manifest (or books.json copy) of the state to go back to
+        self.backup = backup
+        self.size = _ENTRY_BYTES
+
+
+class History:
+    def __init__(self, limit_bytes: int = HISTORY_BYTES):
+        self.limit_bytes = limit_bytes
+        self._undo: Deque = deque()
+        self._redo: List = []
+        self.size = 0
+
+    def record(self, entry) -> None:
+        """A new change: it can be undone, and whatever was undone before can no longer be redone."""
+        for old in self._redo:
+            self.size -= old.size
+        self._redo.clear()
+        self._undo.append(entry)
+        self.size += entry.size
+        self._trim()
+
+    def undo(self):
+        """The entry to apply for an undo (it moves to the redo stack), or None."""
+        if not self._undo:
+            return None
+        entry = self._undo.pop()
+        self._redo.append(entry)
+        return entry
+
+    def redo(self):
+        """The entry to apply for a redo (it moves back to the undo stack), or None."""
+        if not self._redo:
+            return None
+        entry = self._redo.pop()
+        self._undo.append(entry)
+        return entry
+
+    def resize(self, entry) -> None:
+        """Re-count an entry whose contents were swapped (an order may have changed length)."""
+        size = entry.size
+        if isinstance(entry, OrderChange):
+            entry.size = _ENTRY_BYTES + _REF_BYTES * len(entry.order)
+        self.size += entry.size - size
+        self._trim()
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self.size = 0
+
+    @property
+    def undo_label(self) -> Optional[str]:
+        return self._undo[-1].label if self._undo else None
+
+    @property
+    def redo_label(self) -> Optional[str]:
+        return self._redo[-1].label if self._redo else None
+
+    def _trim(self) -> None:
+        # oldest undo steps first; an entry bigger than the whole cap is not kept at all
+        while self.size > self.limit_bytes and self._undo:
+            self.size -= self._undo.popleft().size
+        while self.size > self.limit_bytes and self._redo:
+            self.size -= self._redo.pop(0).size
+
+
+def _book_bytes(book: Optional[Book]) -> int:
+    if book is None:
+        return 0
+    return _BOOK_BYTES + sum(len(v) for v in book.values())
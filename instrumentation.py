@@ -0,0 +1,223 @@
+# instrumentation.py
+from __future__ import annotations
+
+import cProfile
+import functools
+import io
+import json
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+# bucket i holds durations below 2**i microseconds; the last one is open-ended (~36 min)
+BUCKETS = 32
+
+
+class Histogram:
+    """
+    Durations of one kind of call, in power-of-two microsecond buckets.
+    Fixed size no matter how many calls are recorded; percentiles are
+    read off the buckets, so they are upper bounds within a factor of two.
+    """
+
+    __slots__ = ("count", "total_ms", "min_ms", "max_ms", "items", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = 0.0
+        self.max_ms = 0.0
+        self.items = 0          # rows / records the calls handled, when the caller says
+        self.buckets = [0] * BUCKETS
+
+    def record(self, ms: float, items: int = 0) -> None:
+        if not self.count or ms < self.min_ms:
+            self.min_ms = ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+        self.count += 1
+        self.total_ms += ms
+        self.items += items
+        self.buckets[min(BUCKETS - 1, int(ms * 1000.0).bit_length())] += 1
+
+    def percentile(self, p: float) -> float:
+        """Upper bound (ms) of the bucket holding the p-th percentile call."""
+        if not self.count:
+            return 0.0
+        rank = p / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank and n:
+                return min(self.max_ms, (2 ** i) / 1000.0)
+        return self.max_ms
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "min_ms": round(self.min_ms, 3),
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max_ms, 3),
+            "items": self.items,
+            # bucket upper bound in µs -> calls, empty buckets left out
+            "buckets_us": {str(2 ** i): n for i, n in enumerate(self.buckets) if n},
+        }
+
+
+class Instruments:
+    """
+    Opt-in timing of the hot paths: storage calls, page refreshes, search /
+    sort passes and Treeview batches each feed a named Histogram.
+
+    Everything is a no-op while `enabled` is False (one attribute check per
+    call), so the hooks stay in place for good. record() may be called from
+    the storage worker threads. One cProfile capture can be running at a
+    time, on the thread that started it (the Tk thread).
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.started = time.time()
+        self._histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+        self._profile: Optional[cProfile.Profile] = None
+        self.last_profile: Optional[Dict[str, Any]] = None
+
+    # ---------- recording ----------
+    def record(self, name: str, ms: float, items: int = 0) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            hist = self._histograms.get(name)
+            if hist is None:
+                hist = self._histograms[name] = Histogram()
+            hist.record(ms, items)
+
+    @contextmanager
+    def span(self, name: str, items: int = 0) -> Iterator[None]:
+        """Time the with-block under name."""
+        if not self.enabled:
+            yield
+            return
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t) * 1000.0, items)
+
+    def timed(self, name: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+        """Decorator form of span(); a list-like result counts as its length in items, an int as itself (rows written)."""
+        def decorate(fn: Callable[..., Any]) -> Callable[..., Any]:
+            @functools.wraps(fn)
+            def wrapper(*args: Any, **kwargs: Any) -> Any:
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                t = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                finally:
+                    ms = (time.perf_counter() - t) * 1000.0
+                self.record(name, ms, _items(result))
+                return result
+
+            return wrapper
+
+        return decorate
+
+    def wrap_methods(self, obj: Any, names: Iterable[str], prefix: str) -> None:
+        """Time obj.<name>() calls as prefix + name (instance attributes, the class is untouched)."""
+        for name in names:
+            method = getattr(obj, name, None)
+            if callable(method):
+                setattr(obj, name, self.timed(prefix + name)(method))
+
+    # ---------- reading ----------
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            histograms = {name: h.as_dict() for name, h in sorted(self._histograms.items())}
+        return {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "enabled": self.enabled,
+            "since": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started)),
+            "histograms": histograms,
+            "last_profile": self.last_profile,
+        }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms = {}
+        self.started = time.time()
+
+    def export_json(self, path: str | Path) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+
+    # ---------- cProfile ----------
+    @property
+    def profiling(self) -> bool:
+        return self._profile is not None
+
+    def start_profile(self) -> None:
+        if self._profile is None:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+
+    def stop_profile(self, label: str = "", dump_path: Optional[str | Path] = None, top: int = 30) -> Dict[str, Any]:
+        """
+        Stop the capture and keep a summary (top functions by cumulative time)
+        as last_profile. dump_path also saves the raw stats for snakeviz /
+        pstats.
+        """
+        prof, self._profile = self._profile, None
+        if prof is None:
+            return {}
+        prof.disable()
+
+        out = io.StringIO()
+        stats = pstats.Stats(prof, stream=out)
+        stats.sort_stats("cumulative").print_stats(top)
+        if dump_path:
+            try:
+                stats.dump_stats(str(dump_path))
+            except OSError:
+                dump_path = None  # the summary is still kept
+
+        self.last_profile = {
+            "at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "action": label,
+            "total_ms": round(stats.total_tt * 1000.0, 3),
+            "dump": str(dump_path) if dump_path else None,
+            "top": _top_lines(out.getvalue()),
+        }
+        return self.last_profile
+
+
+def _items(result: Any) -> int:
+    if isinstance(result, bool) or isinstance(result, (str, bytes)):
+        return 0
+    if isinstance(result, int):
+        return result
+    try:
+        return len(result)
+    except TypeError:
+        return 0
+
+
+def _top_lines(text: str) -> List[str]:
+    # pstats prints a preamble, then the column header and one line per function
+    lines = text.splitlines()
+    for i, line in enumerate(lines):
+        if line.lstrip().startswith("ncalls"):
+            return [s.rstrip() for s in lines[i:] if s.strip()]
+    return [s.rstrip() for s in lines if s.strip()]
+
+
+# the one instance the app and its modules record into (MainApp turns it on)
+instruments = Instruments()
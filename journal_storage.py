@@ -0,0 +1,244 @@
+# journal_storage.py
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import List, Dict, Any, Iterable, Optional, Sequence
+
+from models import Book
+from storage import BookStorage
+
+
+class JournaledBookStorage(BookStorage):
+    """
+    BookStorage that appends edits to a small log instead of rewriting books.json.
+
+    data/books.json        -> last compacted snapshot (always written via temp file + rename)
+    data/books.json.journal -> one JSON line per upsert/delete (or batch) since that snapshot
+
+    load_books() replays the journal over the snapshot. Once the journal
+    passes compact_threshold bytes it is folded into a new snapshot on a
+    background thread. A torn last line (crash mid-append) is ignored.
+
+    Other processes may append to the same journal: appends and snapshot
+    swaps hold the shared file lock exclusively, loads hold it shared so
+    they never pair a new snapshot with an old journal.
+    """
+
+    COMPACT_THRESHOLD = 4 * 1024 * 1024
+
+    def __init__(self, data_path: str | Path, compact_threshold: int = COMPACT_THRESHOLD, binary_snapshot: bool = True):
+        super().__init__(data_path, binary_snapshot=binary_snapshot)
+        self.journal_path = self.data_path.with_name(self.data_path.name + ".journal")
+        self.compact_threshold = compact_threshold
+
+        self._lock = threading.RLock()
+        self._compactor: Optional[threading.Thread] = None
+
+        # snapshot + journal, replayed
+        self._state_stamp: Any = None
+        self._state_books: Sequence[Book] = []
+
+    # ---------- stamps ----------
+    def _journal_size(self) -> int:
+        try:
+            return os.stat(self.journal_path).st_size
+        except OSError:
+            return 0
+
+    def _journal_stamp(self) -> Optional[tuple]:
+        try:
+            st = os.stat(self.journal_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def stamp(self) -> Any:
+        return (self._file_stamp(), self._journal_stamp())
+
+    # ---------- load ----------
+    def load_books(self) -> Sequence[Book]:
+        with self.lock.shared(), self._lock:
+            stamp = self.stamp()
+            if stamp == self._state_stamp:
+                self._saw(stamp, self._state_books, self._cache_version)
+                return self._state_books
+
+            snapshot = super().load_books()
+            books = self._replay(snapshot, self._read_journal())
+
+            self._state_stamp = self.stamp()
+            self._state_books = books
+            self._saw(self._state_stamp, books, self.version)
+            return books
+
+    def _read_journal(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        try:
+            with self.journal_path.open("rb") as f:
+                raw = f.read() if limit is None else f.read(limit)
+        except FileNotFoundError:
+            return []
+
+        entries = []
+        for line in raw.splitlines():
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # torn write from a crash mid-append -> skip it
+                continue
+        return entries
+
+    def _replay(self, snapshot: Sequence[Book], entries: List[Dict[str, Any]]) -> Sequence[Book]:
+        if not entries:
+            return snapshot
+
+        # dicts keep insertion order: same positions BookCatalog would give
+        by_no = {b.no: b for b in snapshot}
+        for e in entries:
+            # a batch is one line, so a torn append drops all of it or none
+            for step in e.get("ops", ()) if e.get("op") == "batch" else (e,):
+                op = step.get("op")
+                if op == "upsert":
+                    book = self.normalize_book(step.get("book", {}))
+                    by_no[book.no] = book
+                elif op == "delete":
+                    by_no.pop(str(step.get("no", "")), None)
+        return list(by_no.values())
+
+    # ---------- writes ----------
+    def _write_json(self, books: Sequence[Book]) -> None:
+        """Full rewrite (sort, save, merge): new snapshot, empty journal."""
+        with self._lock:
+            super()._write_json(books)
+            self._drop_journal()
+            self._seen_stamp = self.stamp()
+
+    def _install_snapshot(self, tmp: str) -> None:
+        with self.lock.exclusive(), self._lock:
+            super()._install_snapshot(tmp)
+            self._drop_journal()
+
+    def apply_changes(
+        self,
+        books: Optional[Iterable[Book]],
+        upserts: Iterable[Book] = (),
+        deletes: Iterable[str] = (),
+    ) -> bool:
+        """
+        Append the edits to the journal. Entries from other processes simply
+        interleave; returns True if there were any since this process last
+        read or wrote (its copy is then behind).
+        """
+        ops: List[Dict[str, Any]] = [{"op": "upsert", "book": b.to_dict()} for b in upserts]
+        ops += [{"op": "delete", "no": no} for no in deletes]
+        if not ops:
+            return False
+
+        entry = ops[0] if len(ops) == 1 else {"op": "batch", "ops": ops}
+        data = (json.dumps(entry, ensure_ascii=False) + "\n").encode("utf-8")
+        with self.lock.exclusive(), self._lock:
+            merged = self._changed_elsewhere()
+            if not self.data_path.exists():
+                self._replace_books([])
+            with self.journal_path.open("ab") as f:
+                if f.tell() and not self._ends_with_newline():
+                    # finish a torn line so this entry starts on its own
+                    data = b"\n" + data
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            if not merged:
+                # the seen list lags our own appends, which merging tolerates (they are on both sides)
+                self._seen_stamp = self.stamp()
+            size = self._journal_size()
+
+        if size > self.compact_threshold:
+            self.compact_in_background()
+        return merged
+
+    # ---------- compaction ----------
+    def compact(self) -> None:
+        """Fold the journal into a new books.json snapshot."""
+        with self.lock.exclusive(), self._lock:
+            limit = self._journal_size()
+            if limit == 0:
+                return
+            snapshot_stamp = self._file_stamp()
+            seen = (self._seen_stamp, self._seen_books, self.version)
+            replaced = self._replaced
+            snapshot = super().load_books()
+            self._saw(*seen)  # the bare snapshot is not what callers have seen
+            self._replaced = replaced
+            entries = self._read_journal(limit)
+            version = max(self.version, self._peek_version()) + 1
+
+        # the slow part runs unlocked, edits keep appending meanwhile
+        books = self._replay(snapshot, entries)
+        tmp = self._dump_tmp(books, version)
+
+        with self.lock.exclusive(), self._lock:
+            if self._file_stamp() != snapshot_stamp:
+                # someone rewrote the snapshot meanwhile (save, import): ours is out of date
+                os.unlink(tmp)
+                return
+
+            current = not self._changed_elsewhere()
+            with self.journal_path.open("rb") as f:
+                f.seek(limit)
+                tail = f.read()
+
+            os.replace(tmp, self.data_path)
+            if tail:
+                self._rewrite_journal(tail)
+            else:
+                self._drop_journal()
+
+            self._cache_stamp = stamp = self._file_stamp()
+            self._cache_books = books
+            self._cache_version = self.version = version
+            if current:
+                self._seen_stamp = self.stamp()
+
+        self._write_binary_snapshot(books, stamp)
+
+    def compact_in_background(self) -> None:
+        with self._lock:
+            if self._compactor is not None and self._compactor.is_alive():
+                return
+            # not a daemon: interpreter exit waits for the snapshot to land
+            self._compactor = threading.Thread(target=self.compact, name="journal-compact")
+            self._compactor.start()
+
+    def _ends_with_newline(self) -> bool:
+        with self.journal_path.open("rb") as f:
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+
+    def _rewrite_journal(self, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(prefix=self.journal_path.name + ".", suffix=".tmp", dir=self.journal_path.parent)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+
+    def _drop_journal(self) -> None:
+        try:
+            self.journal_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    # ---------- backups need the replayed state on disk ----------
+    def backup_to_path(self, backup_path: str | Path) -> str:
+        self.compact()
+        return super().backup_to_path(backup_path)
+
+    def _backup_to_store(self, reason: str = "import_csv") -> str:
+        # the replayed books as they are in memory: compacting first would need a
+        # readable snapshot, and a broken one is itself backed up while loading
+        return self._backup_books_to_store(self.load_books(), reason)
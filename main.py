@@ -1,5 +1,9 @@
-from app import MainApp
+import time
+
+STARTED = time.perf_counter()
+
+from app import MainApp  # noqa: E402  (imported after STARTED so the startup report covers it)
 
 if __name__ == "__main__":
-    app = MainApp()
+    app = MainApp(started=STARTED)
     app.mainloop()
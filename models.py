@@ -1,28 +1,134 @@
-from dataclasses import dataclass, asdict
+# models.py
+from __future__ import annotations
+
+import math
+import re
+from typing import Any, Dict, Optional, Tuple
+
+FIELDS = ("no", "title", "genre", "author", "price", "year")
+
+# bits in Book.valid
+NO_OK = 1
+PRICE_OK = 2
+YEAR_OK = 4
+
+
+def parse_int(text: str) -> Tuple[int, bool]:
+    try:
+        return int(text), True
+    except ValueError:
+        return 0, False
+
+
+def parse_float(text: str) -> Tuple[float, bool]:
+    try:
+        value = float(text)
+    except ValueError:
+        return 0.0, False
+    if math.isnan(value):
+        # "nan" parses but compares unordered, which would break the sorted indexes: treat it as missing
+        return 0.0, False
+    return value, True
+
+
+_RUNS = re.compile(r"\d+|\D+")
+
+
+def natural_key(text: str) -> Tuple[tuple, ...]:
+    """
+    Catalog-number order: digit runs compare as numbers, so "D2" < "D10"
+    and "001" < "2". Equal numbers fall back to the digits ("001" < "1"),
+    numbers sort before text, text compares casefolded.
+    """
+    return tuple(
+        (0, int(run), run) if run.isdigit() else (1, 0, run.casefold())
+        for run in _RUNS.findall(text)
+    )
 
 
-@dataclass
 class Book:
-    no: str
-    title: str
-    genre: str
-    author: str
-    price: float
-    year: int
-
-    def to_dict(self) -> dict:
-        d = asdict(self)
-        d["price"] = float(self.price)
-        d["year"] = int(self.year)
-        return d
+    """
+    One catalog record.
+
+    The six fields are kept exactly as entered (strings, so "0000" or "12.50"
+    round-trip unchanged). no / price / year are also parsed once here into
+    no_num / price_num / year_num; `valid` has a bit set for each one that
+    parsed (unparsable ones hold 0). Books are treated as immutable: an edit
+    makes a new Book, so the parsed values never go stale.
+
+    The collation keys used for sorting (folded() for text, natural_no()
+    for no) are built on first use and cached on the record, so re-sorting
+    only pays for records that changed since the last sort.
+    """
+
+    __slots__ = (
+        "no", "title", "genre", "author", "price", "year",
+        "no_num", "price_num", "year_num", "valid", "_folded", "_natural",
+    )
+
+    def __init__(self, no: str = "", title: str = "", genre: str = "", author: str = "", price: str = "", year: str = ""):
+        self.no = no
+        self.title = title
+        self.genre = genre
+        self.author = author
+        self.price = price
+        self.year = year
+
+        self.no_num, no_ok = parse_int(no)
+        self.price_num, price_ok = parse_float(price)
+        self.year_num, year_ok = parse_int(year)
+        self.valid = (NO_OK if no_ok else 0) | (PRICE_OK if price_ok else 0) | (YEAR_OK if year_ok else 0)
+        self._folded: Optional[Tuple[str, str, str]] = None
+        self._natural: Optional[Tuple[tuple, ...]] = None
+
+    def folded(self) -> Tuple[str, str, str]:
+        """Casefolded (title, genre, author), computed once."""
+        keys = self._folded
+        if keys is None:
+            keys = self._folded = (self.title.casefold(), self.genre.casefold(), self.author.casefold())
+        return keys
+
+    def natural_no(self) -> Tuple[tuple, ...]:
+        """natural_key(no), computed once."""
+        key = self._natural
+        if key is None:
+            key = self._natural = natural_key(self.no)
+        return key
+
+    # ---------- dict boundary (JSON / CSV) ----------
+    def to_dict(self) -> Dict[str, str]:
+        return {
+            "no": self.no,
+            "title": self.title,
+            "genre": self.genre,
+            "author": self.author,
+            "price": self.price,
+            "year": self.year,
+        }
 
     @staticmethod
-    def from_dict(d: dict) -> "Book":
+    def from_dict(d: Dict[str, Any]) -> Book:
+        """Build from a loaded/imported dict; values are stringified and stripped."""
         return Book(
-            no=str(d.get("no", "")),
-            title=str(d.get("title", "")),
-            genre=str(d.get("genre", "")),
-            author=str(d.get("author", "")),
-            price=float(d.get("price", 0)),
-            year=int(d.get("year", 0)),
-        )
\ No newline at end of file
+            no=str(d.get("no", "")).strip(),
+            title=str(d.get("title", "")).strip(),
+            genre=str(d.get("genre", "")).strip(),
+            author=str(d.get("author", "")).strip(),
+            price=str(d.get("price", "")).strip(),
+            year=str(d.get("year", "")).strip(),
+        )
+
+    def values(self) -> Tuple[str, ...]:
+        """Field values in FIELDS order (Treeview rows, CSV rows)."""
+        return (self.no, self.title, self.genre, self.author, self.price, self.year)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Book):
+            return NotImplemented
+        return self.values() == other.values()
+
+    def __hash__(self) -> int:
+        return hash(self.values())
+
+    def __repr__(self) -> str:
+        return f"Book(no={self.no!r}, title={self.title!r})"
@@ -1,16 +1,31 @@
-import csv
-import os
-import shutil
-import tempfile
-import time
 import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 
+from models import Book
+from storage import MERGE_POLICIES, ImportCancelled
+from pages.progress_dialog import run_with_progress
+from search_index import SEARCH_LIMIT, search_text
+from pages.virtual_table import VirtualTable
+
+
+# what each merge_csv policy does with the CSV rows, for the Merge CSV prompt
+MERGE_POLICY_TEXT = {
+    "upsert": "Books in the CSV are added or updated by No.",
+    "insert": "Only books whose No. is new are added; existing ones stay as they are.",
+    "update": "Only books whose No. already exists are updated; new ones are skipped.",
+}
+
 
 class BookEditPage(tk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent, bg=app.BG)
         self.app = app
+
+        # app.data_version this page last rendered (show_page skips refresh while it matches)
+        self.data_version_seen = None
+        self._query = ""
+        self._capped = False  # the table holds only the first SEARCH_LIMIT matches
+        app.on_catalog_change(self._on_catalog_change)
         self._build_ui()
 
     def _build_ui(self):
@@ -29,6 +44,9 @@ class BookEditPage(tk.Frame):
         )
         header.grid(row=0, column=0, columnspan=2, sticky="ew")
 
+        self.busy_label = tk.Label(self, text="", bg=self.app.BG, fg=self.app.FG, font=("Arial", 12, "italic"), padx=18)
+        self.busy_label.grid(row=0, column=1, sticky="e")
+
         # ---- Left form panel ----
         form_wrap = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
         form_wrap.grid(row=1, column=0, sticky="ns", padx=(18, 10), pady=(0, 18))
@@ -75,6 +93,14 @@ class BookEditPage(tk.Frame):
 
         # CSV IMPORT (extra option)
         ttk.Button(btn_frame, text="Import from CSV", style="App.TButton", command=self.import_from_csv).pack(fill="x", pady=(16, 6))
+        merge_row = tk.Frame(btn_frame, bg=self.app.PANEL_BG)
+        merge_row.pack(fill="x", pady=(6, 0))
+        tk.Label(merge_row, text="Merge as", bg=self.app.PANEL_BG, fg=self.app.FG, width=10, anchor="w").pack(side="left")
+        self.merge_policy_var = tk.StringVar(value=MERGE_POLICIES[0])
+        ttk.Combobox(
+            merge_row, textvariable=self.merge_policy_var, values=MERGE_POLICIES, state="readonly", width=10
+        ).pack(side="left")
+        ttk.Button(btn_frame, text="Merge CSV Updates", style="App.TButton", command=self.merge_from_csv).pack(fill="x", pady=6)
 
         ttk.Button(btn_frame, text="Restore Default Books", style="App.TButton", command=self.restore_defaults).pack(fill="x", pady=(16, 6))
         ttk.Button(btn_frame, text="Save", style="App.TButton", command=self.save).pack(fill="x", pady=6)
@@ -98,81 +124,126 @@ class BookEditPage(tk.Frame):
         search_entry = ttk.Entry(search_bar, textvariable=self.search_var)
         search_entry.grid(row=0, column=1, sticky="ew", padx=10)
         search_entry.bind("<KeyRelease>", lambda e: self.refresh())
+        self.more_label = tk.Label(search_bar, text="", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 11, "italic"))
+        self.more_label.grid(row=0, column=2, sticky="e")
 
         cols = ("no", "title", "genre", "author", "price", "year")
-        self.tree = ttk.Treeview(table_wrap, columns=cols, show="headings")
-        self.tree.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 12))
-
         headings = {"no": "No.", "title": "Title", "genre": "Genre", "author": "Author", "price": "Price", "year": "Year"}
         widths = {"no": 70, "title": 260, "genre": 140, "author": 220, "price": 90, "year": 90}
-        for c in cols:
-            self.tree.heading(c, text=headings[c])
-            self.tree.column(c, width=widths[c], anchor="w")
-
-        scroll = ttk.Scrollbar(table_wrap, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scroll.set)
-        scroll.grid(row=1, column=1, sticky="ns", pady=(0, 12))
+        # Ctrl/Shift-click picks several rows: Delete Selected and Add / Update then act on all of them at once
+        self.table = VirtualTable(table_wrap, cols, headings, widths, bg=self.app.PANEL_BG, selectmode="extended")
+        self.table.grid(row=1, column=0, sticky="nsew", padx=12, pady=(0, 12))
+        self.tree = self.table.tree
 
-        self.tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.table.bind_select(self.on_select)
 
     # ---------------- Core actions ----------------
     def refresh(self):
-        self.app.reload_books()
+        self.app.reload_books(on_done=self._render)
 
+    def _render(self):
         query = self.search_var.get().strip().lower()
-        self.tree.delete(*self.tree.get_children())
+        # one row past the limit tells whether a query has more matches than are listed
+        rows = self.app.catalog.search(query, SEARCH_LIMIT + 1 if query else None)
+        self._capped = bool(query) and len(rows) > SEARCH_LIMIT
+        if self._capped:
+            rows = rows[:SEARCH_LIMIT]
+        self.more_label.config(text=f"First {SEARCH_LIMIT:,} matches" if self._capped else "")
+        self.table.set_rows(rows)
+        self._query = query
+        self.data_version_seen = self.app.data_version
+
+    def _on_catalog_change(self, change):
+        # patch single-record edits into the table instead of re-rendering it
+        if self.data_version_seen is None:
+            return  # not rendered yet / already stale: the next refresh redraws anyway
+        if self._capped:
+            # any change can move which matches come first; looking them up again is cheap
+            self._render()
+            return
+        query = self._query
 
-        for b in self.app.books:
-            s = f'{b.get("no","")} {b.get("title","")} {b.get("genre","")} {b.get("author","")} {b.get("price","")} {b.get("year","")}'.lower()
-            if query and query not in s:
-                continue
-            self.tree.insert("", "end", values=(b.get("no",""), b.get("title",""), b.get("genre",""), b.get("author",""), b.get("price",""), b.get("year","")))
+        def keep(book):
+            return not query or query in search_text(book)
+
+        if self.table.apply_change(change, keep, self.app.catalog.position):
+            self.data_version_seen = self.app.data_version
+        else:
+            self.data_version_seen = None
+
+    def _sync(self):
+        # an edit normally reaches the table through _on_catalog_change; redraw only if it could not
+        if self.data_version_seen != self.app.data_version:
+            self._render()
+
+    def set_busy(self, busy):
+        self.busy_label.config(text="Working..." if busy else "")
 
     def on_select(self, _event=None):
-        sel = self.tree.selection()
+        sel = self.table.selected_rows()
         if not sel:
             return
-        no, title, genre, author, price, year = self.tree.item(sel[0], "values")
-        self.vars["no"].set(no)
-        self.vars["title"].set(title)
-        self.vars["genre"].set(genre)
-        self.vars["author"].set(author)
-        self.vars["price"].set(price)
-        self.vars["year"].set(year)
+        # several rows: show what they have in common, blank where they differ (always "no")
+        for k, v in self.vars.items():
+            values = {getattr(b, k) for b in sel}
+            v.set(values.pop() if len(values) == 1 else "")
 
     def add_update(self):
-        book = {k: self.vars[k].get().strip() for k in self.vars.keys()}
-        if not book["no"] or not book["title"]:
+        form = {k: self.vars[k].get().strip() for k in self.vars.keys()}
+        sel = self.table.selected_rows()
+        if not form["no"] and len(sel) > 1:
+            self._update_selected(sel, form)
+            return
+
+        book = Book(**form)
+        if not book.no or not book.title:
             messagebox.showwarning("Missing Data", "Please enter at least: No. and Title.")
             return
 
-        self.app.reload_books()
+        def apply():
+            self.app.upsert_book(book)
+            self._sync()
 
-        updated = False
-        for i, b in enumerate(self.app.books):
-            if b.get("no", "") == book["no"]:
-                self.app.books[i] = book
-                updated = True
-                break
+        self.app.reload_books(on_done=apply)
 
-        if not updated:
-            self.app.books.append(book)
+    def _update_selected(self, sel, form):
+        # filled-in fields go to every selected book, blank ones stay as they are; one commit
+        changes = {k: v for k, v in form.items() if v and k != "no"}
+        if not changes:
+            messagebox.showinfo("Update Selected", "Fill in the fields to change on all selected books.")
+            return
+        if not messagebox.askyesno("Update Selected", f"Set {', '.join(changes)} on {len(sel):,} selected books?"):
+            return
+
+        nos = [b.no for b in sel]
 
-        self.app.save_books()
-        self.refresh()
+        def apply():
+            # start from the current records: the reload may have brought in other edits
+            books = []
+            for no in nos:
+                b = self.app.catalog.get(no)
+                if b is not None:
+                    books.append(Book(**{**b.to_dict(), **changes}))
+            self.app.apply_batch(upserts=books)
+            self._sync()
+
+        self.app.reload_books(on_done=apply)
 
     def delete_selected(self):
-        sel = self.tree.selection()
+        sel = self.table.selected_rows()
         if not sel:
             messagebox.showinfo("Delete", "Please select a book first.")
             return
+        if len(sel) > 1 and not messagebox.askyesno("Delete", f"Delete the {len(sel):,} selected books?"):
+            return
 
-        no = self.tree.item(sel[0], "values")[0]
+        nos = [b.no for b in sel]
 
-        self.app.reload_books()
-        self.app.books = [b for b in self.app.books if b.get("no", "") != no]
-        self.app.save_books()
-        self.refresh()
+        def apply():
+            self.app.apply_batch(deletes=nos)
+            self._sync()
+
+        self.app.reload_books(on_done=apply)
 
         for v in self.vars.values():
             v.set("")
@@ -185,20 +256,26 @@ class BookEditPage(tk.Frame):
         if not ok:
             return
 
-        self.app.storage.restore_defaults()
-        self.refresh()
-        messagebox.showinfo("Done", "Default books restored successfully.")
+        def done(backup_used):
+            self.app.record_snapshot("Restore Defaults", backup_used)
+            self.refresh()
+            messagebox.showinfo("Done", "Default books restored successfully.")
+
+        self.app.run_write(
+            self.app.storage.restore_defaults,
+            on_done=done,
+            on_error=lambda e: messagebox.showerror("Restore Error", str(e)),
+            in_sync=False,
+        )
 
     def save(self):
-        self.app.save_books()
-        messagebox.showinfo("Saved", "Saved to data/books.json")
+        self.app.save_books(on_done=lambda _result: messagebox.showinfo("Saved", "Saved to data/books.json"))
 
     def reload(self):
-        self.refresh()
-        messagebox.showinfo("Reloaded", "Reloaded from data/books.json")
+        self.app.reload_books(on_done=lambda: (self._render(), messagebox.showinfo("Reloaded", "Reloaded from data/books.json")))
 
     def export_csv(self):
-        self.app.reload_books()
+        """Export what the table shows: the current search, in the saved order (every match, not just the first listed)."""
         path = filedialog.asksaveasfilename(
             defaultextension=".csv",
             filetypes=[("CSV Files", "*.csv")],
@@ -207,18 +284,19 @@ class BookEditPage(tk.Frame):
         if not path:
             return
 
-        headers = ["no", "title", "genre", "author", "price", "year"]
-        try:
-            with open(path, "w", newline="", encoding="utf-8") as f:
-                w = csv.DictWriter(f, fieldnames=headers)
-                w.writeheader()
-                for b in self.app.books:
-                    w.writerow({h: b.get(h, "") for h in headers})
-        except Exception as e:
-            messagebox.showerror("Export Error", str(e))
-            return
+        query = self.search_var.get().strip().lower()
 
-        messagebox.showinfo("Exported", f"CSV exported:\n{path}")
+        # streamed straight from storage in the background; no sort: the table shows the saved order
+        run_with_progress(
+            self.app,
+            "Exporting CSV",
+            self.app.storage.export_csv,
+            path,
+            query,
+            None,
+            on_done=lambda rows: messagebox.showinfo("Exported", f"CSV exported ({rows:,} rows):\n{path}"),
+            on_error=lambda e: messagebox.showerror("Export Error", str(e)),
+        )
 
     # ---------------- CSV Import with Backup ----------------
     def import_from_csv(self):
@@ -233,7 +311,7 @@ class BookEditPage(tk.Frame):
             "Backup current data?",
             "Before importing, do you want to save a backup of the current books.json?\n\n"
             "Yes = choose location\n"
-            "No = auto-save to TEMP file\n"
+            "No = keep it in the backup store (data/backups)\n"
             "Cancel = abort import"
         )
         if answer is None:
@@ -249,17 +327,89 @@ class BookEditPage(tk.Frame):
             if not backup_path:
                 backup_path = None  # fallback to temp
 
-        try:
-            backup_used = self.app.storage.import_csv_with_backup(csv_file, backup_path=backup_path)
-        except Exception as e:
-            messagebox.showerror("Import Error", f"Could not import CSV:\n\n{e}")
+        def finished(backup_used):
+            self.app.record_snapshot("Import CSV", backup_used)
+            if backup_path:
+                messagebox.showinfo("Import Completed", f"CSV imported successfully.\n\nBackup saved to:\n{backup_used}")
+            else:
+                messagebox.showinfo("Import Completed", f"CSV imported successfully.\n\nBackup stored as:\n{backup_used}")
+
+            self.refresh()
+            if hasattr(self.app, "show_page"):
+                self.app.show_page("book_list")
+
+        def failed(error):
+            if isinstance(error, ImportCancelled):
+                # rows were only staged, so the pre-import books are still in place
+                messagebox.showinfo("Import Cancelled", "Import cancelled. Your books are unchanged.")
+                self.refresh()
+                return
+            messagebox.showerror("Import Error", f"Could not import CSV:\n\n{error}")
+
+        # parse + write on the app's writer thread, progress shown in a dialog
+        run_with_progress(
+            self.app,
+            "Importing CSV",
+            self.app.storage.import_csv_with_backup,
+            csv_file,
+            backup_path,
+            on_done=finished,
+            on_error=failed,
+            cancellable=True,
+            write=True,
+        )
+
+    # ---------------- CSV Merge (supplier updates) ----------------
+    def merge_from_csv(self):
+        csv_file = filedialog.askopenfilename(
+            title="Select CSV with updates",
+            filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
+        )
+        if not csv_file:
             return
 
-        if backup_path:
-            messagebox.showinfo("Import Completed", f"CSV imported successfully.\n\nBackup saved to:\n{backup_used}")
-        else:
-            messagebox.showinfo("Import Completed", f"CSV imported successfully.\n\nBackup saved in TEMP:\n{backup_used}")
+        policy = self.merge_policy_var.get()
+        answer = messagebox.askyesnocancel(
+            f"Merge CSV ({policy})",
+            f"{MERGE_POLICY_TEXT[policy]} Books not in the CSV stay as they are.\n\n"
+            "Also delete books whose No. is not in the CSV?\n\n"
+            "Yes = delete them\n"
+            "No = keep them\n"
+            "Cancel = abort merge"
+        )
+        if answer is None:
+            return
 
-        self.refresh()
-        if hasattr(self.app, "show_page"):
-            self.app.show_page("book_list")
\ No newline at end of file
+        def finished(summary):
+            if summary.inserted or summary.updated or summary.deleted:
+                self.app.record_snapshot("Merge CSV", summary.backup)
+            messagebox.showinfo(
+                "Merge Completed",
+                f"Inserted: {summary.inserted:,}\n"
+                f"Updated: {summary.updated:,}\n"
+                f"Unchanged: {summary.unchanged:,}\n"
+                f"Skipped ({policy}): {summary.skipped:,}\n"
+                f"Deleted: {summary.deleted:,}\n\n"
+                f"Backup stored as:\n{summary.backup}"
+            )
+            self.refresh()
+
+        def failed(error):
+            if isinstance(error, ImportCancelled):
+                messagebox.showinfo("Merge Cancelled", "Merge cancelled. Your books are unchanged.")
+                self.refresh()
+                return
+            messagebox.showerror("Merge Error", f"Could not merge CSV:\n\n{error}")
+
+        run_with_progress(
+            self.app,
+            "Merging CSV",
+            self.app.storage.merge_csv,
+            csv_file,
+            policy,
+            answer,
+            on_done=finished,
+            on_error=failed,
+            cancellable=True,
+            write=True,
+        )
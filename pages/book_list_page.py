@@ -1,12 +1,21 @@
 import tkinter as tk
 from tkinter import ttk
 
+from search_index import SEARCH_LIMIT, search_text
+from pages.virtual_table import VirtualTable
+
 
 class BookListPage(tk.Frame):
     def __init__(self, parent, app):
         super().__init__(parent, bg=app.BG)
         self.app = app
 
+        # app.data_version this page last rendered (show_page skips refresh while it matches)
+        self.data_version_seen = None
+        self._query = ""
+        self._capped = False  # the table holds only the first SEARCH_LIMIT matches
+        app.on_catalog_change(self._on_catalog_change)
+
         self._build_ui()
 
     def _build_ui(self):
@@ -25,6 +34,9 @@ class BookListPage(tk.Frame):
         )
         header.grid(row=0, column=0, sticky="ew")
 
+        self.busy_label = tk.Label(self, text="", bg=self.app.BG, fg=self.app.FG, font=("Arial", 12, "italic"), padx=18)
+        self.busy_label.grid(row=0, column=0, sticky="e")
+
         # Search
         search_bar = tk.Frame(self, bg=self.app.BG)
         search_bar.grid(row=1, column=0, sticky="ew", padx=18)
@@ -37,6 +49,8 @@ class BookListPage(tk.Frame):
         self.search_entry = ttk.Entry(search_bar, textvariable=self.search_var)
         self.search_entry.grid(row=0, column=1, sticky="ew", padx=10)
         self.search_entry.bind("<KeyRelease>", lambda e: self.refresh())
+        self.more_label = tk.Label(search_bar, text="", bg=self.app.BG, fg=self.app.TEXT, font=("Arial", 11, "italic"))
+        self.more_label.grid(row=0, column=2, sticky="e")
 
         # Table
         wrap = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
@@ -45,9 +59,6 @@ class BookListPage(tk.Frame):
         wrap.grid_columnconfigure(0, weight=1)
 
         cols = ("no", "title", "genre", "author", "price", "year")
-        self.tree = ttk.Treeview(wrap, columns=cols, show="headings")
-        self.tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
-
         headings = {
             "no": "No.",
             "title": "Title",
@@ -57,23 +68,43 @@ class BookListPage(tk.Frame):
             "year": "Year",
         }
         widths = {"no": 70, "title": 320, "genre": 140, "author": 220, "price": 90, "year": 90}
-        for c in cols:
-            self.tree.heading(c, text=headings[c])
-            self.tree.column(c, width=widths[c], anchor="w")
-
-        scroll = ttk.Scrollbar(wrap, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scroll.set)
-        scroll.grid(row=0, column=1, sticky="ns", pady=10)
+        self.table = VirtualTable(wrap, cols, headings, widths, bg=self.app.PANEL_BG)
+        self.table.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.tree = self.table.tree
 
     def refresh(self):
-        # Always reload from JSON to show latest data
-        self.app.reload_books()
+        # Always reload from storage (in the background) to show latest data
+        self.app.reload_books(on_done=self._render)
 
+    def _render(self):
         query = self.search_var.get().strip().lower()
-        self.tree.delete(*self.tree.get_children())
+        # one row past the limit tells whether a query has more matches than are listed
+        rows = self.app.catalog.search(query, SEARCH_LIMIT + 1 if query else None)
+        self._capped = bool(query) and len(rows) > SEARCH_LIMIT
+        if self._capped:
+            rows = rows[:SEARCH_LIMIT]
+        self.more_label.config(text=f"First {SEARCH_LIMIT:,} matches" if self._capped else "")
+        self.table.set_rows(rows)
+        self._query = query
+        self.data_version_seen = self.app.data_version
+
+    def _on_catalog_change(self, change):
+        # patch single-record edits into the table instead of re-rendering it
+        if self.data_version_seen is None:
+            return  # not rendered yet / already stale: the next refresh redraws anyway
+        if self._capped:
+            # any change can move which matches come first; looking them up again is cheap
+            self._render()
+            return
+        query = self._query
+
+        def keep(book):
+            return not query or query in search_text(book)
+
+        if self.table.apply_change(change, keep, self.app.catalog.position):
+            self.data_version_seen = self.app.data_version
+        else:
+            self.data_version_seen = None
 
-        for b in self.app.books:
-            s = f'{b["no"]} {b["title"]} {b["genre"]} {b["author"]} {b["price"]} {b["year"]}'.lower()
-            if query and query not in s:
-                continue
-            self.tree.insert("", "end", values=(b["no"], b["title"], b["genre"], b["author"], b["price"], b["year"]))
\ No newline at end of file
+    def set_busy(self, busy):
+        self.busy_label.config(text="Working..." if busy else "")
@@ -1,5 +1,10 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, filedialog
+
+from search_index import search_text
+from sorting import parse_spec
+from pages.progress_dialog import run_with_progress
+from pages.virtual_table import VirtualTable
 
 
 class BookSortPage(tk.Frame):
@@ -7,12 +12,22 @@ class BookSortPage(tk.Frame):
         super().__init__(parent, bg=app.BG)
         self.app = app
 
+        # app.data_version this page last rendered (show_page skips refresh while it matches)
+        self.data_version_seen = None
+        app.on_catalog_change(self._on_catalog_change)
+
         self.all_cols = ("no", "title", "genre", "author", "price", "year")
         self.col_visible = {c: tk.BooleanVar(value=True) for c in self.all_cols}
 
         self.sort_col_var = tk.StringVar(value="title")
         self.order_var = tk.StringVar(value="asc")
         self.search_var = tk.StringVar(value="")
+        self.then_by_var = tk.StringVar(value="")
+        self.view_only_var = tk.BooleanVar(value=False)
+
+        # sort spec while a view-only order is shown, else None (saved order)
+        self._view_sort = None
+        self._query = ""
 
         self._build_ui()
 
@@ -33,6 +48,9 @@ class BookSortPage(tk.Frame):
         )
         header.grid(row=0, column=0, sticky="ew")
 
+        self.busy_label = tk.Label(self, text="", bg=self.app.BG, fg=self.app.FG, font=("Arial", 12, "italic"), padx=18)
+        self.busy_label.grid(row=0, column=0, sticky="e")
+
         # Controls panel
         panel = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
         panel.grid(row=1, column=0, sticky="ew", padx=18, pady=(0, 10))
@@ -51,26 +69,49 @@ class BookSortPage(tk.Frame):
             width=16,
         )
         sort_combo.grid(row=0, column=1, padx=12, pady=12, sticky="w")
+        sort_combo.bind("<<ComboboxSelected>>", lambda e: self._order_changed())
 
         tk.Label(panel, text="Order:", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 12, "bold")).grid(
             row=0, column=2, padx=(24, 12), pady=12, sticky="w"
         )
 
         rb1 = tk.Radiobutton(panel, text="Ascending", variable=self.order_var, value="asc",
-                             bg=self.app.PANEL_BG, fg=self.app.FG, selectcolor=self.app.PANEL_BG)
+                             bg=self.app.PANEL_BG, fg=self.app.FG, selectcolor=self.app.PANEL_BG,
+                             command=self._order_changed)
         rb2 = tk.Radiobutton(panel, text="Descending", variable=self.order_var, value="desc",
-                             bg=self.app.PANEL_BG, fg=self.app.FG, selectcolor=self.app.PANEL_BG)
+                             bg=self.app.PANEL_BG, fg=self.app.FG, selectcolor=self.app.PANEL_BG,
+                             command=self._order_changed)
         rb1.grid(row=0, column=3, sticky="w", padx=(0, 12))
         rb2.grid(row=0, column=4, sticky="w", padx=(0, 12))
 
+        # View only: change the display order without saving it to books.json
+        tk.Checkbutton(
+            panel,
+            text="View only (don't save order)",
+            variable=self.view_only_var,
+            bg=self.app.PANEL_BG,
+            fg=self.app.FG,
+            selectcolor=self.app.PANEL_BG,
+            activebackground=self.app.PANEL_BG,
+            activeforeground=self.app.FG
+        ).grid(row=0, column=5, sticky="w", padx=(12, 12))
+
         # Search row (NEW)
         tk.Label(panel, text="Search:", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 12, "bold")).grid(
             row=1, column=0, padx=12, pady=(0, 12), sticky="w"
         )
         search_entry = ttk.Entry(panel, textvariable=self.search_var)
-        search_entry.grid(row=1, column=1, columnspan=4, padx=12, pady=(0, 12), sticky="ew")
+        search_entry.grid(row=1, column=1, columnspan=2, padx=12, pady=(0, 12), sticky="ew")
         search_entry.bind("<KeyRelease>", lambda e: self._apply_filter_to_table())
 
+        # extra sort keys after Column/Order, e.g. "author, year desc"
+        tk.Label(panel, text="Then by:", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 12, "bold")).grid(
+            row=1, column=3, padx=(24, 12), pady=(0, 12), sticky="w"
+        )
+        then_entry = ttk.Entry(panel, textvariable=self.then_by_var)
+        then_entry.grid(row=1, column=4, columnspan=2, padx=12, pady=(0, 12), sticky="ew")
+        then_entry.bind("<Return>", lambda e: self._order_changed())
+
         # Columns selection block
         tk.Label(panel, text="Show Columns:", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 12, "bold")).grid(
             row=2, column=0, padx=12, pady=(0, 12), sticky="nw"
@@ -108,6 +149,7 @@ class BookSortPage(tk.Frame):
         quick.grid_columnconfigure(2, weight=1)
         quick.grid_columnconfigure(3, weight=1)
         quick.grid_columnconfigure(4, weight=1)
+        quick.grid_columnconfigure(5, weight=1)
 
         ttk.Button(quick, text="Select All", style="App.TButton", command=self.select_all_columns).grid(
             row=0, column=0, sticky="ew", padx=(0, 6)
@@ -122,7 +164,10 @@ class BookSortPage(tk.Frame):
             row=0, column=3, sticky="ew", padx=6
         )
         ttk.Button(quick, text="Reset (Reload)", style="App.TButton", command=self.reset).grid(
-            row=0, column=4, sticky="ew", padx=(6, 0)
+            row=0, column=4, sticky="ew", padx=6
+        )
+        ttk.Button(quick, text="Export View", style="App.TButton", command=self.export_view).grid(
+            row=0, column=5, sticky="ew", padx=(6, 0)
         )
 
         # Table area
@@ -131,9 +176,6 @@ class BookSortPage(tk.Frame):
         table_wrap.grid_rowconfigure(0, weight=1)
         table_wrap.grid_columnconfigure(0, weight=1)
 
-        self.tree = ttk.Treeview(table_wrap, columns=self.all_cols, show="headings")
-        self.tree.grid(row=0, column=0, sticky="nsew", padx=12, pady=12)
-
         headings = {
             "no": "No.",
             "title": "Title",
@@ -143,48 +185,65 @@ class BookSortPage(tk.Frame):
             "year": "Year",
         }
         widths = {"no": 70, "title": 320, "genre": 140, "author": 220, "price": 90, "year": 90}
-        for c in self.all_cols:
-            self.tree.heading(c, text=headings[c])
-            self.tree.column(c, width=widths[c], anchor="w")
-
-        scroll = ttk.Scrollbar(table_wrap, orient="vertical", command=self.tree.yview)
-        self.tree.configure(yscrollcommand=scroll.set)
-        scroll.grid(row=0, column=1, sticky="ns", pady=12)
+        self.table = VirtualTable(table_wrap, self.all_cols, headings, widths, bg=self.app.PANEL_BG)
+        self.table.grid(row=0, column=0, sticky="nsew", padx=12, pady=12)
+        self.tree = self.table.tree
 
     # called automatically by app.show_page()
     def refresh(self):
-        self.app.reload_books()
-        self._fill_table(self.app.books)
         self.apply_columns(show_message=False)
         self._apply_filter_to_table()
 
+    def _on_catalog_change(self, change):
+        # patch single-record edits into the table instead of re-rendering it
+        if self.data_version_seen is None:
+            return  # not rendered yet / already stale: the next refresh redraws anyway
+        query = self._query
+
+        def keep(book):
+            return not query or query in search_text(book)
+
+        if self._view_sort is None:
+            patched = self.table.apply_change(change, keep, self.app.catalog.position)
+        elif change.kind == "reset":
+            patched = False
+        else:
+            # a view-only order: an edit that leaves every sort column alone keeps its place
+            book = change.book if change.kind != "deleted" and keep(change.book) else None
+            cols = [c for c, _ in self._view_sort]
+
+            def same_place(old):
+                return all(getattr(old, c) == getattr(book, c) for c in cols)
+
+            patched = self.table.replace_row(change.no, book, same_place)
+
+        if patched:
+            self.data_version_seen = self.app.data_version
+        else:
+            self.data_version_seen = None
+
+    def set_busy(self, busy):
+        self.busy_label.config(text="Working..." if busy else "")
+
     def _fill_table(self, books):
-        self.tree.delete(*self.tree.get_children())
-        for b in books:
-            self.tree.insert(
-                "",
-                "end",
-                values=(b.get("no", ""), b.get("title", ""), b.get("genre", ""), b.get("author", ""),
-                        b.get("price", ""), b.get("year", ""))
-            )
+        self.table.set_rows(books)
 
     # ---------- NEW: search filter ----------
     def _apply_filter_to_table(self):
-        query = self.search_var.get().strip().lower()
-
         # always start from current saved list order
-        books = self.app.storage.load_books()
+        self.app.reload_books(on_done=self._render_filtered)
 
-        if query:
-            filtered = []
-            for b in books:
-                s = f'{b.get("no","")} {b.get("title","")} {b.get("genre","")} {b.get("author","")} {b.get("price","")} {b.get("year","")}'.lower()
-                if query in s:
-                    filtered.append(b)
-            books = filtered
+    def _render_filtered(self):
+        query = self.search_var.get().strip().lower()
+        if self._view_sort:
+            books = self.app.catalog.sorted_view(self._view_sort, query)
+        else:
+            books = self.app.catalog.search(query)
 
         self._fill_table(books)
         self.apply_columns(show_message=False)
+        self._query = query
+        self.data_version_seen = self.app.data_version
 
     # ---------- NEW: select/deselect all ----------
     def select_all_columns(self):
@@ -215,31 +274,73 @@ class BookSortPage(tk.Frame):
 
     # ---------- sorting ----------
     def sort_books(self):
-        self.app.reload_books()
-
-        col = self.sort_col_var.get()
-        reverse = (self.order_var.get() == "desc")
-
-        def key_func(x):
-            v = x.get(col, "")
-            if col in ("no", "year"):
-                try:
-                    return int(v)
-                except Exception:
-                    return 0
-            if col == "price":
-                try:
-                    return float(v)
-                except Exception:
-                    return 0.0
-            return str(v).lower()
-
-        self.app.books.sort(key=key_func, reverse=reverse)
-        self.app.save_books()
+        self.app.reload_books(on_done=self._sort_loaded)
+
+    def _sort_spec(self):
+        # Column/Order first, then the "Then by" keys; None (after a warning) if those don't parse
+        spec = [(self.sort_col_var.get(), self.order_var.get() == "desc")]
+        try:
+            spec += parse_spec(self.then_by_var.get())
+        except ValueError as e:
+            messagebox.showwarning("Sort", str(e))
+            return None
+        return spec
+
+    def _sort_loaded(self):
+        spec = self._sort_spec()
+        if spec is None:
+            return
+
+        if self.view_only_var.get():
+            self._view_sort = spec
+        else:
+            # one column walks the catalog's column index, more keys use cached collation keys
+            self._view_sort = None
+            self.app.sort_catalog(spec)
 
         # refresh view respecting search + visible columns
-        self._apply_filter_to_table()
+        self._render_filtered()
+
+    def _order_changed(self):
+        # a view-only order follows the Column/Order controls straight away
+        if self._view_sort is None:
+            return
+        spec = self._sort_spec()
+        if spec is None:
+            return
+        self._view_sort = spec
+        self._render_filtered()
+
+    # ---------- export ----------
+    def export_view(self):
+        """Export what this page shows: current search, its order and visible columns."""
+        # the order the table shows: a view-only sort, or else the saved order
+        sort = self._view_sort
+
+        path = filedialog.asksaveasfilename(
+            defaultextension=".csv",
+            filetypes=[("CSV Files", "*.csv")],
+            title="Export View as CSV"
+        )
+        if not path:
+            return
+
+        query = self.search_var.get().strip().lower()
+        columns = [c for c in self.all_cols if self.col_visible[c].get()] or ["title"]
+
+        run_with_progress(
+            self.app,
+            "Exporting CSV",
+            self.app.storage.export_csv,
+            path,
+            query,
+            sort,
+            columns,
+            on_done=lambda rows: messagebox.showinfo("Exported", f"CSV exported ({rows:,} rows):\n{path}"),
+            on_error=lambda e: messagebox.showerror("Export Error", str(e)),
+        )
 
     def reset(self):
         self.search_var.set("")
+        self._view_sort = None
         self.refresh()
\ No newline at end of file
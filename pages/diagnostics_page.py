@@ -0,0 +1,133 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from instrumentation import instruments
+
+
+class DiagnosticsPage(tk.Frame):
+    """
+    Hidden page (Debug > Diagnostics) showing the instrumentation
+    histograms and the last cProfile capture, with export to JSON.
+    """
+
+    COLUMNS = ("name", "count", "mean_ms", "p50_ms", "p90_ms", "p99_ms", "max_ms", "total_ms", "items")
+
+    def __init__(self, parent, app):
+        super().__init__(parent, bg=app.BG)
+        self.app = app
+        self._build_ui()
+
+    def _build_ui(self):
+        self.grid_rowconfigure(2, weight=3)
+        self.grid_rowconfigure(3, weight=2)
+        self.grid_columnconfigure(0, weight=1)
+
+        header = tk.Label(
+            self,
+            text="Diagnostics",
+            bg=self.app.BG,
+            fg=self.app.FG,
+            font=("Arial", 22, "bold"),
+            padx=18,
+            pady=18,
+            anchor="w",
+        )
+        header.grid(row=0, column=0, sticky="ew")
+
+        # Controls panel
+        panel = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
+        panel.grid(row=1, column=0, sticky="ew", padx=18, pady=(0, 10))
+
+        tk.Checkbutton(
+            panel,
+            text="Record timings",
+            variable=self.app.instrument_var,
+            command=self.app.toggle_instruments,
+            bg=self.app.PANEL_BG,
+            fg=self.app.FG,
+            font=("Arial", 12, "bold"),
+        ).grid(row=0, column=0, padx=12, pady=12, sticky="w")
+
+        ttk.Button(panel, text="Refresh", style="App.TButton", command=self.refresh).grid(row=0, column=1, padx=6, pady=12)
+        ttk.Button(panel, text="Reset", style="App.TButton", command=self.reset).grid(row=0, column=2, padx=6, pady=12)
+        ttk.Button(panel, text="Export JSON", style="App.TButton", command=self.export_json).grid(row=0, column=3, padx=6, pady=12)
+        ttk.Button(panel, text="Profile Next Action", style="App.TButton", command=self.profile_next).grid(
+            row=0, column=4, padx=(6, 12), pady=12
+        )
+
+        self.status_label = tk.Label(panel, text="", bg=self.app.PANEL_BG, fg=self.app.FG, font=("Arial", 11, "italic"))
+        self.status_label.grid(row=1, column=0, columnspan=5, padx=12, pady=(0, 10), sticky="w")
+
+        # Histograms
+        wrap = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
+        wrap.grid(row=2, column=0, sticky="nsew", padx=18, pady=(0, 10))
+        wrap.grid_rowconfigure(0, weight=1)
+        wrap.grid_columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(wrap, columns=self.COLUMNS, show="headings")
+        self.tree.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        for c in self.COLUMNS:
+            self.tree.heading(c, text=c.replace("_ms", " (ms)").replace("_", " ").title())
+            self.tree.column(c, width=260 if c == "name" else 80, anchor="w" if c == "name" else "e")
+        scroll = ttk.Scrollbar(wrap, orient="vertical", command=self.tree.yview)
+        scroll.grid(row=0, column=1, sticky="ns", pady=10)
+        self.tree.configure(yscrollcommand=scroll.set)
+
+        # Last profile
+        prof = tk.Frame(self, bg=self.app.PANEL_BG, highlightthickness=1, highlightbackground=self.app.BORDER)
+        prof.grid(row=3, column=0, sticky="nsew", padx=18, pady=(0, 18))
+        prof.grid_rowconfigure(0, weight=1)
+        prof.grid_columnconfigure(0, weight=1)
+
+        self.profile_text = tk.Text(prof, height=10, wrap="none", font=("Courier", 10), relief="flat")
+        self.profile_text.grid(row=0, column=0, sticky="nsew", padx=10, pady=10)
+        self.profile_text.configure(state="disabled")
+
+    # ---------- data ----------
+    def refresh(self):
+        snap = instruments.snapshot()
+
+        self.tree.delete(*self.tree.get_children())
+        for name, h in snap["histograms"].items():
+            self.tree.insert("", "end", values=(name, *(h[c] for c in self.COLUMNS[1:])))
+
+        state = "on" if snap["enabled"] else "off (Debug > Record Timings, or LIBRARY_INSTRUMENT=1)"
+        armed = "  |  profiling the next action..." if self.app.profile_armed else ""
+        self.status_label.config(text=f"Recording {state}  |  since {snap['since']}{armed}")
+
+        profile = snap["last_profile"]
+        if profile:
+            lines = [f"{profile['action']}  ({profile['total_ms']} ms, {profile['at']})"]
+            if profile["dump"]:
+                lines.append(f"stats saved to {profile['dump']}")
+            lines.extend(profile["top"])
+            text = "\n".join(lines)
+        else:
+            text = "No profile yet. Click 'Profile Next Action', then do the slow thing once."
+        self.profile_text.configure(state="normal")
+        self.profile_text.delete("1.0", "end")
+        self.profile_text.insert("1.0", text)
+        self.profile_text.configure(state="disabled")
+
+    def reset(self):
+        instruments.reset()
+        self.refresh()
+
+    def profile_next(self):
+        self.app.profile_next_action()
+        self.refresh()
+
+    def export_json(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("JSON Files", "*.json")],
+            title="Export Diagnostics"
+        )
+        if not path:
+            return
+        try:
+            instruments.export_json(path)
+        except OSError as e:
+            messagebox.showerror("Export Error", str(e))
+            return
+        messagebox.showinfo("Exported", f"Diagnostics exported:\n{path}")
@@ -0,0 +1,108 @@
+import threading
+import time
+import tkinter as tk
+from tkinter import ttk
+
+
+class ProgressDialog(tk.Toplevel):
+    """Small modal window with a progress bar, a status line and (if on_cancel is given) a Cancel button."""
+
+    def __init__(self, app, title, on_cancel=None):
+        super().__init__(app)
+        self.app = app
+        self.title(title)
+        self.configure(bg=app.PANEL_BG)
+        self.resizable(False, False)
+        self.transient(app)
+
+        self.status_var = tk.StringVar(value="Starting...")
+
+        tk.Label(
+            self,
+            text=title,
+            bg=app.PANEL_BG,
+            fg=app.FG,
+            font=("Arial", 14, "bold"),
+            padx=14,
+            pady=12,
+            anchor="w",
+        ).pack(fill="x")
+
+        self.bar = ttk.Progressbar(self, mode="determinate", maximum=100, length=360)
+        self.bar.pack(fill="x", padx=14, pady=(0, 8))
+
+        tk.Label(self, textvariable=self.status_var, bg=app.PANEL_BG, fg=app.FG, anchor="w").pack(
+            fill="x", padx=14, pady=(0, 8)
+        )
+
+        self.cancel_btn = ttk.Button(self, text="Cancel", style="App.TButton", command=self._cancel)
+        if on_cancel:
+            self.cancel_btn.pack(fill="x", padx=14, pady=(4, 14))
+
+        self._on_cancel = on_cancel
+        self.protocol("WM_DELETE_WINDOW", self._cancel)
+        self.grab_set()
+
+    def update_progress(self, percent, text):
+        self.bar["value"] = percent
+        self.status_var.set(text)
+
+    def _cancel(self):
+        if not self._on_cancel:
+            return
+        self.cancel_btn.state(["disabled"])
+        self.status_var.set("Cancelling...")
+        self._on_cancel()
+
+    def close(self):
+        self.grab_release()
+        self.destroy()
+
+
+def run_with_progress(app, title, fn, *args, on_done=None, on_error=None, cancellable=False, write=False):
+    """
+    Run fn(*args, progress=..., [cancel=...]) in the background behind a ProgressDialog.
+    fn reports progress(rows_done, done, total); the dialog shows rows/sec
+    and percent (when total is known). write=True runs it as a storage write
+    whose result the next reload picks up (imports), otherwise it is queued
+    behind pending writes (exports).
+    """
+    state = {"rows": 0, "done": 0, "total": 0, "finished": False}
+    cancel = threading.Event()
+
+    def progress(rows, done, total):
+        state.update(rows=rows, done=done, total=total)
+
+    kwargs = {"progress": progress}
+    if cancellable:
+        kwargs["cancel"] = cancel
+
+    dialog = ProgressDialog(app, title, on_cancel=cancel.set if cancellable else None)
+    started = time.time()
+
+    def poll():
+        if state["finished"]:
+            return
+        elapsed = max(time.time() - started, 1e-6)
+        text = f'{state["rows"]:,} rows  |  {state["rows"] / elapsed:,.0f} rows/sec'
+        percent = 0.0
+        if state["total"]:
+            percent = 100.0 * state["done"] / state["total"]
+            text += f"  |  {percent:.0f}%"
+        dialog.update_progress(percent, text)
+        app.after(100, poll)
+
+    def finish(callback, value):
+        state["finished"] = True
+        dialog.close()
+        if callback:
+            callback(value)
+
+    def task():
+        return fn(*args, **kwargs)
+
+    if write:
+        app.run_write(task, on_done=lambda r: finish(on_done, r), on_error=lambda e: finish(on_error, e), in_sync=False)
+    else:
+        app.run_task(task, on_done=lambda r: finish(on_done, r), on_error=lambda e: finish(on_error, e), ordered=True)
+    app.after(100, poll)
@@ -0,0 +1,330 @@
+import sys
+import time
+from bisect import bisect_left
+import tkinter as tk
+from tkinter import ttk
+
+from instrumentation import instruments
+
+
+class VirtualTable(tk.Frame):
+    """
+    Treeview that only holds the rows currently on screen.
+
+    The full (filtered) result list stays in Python; the Treeview gets the
+    visible window plus a small overscan, and the scrollbar is driven from
+    the offset into that list. Scrolling just swaps the few items in the window,
+    so showing 500k rows costs the same as showing 30.
+
+    Items use the row key ("no") as their Treeview iid, so a single changed
+    row is patched in place (apply_change) instead of redrawing the window.
+    """
+
+    OVERSCAN = 4
+
+    def __init__(self, parent, columns, headings, widths, bg, selectmode="browse", key="no"):
+        super().__init__(parent, bg=bg)
+        self.columns = tuple(columns)
+        self.key = key
+
+        self._rows = []
+        self._offset = 0
+        self._visible = 20
+        self._item_rows = {}     # tree iid (row key) -> (index, row)
+        self._selected = {}      # row key -> row (survives scrolling)
+        self._anchor = None      # row index keyboard navigation moves from
+        self._select_callbacks = []
+
+        self.grid_rowconfigure(0, weight=1)
+        self.grid_columnconfigure(0, weight=1)
+
+        self.tree = ttk.Treeview(self, columns=self.columns, show="headings", selectmode=selectmode)
+        self.tree.grid(row=0, column=0, sticky="nsew")
+
+        for c in self.columns:
+            self.tree.heading(c, text=headings[c])
+            self.tree.column(c, width=widths[c], anchor="w")
+
+        self.scroll = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scroll.grid(row=0, column=1, sticky="ns")
+
+        self.tree.bind("<Configure>", self._on_resize)
+        self.tree.bind("<<TreeviewSelect>>", self._on_tree_select, add="+")
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-3))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(3))
+        self.tree.bind("<Up>", lambda e: self._move_cursor(-1))
+        self.tree.bind("<Down>", lambda e: self._move_cursor(1))
+        self.tree.bind("<Prior>", lambda e: self._scroll_by(-self._visible))
+        self.tree.bind("<Next>", lambda e: self._scroll_by(self._visible))
+        self.tree.bind("<Home>", lambda e: self.scroll_to(0))
+        self.tree.bind("<End>", lambda e: self.scroll_to(len(self._rows)))
+
+    # ---------- data ----------
+    def set_rows(self, rows):
+        """Show a new result list (any sequence of Book-like rows), keeping the scroll position if possible."""
+        self._rows = rows
+        keys = {getattr(r, self.key) for r in rows} if self._selected else set()
+        self._selected = {k: r for k, r in self._selected.items() if k in keys}
+        self._offset = self._clamp(self._offset)
+        self._render()
+
+    def rows(self):
+        return self._rows
+
+    def selected_rows(self):
+        """Selected rows, including ones currently scrolled out of view."""
+        return list(self._selected.values())
+
+    def clear_selection(self):
+        self._selected = {}
+        self._anchor = None
+        self._render()
+
+    def bind_select(self, callback):
+        """callback(event) runs when the user changes the selection (not on re-render)."""
+        self._select_callbacks.append(callback)
+
+    # ---------- targeted updates ----------
+    @instruments.timed("table.patch")
+    def apply_change(self, change, keep, position):
+        """
+        Patch the rows for one catalog change (catalog.CatalogChange).
+        The rows must be a list ordered by position(key); keep(row) says
+        whether a row belongs in this view. Returns False when the change
+        can't be applied in place and the caller should set_rows() again.
+        """
+        rows = self._rows
+        if change.kind == "reset" or not isinstance(rows, list):
+            return False
+
+        no = change.no
+
+        def slot(row):
+            k = getattr(row, self.key)
+            return change.position if k == no else position(k)
+
+        i = bisect_left(rows, change.position, key=slot)
+        present = i < len(rows) and getattr(rows[i], self.key) == no
+
+        if change.kind == "deleted" or not keep(change.book):
+            if present:
+                self._delete_row(i)
+        elif present:
+            self._replace_row(i, change.book)
+        else:
+            self._insert_row(i, change.book)
+        return True
+
+    def replace_row(self, key, row, same_place):
+        """
+        Patch one row of a view whose order apply_change can't work out (a
+        sorted view): row replaces the row with this key when same_place(old)
+        says it sorts into the same place, and None removes it. Returns False
+        when that is not enough (a new row, or one that moves).
+        """
+        rows = self._rows
+        if not isinstance(rows, list):
+            return False
+
+        shown = self._item_rows.get(key)
+        if shown is not None:
+            i = shown[0]
+        else:
+            # off screen: a scan of the list still beats rebuilding the view
+            i = next((i for i, r in enumerate(rows) if getattr(r, self.key) == key), None)
+            if i is None:
+                return row is None
+
+        if row is None:
+            self._delete_row(i)
+        elif same_place(rows[i]):
+            self._replace_row(i, row)
+        else:
+            return False
+        return True
+
+    def _replace_row(self, i, row):
+        key = getattr(row, self.key)
+        self._rows[i] = row
+        if key in self._selected:
+            self._selected[key] = row
+        if key in self._item_rows:
+            self._item_rows[key] = (i, row)
+            self.tree.item(key, values=self._values(row))
+
+    def _insert_row(self, i, row):
+        self._rows.insert(i, row)
+        if self._anchor is not None and self._anchor >= i:
+            self._anchor += 1
+
+        end = self._offset + len(self._item_rows)
+        if i < self._offset:
+            # everything on screen moved down one index: keep showing the same rows
+            self._offset += 1
+            self._shift_items(i, 1)
+        elif i <= end and i < self._offset + self._visible + self.OVERSCAN:
+            self._shift_items(i, 1)
+            key = getattr(row, self.key)
+            iid = self.tree.insert("", i - self._offset, iid=key or None, values=self._values(row))
+            self._item_rows[iid] = (i, row)
+            if len(self._item_rows) > self._visible + self.OVERSCAN:
+                # drop the item that fell off the bottom of the window
+                last_key, _ = max(self._item_rows.items(), key=lambda kv: kv[1][0])
+                self.tree.delete(last_key)
+                del self._item_rows[last_key]
+        self._update_scrollbar()
+
+    def _delete_row(self, i):
+        row = self._rows.pop(i)
+        key = getattr(row, self.key)
+        self._selected.pop(key, None)
+        if self._anchor is not None and self._anchor >= i:
+            self._anchor = max(0, self._anchor - 1) if self._anchor > i else None
+
+        if i < self._offset:
+            self._offset -= 1
+            self._shift_items(i, -1)
+        elif key in self._item_rows:
+            self.tree.delete(key)
+            del self._item_rows[key]
+            self._shift_items(i, -1)
+
+        if self._offset != self._clamp(self._offset):
+            # near the bottom: the window has to move, redraw it
+            self._offset = self._clamp(self._offset)
+            self._render()
+            return
+
+        # pull the next row up into the freed bottom slot
+        end = self._offset + len(self._item_rows)
+        if end < len(self._rows) and len(self._item_rows) < self._visible + self.OVERSCAN:
+            nxt = self._rows[end]
+            nkey = getattr(nxt, self.key)
+            iid = self.tree.insert("", "end", iid=nkey or None, values=self._values(nxt))
+            self._item_rows[iid] = (end, nxt)
+            if nkey in self._selected:
+                self.tree.selection_add(iid)
+        self._update_scrollbar()
+
+    def _shift_items(self, start, delta):
+        # on-screen rows at index >= start moved by delta
+        self._item_rows = {k: (i + delta if i >= start else i, r) for k, (i, r) in self._item_rows.items()}
+
+    # ---------- scrolling ----------
+    def scroll_to(self, offset):
+        self._offset = self._clamp(offset)
+        self._render()
+        return "break"
+
+    def _scroll_by(self, delta):
+        return self.scroll_to(self._offset + delta)
+
+    def _clamp(self, offset):
+        return max(0, min(int(offset), max(0, len(self._rows) - self._visible)))
+
+    def _on_scrollbar(self, *args):
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self._rows))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self._visible
+            self._scroll_by(step)
+
+    def _on_wheel(self, event):
+        if sys.platform == "darwin":
+            delta = -event.delta
+        else:
+            delta = -event.delta // 120 * 3
+        return self._scroll_by(delta)
+
+    def _on_resize(self, event):
+        rowheight = int(ttk.Style(self).lookup("Treeview", "rowheight") or 20)
+        # one row's worth is taken by the headings
+        visible = max(1, event.height // rowheight - 1)
+        if visible != self._visible:
+            self._visible = visible
+            self._offset = self._clamp(self._offset)
+            self._render()
+
+    def _move_cursor(self, step):
+        if not self._rows:
+            return "break"
+        if self._anchor is None:
+            idx = self._offset
+        else:
+            idx = max(0, min(self._anchor + step, len(self._rows) - 1))
+
+        if idx < self._offset:
+            self._offset = idx
+        elif idx >= self._offset + self._visible:
+            self._offset = idx - self._visible + 1
+
+        row = self._rows[idx]
+        self._anchor = idx
+        self._selected = {getattr(row, self.key): row}
+        self._render()
+        self._notify_select()
+        return "break"
+
+    # ---------- rendering ----------
+    def _render(self):
+        started = time.perf_counter()
+        self.tree.delete(*self.tree.get_children())
+        self._item_rows = {}
+
+        end = min(len(self._rows), self._offset + self._visible + self.OVERSCAN)
+        selected_iids = []
+        for i in range(self._offset, end):
+            row = self._rows[i]
+            key = getattr(row, self.key)
+            # an empty key can't be an iid; such a row just isn't patchable in place
+            iid = self.tree.insert("", "end", iid=key or None, values=self._values(row))
+            self._item_rows[iid] = (i, row)
+            if key in self._selected:
+                selected_iids.append(iid)
+
+        # the <<TreeviewSelect>> this queues is recognised as "no change" below
+        if selected_iids:
+            self.tree.selection_set(selected_iids)
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+        instruments.record("table.render", (time.perf_counter() - started) * 1000.0, len(self._item_rows))
+
+    def _values(self, row):
+        return tuple(getattr(row, c) for c in self.columns)
+
+    def _update_scrollbar(self):
+        total = len(self._rows)
+        if total:
+            self.scroll.set(self._offset / total, min(1.0, (self._offset + self._visible) / total))
+        else:
+            self.scroll.set(0.0, 1.0)
+
+    def _on_tree_select(self, event=None):
+        in_window = {getattr(row, self.key): (i, row) for i, row in self._item_rows.values()}
+        chosen = {}
+        for iid in self.tree.selection():
+            i, row = self._item_rows[iid]
+            chosen[getattr(row, self.key)] = row
+            self._anchor = i
+
+        # rows scrolled out of view keep their selection; the on-screen part is replaced
+        off_screen = {k: r for k, r in self._selected.items() if k not in in_window}
+        if str(self.tree.cget("selectmode")) == "extended":
+            new = off_screen
+            new.update(chosen)
+        else:
+            new = chosen or off_screen
+
+        if new.keys() == self._selected.keys():
+            return
+        self._selected = new
+        self._notify_select(event)
+
+    def _notify_select(self, event=None):
+        for callback in self._select_callbacks:
+            callback(event)
@@ -0,0 +1,327 @@
+# remote.py
+from __future__ import annotations
+
+import csv
+import http.client
+import io
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from backup_store import BackupStore
+from models import FIELDS, Book
+from sorting import SortSpec, format_spec, normalize_spec
+from storage import IMPORT_CHUNK, BookStorage, MergeSummary
+
+# Client side of server.py: a BookStorage that talks HTTP instead of
+# opening books.json (LIBRARY_SERVER_URL=http://host:8765, or "server_url"
+# in config.json). MainApp uses it like any other storage: it loads the
+# server's list into a BookCatalog and sends edits as batches, both on its
+# I/O threads. Only stamp() is called on the Tk thread, and it never waits
+# for the network.
+
+# rows per request when paging through a list
+PAGE_ROWS = 500
+
+# how often the background thread behind stamp() asks /status
+STAMP_POLL = 1.0
+
+NO_LOCAL_BACKUPS = "Automatic backups are kept by the server (its backup_dir)."
+
+
+class RemoteError(OSError):
+    """The server answered with an error status (or could not be reached)."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class ConflictError(RemoteError):
+    """412: the record (or the pinned catalog version) changed on the server meanwhile."""
+
+
+class CatalogClient:
+    """JSON requests to one server; each thread keeps its own keep-alive connection."""
+
+    def __init__(self, url: str, timeout: float = 60.0):
+        parts = urlsplit(url if "//" in url else "http://" + url)
+        self.url = url
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 8765
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        body: Any = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Tuple[int, Dict[str, str], Any]:
+        """
+        (status, headers, decoded JSON) for one request. body is JSON-encoded
+        unless it is bytes or an iterator of bytes (sent chunked).
+        Error statuses raise RemoteError / ConflictError.
+        """
+        target = self.prefix + path
+        if params:
+            target += "?" + urlencode({k: v for k, v in params.items() if v is not None})
+        headers = dict(headers or {})
+        streamed = body is not None and not isinstance(body, (bytes, dict, list))
+        if isinstance(body, (dict, list)):
+            body = json.dumps(body, ensure_ascii=False).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        # a reused keep-alive connection may have been closed by the server: retry once on a fresh one
+        for attempt in (0, 1):
+            fresh = getattr(self._local, "conn", None) is None
+            conn = self._connection()
+            try:
+                conn.request(method, target, body=body, headers=headers, encode_chunked=streamed)
+                resp = conn.getresponse()
+                raw = resp.read()
+            except (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionError) as e:
+                self._drop()
+                if fresh or streamed or attempt:
+                    raise RemoteError(0, f"Lost connection to {self.url}: {e}")
+                continue
+            except OSError as e:
+                self._drop()
+                if isinstance(e, RemoteError):
+                    raise
+                raise RemoteError(0, f"Can't reach {self.url}: {e}")
+            except BaseException:
+                # e.g. ImportCancelled from inside a streamed body: the request is half sent
+                self._drop()
+                raise
+            if resp.will_close:
+                self._drop()
+            break
+
+        data = json.loads(raw) if raw else None
+        if resp.status >= 400:
+            message = data.get("error", resp.reason) if isinstance(data, dict) else resp.reason
+            raise (ConflictError if resp.status == 412 else RemoteError)(resp.status, message)
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data
+
+
+def _sort_param(sort: Optional[Tuple[str, bool] | SortSpec]) -> Optional[str]:
+    return format_spec(normalize_spec(sort)) if sort else None
+
+
+class RemoteStorage(BookStorage):
+    """
+    BookStorage over a catalog server. Reads page through the server's
+    list (pinned to one version); edits are sent as one batch per commit;
+    there are no local files apart from backups written on request.
+
+    The seen version is the server's ETag: writes report True (like a
+    merged save) when the server answers that someone else wrote since.
+    """
+
+    def __init__(self, url: str):
+        # nothing on disk here; the server owns the files
+        super().__init__(None, binary_snapshot=False)
+        self.client = CatalogClient(url)
+        self._stamp: Any = None
+        self._poller: Optional[threading.Thread] = None
+        self._poller_lock = threading.Lock()
+
+    # ---------- state ----------
+    def stamp(self) -> Any:
+        """
+        The server's catalog ETag as last heard (None before anything was),
+        without a request. A daemon thread, started on the first call, asks
+        /status every STAMP_POLL seconds; loads and writes note the ETag
+        they get back as well.
+        """
+        if self._poller is None:
+            with self._poller_lock:
+                if self._poller is None:
+                    self._poller = threading.Thread(target=self._poll_status, name="library-stamp", daemon=True)
+                    self._poller.start()
+        return self._stamp
+
+    def _poll_status(self) -> None:
+        while True:
+            try:
+                self._note(self._status_etag())
+            except RemoteError:
+                pass  # unreachable for now: keep the last ETag, ask again next round
+            time.sleep(STAMP_POLL)
+
+    def _status_etag(self) -> str:
+        _status, _headers, data = self.client.request("GET", "/status")
+        return data["etag"]
+
+    def _note(self, etag: Optional[str]) -> None:
+        if etag:
+            self._stamp = etag
+
+    def _wrote(self, data: Dict[str, Any]) -> bool:
+        """Note the ETag a write produced; True if the server had moved on from the one we saw."""
+        merged = self._seen_stamp is not None and data["previous"] != self._seen_stamp
+        self._seen_stamp = data["etag"]
+        self._note(data["etag"])
+        return merged
+
+    # ---------- reads ----------
+    def load_books(self) -> Sequence[Book]:
+        """All books, fetched again only when the server's ETag moved on. Treat as read-only."""
+        return self.load_pinned()[0]
+
+    def load_pinned(self) -> Tuple[Sequence[Book], str]:
+        """load_books() plus the ETag of the catalog version the books were all read from."""
+        if self._status_etag() != self._cache_stamp:
+            seen: List[Optional[str]] = [None]
+            books = list(self._pages(seen))
+            self._cache_stamp, self._cache_books = seen[0], books
+        self._note(self._cache_stamp)
+        self._saw(self._cache_stamp, self._cache_books, 0)
+        return self._cache_books, self._cache_stamp
+
+    def _pages(self, seen: List[Optional[str]], query: Optional[str] = None, sort: Optional[str] = None) -> Iterator[Book]:
+        # seen[0] gets the ETag the pages are pinned to
+        offset, at = 0, None
+        while True:
+            _status, _headers, data = self.client.request(
+                "GET", "/books", {"q": query, "sort": sort, "offset": offset, "limit": PAGE_ROWS, "at": at}
+            )
+            at = seen[0] = data["etag"]
+            for d in data["books"]:
+                yield Book.from_dict(d)
+            offset += len(data["books"])
+            if not data["books"] or offset >= data["total"]:
+                return
+
+    def iter_books(
+        self,
+        query: Optional[str] = None,
+        sort: Optional[Tuple[str, bool] | SortSpec] = None,
+    ) -> Iterator[Book]:
+        """Filtered / sorted on the server, streamed page by page from one catalog version."""
+        yield from self._pages([None], query, _sort_param(sort))
+
+    def count_books(self, query: Optional[str] = None) -> int:
+        _status, _headers, data = self.client.request("GET", "/books", {"q": query, "limit": 0})
+        return data["total"]
+
+    # ---------- writes ----------
+    def save_books(self, books: List[Book]) -> bool:
+        """Replace the server's list outright (PUT /books)."""
+        _status, _headers, data = self.client.request("PUT", "/books", body={"books": [b.to_dict() for b in books]})
+        return self._wrote(data)
+
+    def apply_changes(
+        self,
+        books: Optional[Iterable[Book]],
+        upserts: Iterable[Book] = (),
+        deletes: Iterable[str] = (),
+    ) -> bool:
+        """Send only the edited records, as one server-side commit; the full list (books) is not needed."""
+        body = {"upserts": [b.to_dict() for b in upserts], "deletes": list(deletes)}
+        if not body["upserts"] and not body["deletes"]:
+            return False
+        _status, _headers, data = self.client.request("POST", "/batch", body=body)
+        return self._wrote(data)
+
+    def sort_catalog(self, spec: SortSpec) -> bool:
+        """Reorder the server's list (the server sorts and saves it)."""
+        _status, _headers, data = self.client.request("POST", "/sort", body={"sort": format_spec(spec)})
+        return self._wrote(data)
+
+    def _import_rows(self, chunks: Iterable[List[Tuple[str, ...]]], backup_path: Optional[str | Path] = None) -> str:
+        """
+        Upload the rows as one chunked CSV. A chosen backup_path is written
+        here first; otherwise the server keeps its own temp backup and that
+        path is returned. Cancelling drops the upload before the server
+        touches its data.
+        """
+        if backup_path:
+            self.backup_to_path(backup_path)
+        data = self._upload_csv(chunks)
+        return str(backup_path) if backup_path else data["backup"]
+
+    def _merge_rows(
+        self,
+        incoming: Dict[str, Tuple[str, ...]],
+        policy: str,
+        delete_missing: bool,
+        backup_path: Optional[str | Path],
+        cancel: Optional[Any],
+    ) -> MergeSummary:
+        """The server does the join (POST /import?merge=...); only the CSV rows are sent."""
+        if backup_path:
+            self.backup_to_path(backup_path)
+        chunks = self._chunked(incoming.values(), IMPORT_CHUNK, cancel)
+        data = self._upload_csv(chunks, {"merge": policy, "delete_missing": "1" if delete_missing else None})
+        counts = {k: data[k] for k in MergeSummary._fields if k != "backup"}
+        return MergeSummary(backup=str(backup_path) if backup_path else data["backup"], **counts)
+
+    def _upload_csv(self, chunks: Iterable[List[Tuple[str, ...]]], params: Optional[Dict[str, Any]] = None) -> Any:
+        def body() -> Iterator[bytes]:
+            buf = io.StringIO(newline="")
+            w = csv.writer(buf)
+            w.writerow(FIELDS)
+            for chunk in chunks:
+                w.writerows(chunk)
+                yield buf.getvalue().encode("utf-8")
+                buf.seek(0)
+                buf.truncate()
+            if buf.tell():
+                yield buf.getvalue().encode("utf-8")
+
+        _status, _headers, data = self.client.request(
+            "POST", "/import", params, body=body(), headers={"Content-Type": "text/csv"}
+        )
+        self._note(data["etag"])
+        return data
+
+    def compact(self) -> None:
+        self.client.request("POST", "/compact")
+
+    def restore_defaults(self) -> str:
+        """
+        Replace the server's books with the sample ones, sent as an import so
+        the server backs the catalog up first. Returns that backup's path on the server.
+        """
+        return self._upload_csv([[b.values() for b in self.default_books()]])["backup"]
+
+    def _write_rows_stream(self, chunks: Iterable[List[Tuple[str, ...]]]) -> None:
+        # a wholesale replace is an import on the server (which backs up first)
+        self._upload_csv(chunks)
+
+    # ---------- backups ----------
+    def backup_store(self) -> BackupStore:
+        raise RemoteError(0, NO_LOCAL_BACKUPS)
+
+    def _backup_to_store(self, reason: str = "import_csv") -> str:
+        raise RemoteError(0, NO_LOCAL_BACKUPS)
+
+    def backup_to_path(self, backup_path: str | Path) -> str:
+        """Write the server's current books to a local JSON file."""
+        backup_path = Path(backup_path)
+        backup_path.parent.mkdir(parents=True, exist_ok=True)
+        with backup_path.open("w", encoding="utf-8") as f:
+            json.dump({"books": [b.to_dict() for b in self.load_books()]}, f, ensure_ascii=False, indent=2)
+        return str(backup_path)
+
@@ -0,0 +1,256 @@
+# search_index.py
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left
+from heapq import merge
+from itertools import groupby, islice
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from models import Book
+
+# length of the n-grams kept in the posting lists
+GRAM = 3
+
+# rows a Search box lists for one query; a broader one shows its first ones
+# and says so, instead of collecting every hit on each keystroke
+SEARCH_LIMIT = 1000
+
+# appended to every text before cutting grams, so each substring shorter than
+# a gram also starts one (the last characters of a text included)
+PAD = "\x00" * (GRAM - 1)
+
+# rebuild once more than this share of the ids belong to removed records
+COMPACT_RATIO = 0.5
+
+
+def search_text(book: Book) -> str:
+    """Same lowercase "no title genre author price year" string the pages used to build."""
+    return " ".join(book.values()).lower()
+
+
+def _grams(text: str) -> Set[str]:
+    text += PAD
+    return {text[i:i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+def _query_grams(query: str) -> Set[str]:
+    return {query[i:i + GRAM] for i in range(len(query) - GRAM + 1)}
+
+
+class SearchIndex:
+    """
+    Inverted trigram index over the searchable fields.
+
+    Every record gets an int id in the order it was first added (re-adding a
+    "no" keeps its id), and each trigram of its search text points to a
+    sorted array('I') of the ids containing it -- 4 bytes per posting. A
+    substring query walks the shortest posting list of its trigrams in id
+    order, checking each candidate's text; a query shorter than a trigram
+    merges the lists of the trigrams it starts, which needs no check.
+
+    Hits come out in id order, so matches(query, limit) stops after the first
+    `limit`: a broad query costs the rows asked for, not every hit.
+    """
+
+    def __init__(self):
+        self._clear()
+
+    def _clear(self) -> None:
+        self._postings: Dict[str, array] = {}
+        self._starts: Dict[str, Set[str]] = {}   # 1..GRAM-1 leading chars -> grams with postings
+        self._texts: List[str] = []              # id -> search text ("" once removed)
+        self._nos: List[Optional[str]] = []      # id -> "no" (None once removed)
+        self._ids: Dict[str, int] = {}
+        self._removed = 0
+
+    # ---------- maintenance ----------
+    def build(self, books: Iterable[Book]) -> None:
+        self._load((b.no, search_text(b)) for b in books)
+
+    def add(self, book: Book) -> None:
+        """Index book, or re-index it under its old id if its "no" is already here."""
+        no = book.no
+        text = search_text(book)
+        rid = self._ids.get(no)
+        if rid is None:
+            self._append(no, text)
+        else:
+            self._retext(rid, text)
+
+    def remove(self, no: str) -> None:
+        rid = self._ids.pop(no, None)
+        if rid is None:
+            return
+        for g in _grams(self._texts[rid]):
+            self._unpost(g, rid)
+        self._texts[rid] = ""
+        self._nos[rid] = None
+        self._removed += 1
+        self._maybe_compact()
+
+    def apply(self, books: Iterable[Book] = (), removed: Iterable[str] = ()) -> None:
+        """
+        add() every book, then remove() every "no" in removed, rewriting each
+        posting list the batch touches once instead of shifting it per record.
+        """
+        ids, texts, nos = self._ids, self._texts, self._nos
+        before: Dict[int, Set[str]] = {}   # id -> its grams before this batch
+        for b in books:
+            no = b.no
+            rid = ids.get(no)
+            if rid is None:
+                rid = ids[no] = len(texts)
+                texts.append("")
+                nos.append(no)
+                before[rid] = set()
+            elif rid not in before:
+                before[rid] = _grams(texts[rid])
+            texts[rid] = search_text(b)
+        for no in removed:
+            rid = ids.pop(no, None)
+            if rid is None:
+                continue
+            if rid not in before:
+                before[rid] = _grams(texts[rid])
+            texts[rid] = ""
+            nos[rid] = None
+            self._removed += 1
+
+        added: Dict[str, List[int]] = {}
+        dropped: Dict[str, List[int]] = {}
+        for rid, old in before.items():
+            new = _grams(texts[rid]) if nos[rid] is not None else set()
+            for g in new - old:
+                added.setdefault(g, []).append(rid)
+            for g in old - new:
+                dropped.setdefault(g, []).append(rid)
+
+        postings = self._postings
+        for g in added.keys() | dropped.keys():
+            new_ids = sorted(added.get(g, ()))
+            current = postings.get(g)
+            if current is None:
+                self._new_gram(g, new_ids[0])
+                postings[g].extend(new_ids[1:])
+            elif g not in dropped and new_ids[0] > current[-1]:
+                current.extend(new_ids)
+            else:
+                kept = set(current).difference(dropped.get(g, ()))
+                kept.update(new_ids)
+                if kept:
+                    postings[g] = array("I", sorted(kept))
+                else:
+                    self._drop_gram(g)
+        self._maybe_compact()
+
+    def _maybe_compact(self) -> None:
+        if self._removed > len(self._texts) * COMPACT_RATIO:
+            # renumber the live records, keeping their order
+            self._load([(n, t) for n, t in zip(self._nos, self._texts) if n is not None])
+
+    def _load(self, entries: Iterable[Tuple[str, str]]) -> None:
+        self._clear()
+        ids = self._ids
+        for no, text in entries:
+            rid = ids.get(no)
+            if rid is None:
+                self._append(no, text)
+            else:
+                self._retext(rid, text)
+
+    def _retext(self, rid: int, text: str) -> None:
+        old = self._texts[rid]
+        if old == text:
+            return
+        self._texts[rid] = text
+        old_grams, new_grams = _grams(old), _grams(text)
+        for g in old_grams - new_grams:
+            self._unpost(g, rid)
+        for g in new_grams - old_grams:
+            self._post(g, rid)
+
+    def _append(self, no: str, text: str) -> None:
+        # a new id is the largest yet, so appending keeps every posting list sorted
+        rid = len(self._texts)
+        self._ids[no] = rid
+        self._texts.append(text)
+        self._nos.append(no)
+        postings = self._postings
+        for g in _grams(text):
+            try:
+                postings[g].append(rid)
+            except KeyError:
+                self._new_gram(g, rid)
+
+    def _post(self, g: str, rid: int) -> None:
+        ids = self._postings.get(g)
+        if ids is None:
+            self._new_gram(g, rid)
+        elif ids[-1] < rid:
+            ids.append(rid)
+        else:
+            ids.insert(bisect_left(ids, rid), rid)
+
+    def _unpost(self, g: str, rid: int) -> None:
+        ids = self._postings[g]
+        del ids[bisect_left(ids, rid)]
+        if not ids:
+            self._drop_gram(g)
+
+    def _drop_gram(self, g: str) -> None:
+        del self._postings[g]
+        for k in range(1, GRAM):
+            grams = self._starts[g[:k]]
+            grams.discard(g)
+            if not grams:
+                del self._starts[g[:k]]
+
+    def _new_gram(self, g: str, rid: int) -> None:
+        self._postings[g] = array("I", (rid,))
+        for k in range(1, GRAM):
+            grams = self._starts.get(g[:k])
+            if grams is None:
+                self._starts[g[:k]] = {g}
+            else:
+                grams.add(g)
+
+    # ---------- query ----------
+    def matches(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        "no" values whose search text contains query (already lowercased), in
+        the order their records were first added. limit keeps only the first
+        that many, and only those are looked for.
+        """
+        nos = self._nos
+        return [nos[rid] for rid in islice(self._hits(query, limit is None), limit)]
+
+    def _hits(self, query: str, everything: bool) -> Iterator[int]:
+        """Ids of the records containing query, ascending."""
+        if not query:
+            return (rid for rid, no in enumerate(self._nos) if no is not None)
+
+        postings = self._postings
+        if len(query) < GRAM:
+            lists = [postings[g] for g in self._starts.get(query, ())]
+            if len(lists) == 1:
+                return iter(lists[0])
+            if sum(map(len, lists)) > len(self._texts):
+                # most records hit, several times over: checking every text is cheaper
+                return (rid for rid, text in enumerate(self._texts) if query in text)
+            if everything:
+                return iter(sorted(set().union(*lists)))
+            return (rid for rid, _ in groupby(merge(*lists)))
+
+        lists = []
+        for g in _query_grams(query):
+            ids = postings.get(g)
+            if ids is None:
+                return iter(())
+            lists.append(ids)
+
+        shortest = min(lists, key=len)
+        if len(query) == GRAM:
+            return iter(shortest)
+        texts = self._texts
+        return (rid for rid in shortest if query in texts[rid])
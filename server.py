@@ -0,0 +1,515 @@
+# server.py
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from catalog import BookCatalog
+from core import open_storage
+from models import Book
+from sorting import parse_spec
+from storage import MERGE_POLICIES, BookStorage, MergeSummary, read_csv_books
+
+# One process holds the catalog (parsed and indexed once) and serves it to
+# any number of desks over HTTP/JSON on the local network:
+#
+#   GET    /status                     rows, etag, pending writes
+#   GET    /books?q=&sort=&offset=&limit=&at=
+#                                      a page of the (filtered, sorted) list
+#   GET    /books/<no>                 one record
+#   PUT    /books/<no>                 insert / replace (If-Match: record etag)
+#   DELETE /books/<no>                 remove (If-Match: record etag)
+#   PUT    /books                      replace everything ({"books": [...]})
+#   POST   /batch                      many edits, one commit ({"upserts": [...], "deletes": [...]})
+#   POST   /sort                       reorder and save ({"sort": "genre, year desc"})
+#   POST   /import                     CSV body replaces everything (after a backup)
+#   POST   /import?merge=upsert&delete_missing=1
+#                                      ... or is merged in by "no" (storage.merge_csv)
+#   POST   /compact                    storage.compact()
+#
+# Lists carry the catalog ETag; If-None-Match gives 304. Passing at=<etag>
+# pins paging to one version (412 once that version's view is gone), so a
+# long export or a scrolled table never mixes two versions. PUT /books,
+# /batch and /sort answer with the ETag just before ("previous") and just
+# after ("etag") their change, so a client that mirrors the catalog can
+# tell whether anyone else wrote since the version it holds.
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+PAGE_DEFAULT = 200
+PAGE_MAX = 10000
+
+# how often storage is checked for changes made behind the server's back
+WATCH_SECONDS = 2.0
+
+# (etag, query, sort) -> rows kept for paging
+VIEW_CACHE = 16
+
+MAX_JSON_BODY = 256 * 1024 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def record_etag(book: Book) -> str:
+    return '"' + hashlib.sha1("\x1f".join(book.values()).encode("utf-8")).hexdigest()[:16] + '"'
+
+
+def _import_csv_file(storage: BookStorage, path: str) -> Tuple[int, str]:
+    rows = 0
+
+    def counted():
+        nonlocal rows
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            for b in read_csv_books(f):
+                rows += 1
+                yield b
+
+    # the backup goes to the server's own BackupStore; clients never pick a path
+    backup = storage.import_books(counted())
+    return rows, backup
+
+
+class CatalogService:
+    """
+    The shared catalog. Everything here runs on the event loop thread, so
+    requests see consistent data without locks; storage I/O runs on a
+    single writer thread in submission order. A write shows in the catalog
+    at once (reads made meanwhile see it) and is acknowledged once it is on
+    disk; a failed one is answered with a 500 and the catalog is reloaded
+    from storage. Writes arriving during an import or merge wait for it and
+    land on the catalog it loaded. /status reports writes still in flight.
+    """
+
+    def __init__(self, storage: BookStorage):
+        self.storage = storage
+        self._behind = False
+        self.catalog = BookCatalog()
+        self._boot = f"{time.time_ns():x}"
+        self._generation = 0
+        self._stamp: Any = None
+        self._views: "OrderedDict[Tuple[str, str, str], Sequence[Book]]" = OrderedDict()
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="catalog-write")
+        self.pending_writes = 0
+        # held by an import / merge until its result is loaded
+        self._bulk = asyncio.Lock()
+
+    # ---------- state ----------
+    @property
+    def etag(self) -> str:
+        return f'"{self._boot}-{self._generation}-{self.catalog.version}"'
+
+    async def load(self) -> None:
+        """(Re)read storage in the background and swap the new catalog in."""
+        loop = asyncio.get_running_loop()
+        stamp = await loop.run_in_executor(None, self.storage.stamp)
+        catalog = await loop.run_in_executor(None, lambda: BookCatalog(self.storage.load_books()))
+        if self.pending_writes:
+            return  # our own edits are newer than what was just read
+        self.catalog = catalog
+        self._generation += 1
+        self._stamp = stamp
+        self._behind = False
+        self._views.clear()
+
+    async def watch(self) -> None:
+        """Pick up changes other processes made to storage."""
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(WATCH_SECONDS)
+            if self.pending_writes:
+                continue
+            stamp = await loop.run_in_executor(None, self.storage.stamp)
+            if stamp != self._stamp and not self.pending_writes:
+                await self.load()
+
+    def _persist(self, fn: Callable[..., Any], *args: Any) -> "asyncio.Future[Any]":
+        loop = asyncio.get_running_loop()
+        self.pending_writes += 1
+        future = loop.run_in_executor(self._writer, fn, *args)
+
+        def finished(f: "asyncio.Future[Any]") -> None:
+            self.pending_writes -= 1
+            if f.cancelled() or f.exception() is not None:
+                # the awaiting request reports it; the catalog has an edit storage lacks,
+                # so the watcher reloads once the other writes are done
+                self._behind = True
+                self._stamp = None
+                return
+            # True: storage merged in another process's changes, the watcher reloads them
+            self._behind = self._behind or f.result() is True
+            if self.pending_writes == 0:
+                # otherwise the file now matches the catalog: don't reload our own write
+                self._stamp = None if self._behind else self.storage.stamp()
+
+        future.add_done_callback(finished)
+        return future
+
+    # ---------- reads ----------
+    def view(self, query: str, sort: str, at: Optional[str] = None) -> Tuple[str, Sequence[Book]]:
+        """(etag, rows) for a Search box query + Sort page order; at pins an older version."""
+        etag = at or self.etag
+        key = (etag, query.strip().lower(), sort.strip())
+        rows = self._views.get(key)
+        if rows is not None:
+            self._views.move_to_end(key)
+            return etag, rows
+        if etag != self.etag:
+            raise HttpError(412, "That version of the catalog is gone; start again without 'at'.")
+
+        try:
+            spec = parse_spec(sort) if sort.strip() else []
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        rows = self.catalog.sorted_view(spec, query) if spec else self.catalog.search(query)
+        self._views[key] = rows
+        while len(self._views) > VIEW_CACHE:
+            self._views.popitem(last=False)
+        return etag, rows
+
+    def get(self, no: str) -> Book:
+        book = self.catalog.get(no)
+        if book is None:
+            raise HttpError(404, f"No book '{no}'.")
+        return book
+
+    def _check_match(self, no: str, if_match: Optional[str]) -> Optional[Book]:
+        current = self.catalog.get(no)
+        if if_match and if_match != "*":
+            if current is None or record_etag(current) != if_match:
+                raise HttpError(412, f"Book '{no}' was changed by someone else; reload it first.")
+        return current
+
+    # ---------- writes ----------
+    async def _after_bulk(self) -> None:
+        # an import / merge in progress goes first; this write then lands on what it loaded
+        if self._bulk.locked():
+            async with self._bulk:
+                pass
+
+    async def upsert(self, book: Book, if_match: Optional[str] = None) -> bool:
+        await self._after_bulk()
+        self._check_match(book.no, if_match)
+        replaced = self.catalog.upsert(book)
+        # record edits only: no O(n) copy of the catalog on the event loop
+        await self._persist(self.storage.apply_changes, None, [book], ())
+        return replaced
+
+    async def delete(self, no: str, if_match: Optional[str] = None) -> Book:
+        await self._after_bulk()
+        if self._check_match(no, if_match) is None:
+            raise HttpError(404, f"No book '{no}'.")
+        book = self.catalog.delete(no)
+        await self._persist(self.storage.apply_changes, None, (), [no])
+        return book
+
+    async def apply(self, upserts: List[Book], deletes: List[str]) -> Tuple[Tuple[int, int], Tuple[str, str]]:
+        """(upserted, deleted) and the (previous, new) ETag of the change."""
+        await self._after_bulk()
+        previous = self.etag
+        counts = self.catalog.apply(upserts, deletes)
+        versions = (previous, self.etag)
+        await self._persist(self.storage.apply_changes, None, upserts, deletes)
+        return counts, versions
+
+    async def replace(self, books: List[Book]) -> Tuple[str, str]:
+        await self._after_bulk()
+        previous = self.etag
+        self.catalog.load(books)
+        versions = (previous, self.etag)
+        await self._persist(self.storage.save_books, self.catalog.to_list())
+        return versions
+
+    async def sort(self, sort: str) -> Tuple[str, str]:
+        try:
+            spec = parse_spec(sort)
+        except ValueError as e:
+            raise HttpError(400, str(e))
+        if not spec:
+            raise HttpError(400, "Give at least one sort key.")
+        await self._after_bulk()
+        previous = self.etag
+        self.catalog.sort_by(spec)
+        versions = (previous, self.etag)
+        await self._persist(self.storage.save_books, self.catalog.to_list())
+        return versions
+
+    async def import_csv(self, path: str) -> Tuple[int, str]:
+        async with self._bulk:
+            rows, backup = await self._persist(_import_csv_file, self.storage, path)
+            await self.load()
+        return rows, backup
+
+    async def merge_csv(self, path: str, policy: str, delete_missing: bool) -> MergeSummary:
+        async with self._bulk:
+            summary = await self._persist(self.storage.merge_csv, path, policy, delete_missing)
+            await self.load()
+        return summary
+
+    async def compact(self) -> None:
+        await self._persist(self.storage.compact)
+
+    async def close(self) -> None:
+        # queued writes land before the process exits
+        await asyncio.get_running_loop().run_in_executor(None, self._writer.shutdown)
+
+
+class CatalogServer:
+    """A small HTTP/1.1 front (keep-alive, Content-Length or chunked bodies) for a CatalogService."""
+
+    def __init__(self, service: CatalogService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT):
+        self.service = service
+        self.host = host
+        self.port = port
+
+    async def serve_forever(self) -> None:
+        await self.service.load()
+        server = await asyncio.start_server(self._client, self.host, self.port)
+        addr = server.sockets[0].getsockname()
+        print(f"Serving {len(self.service.catalog):,} books on http://{addr[0]}:{addr[1]}", file=sys.stderr)
+        watcher = asyncio.create_task(self.service.watch())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            watcher.cancel()
+            await self.service.close()
+
+    # ---------- connection ----------
+    async def _client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                except ValueError:
+                    await self._send(writer, 400, {"error": "Bad request line."}, keep=False)
+                    break
+                headers = await self._read_headers(reader)
+                keep = headers.get("connection", "").lower() != "close" and version == "HTTP/1.1"
+
+                try:
+                    status, payload, extra = await self._dispatch(method, target, headers, reader)
+                except HttpError as e:
+                    status, payload, extra = e.status, {"error": str(e)}, {}
+                    # whatever body the client sent is still unread: don't reuse the connection
+                    keep = keep and not _has_body(headers)
+                except Exception as e:  # report it and keep serving everyone else
+                    status, payload, extra = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+                    keep = False
+                await self._send(writer, status, payload, extra, keep)
+                if not keep:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _read_headers(reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    @staticmethod
+    async def _body_chunks(reader: asyncio.StreamReader, headers: Dict[str, str]):
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            while True:
+                size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                if size == 0:
+                    await CatalogServer._read_headers(reader)  # trailers
+                    return
+                yield await reader.readexactly(size)
+                await reader.readexactly(2)
+        else:
+            left = int(headers.get("content-length", "0") or 0)
+            while left > 0:
+                chunk = await reader.read(min(left, 1024 * 1024))
+                if not chunk:
+                    raise asyncio.IncompleteReadError(b"", left)
+                left -= len(chunk)
+                yield chunk
+
+    async def _read_json(self, reader: asyncio.StreamReader, headers: Dict[str, str]) -> Any:
+        parts, size = [], 0
+        async for chunk in self._body_chunks(reader, headers):
+            size += len(chunk)
+            if size > MAX_JSON_BODY:
+                raise HttpError(413, "Request body too large.")
+            parts.append(chunk)
+        try:
+            return json.loads(b"".join(parts) or b"{}")
+        except ValueError as e:
+            raise HttpError(400, f"Bad JSON: {e}")
+
+    @staticmethod
+    async def _send(
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Any,
+        extra: Optional[Dict[str, str]] = None,
+        keep: bool = True,
+    ) -> None:
+        body = b"" if status == 304 else json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = [f"HTTP/1.1 {status} {_REASONS.get(status, 'Status')}"]
+        head.append("Content-Type: application/json; charset=utf-8")
+        head.append(f"Content-Length: {len(body)}")
+        head.append("Connection: keep-alive" if keep else "Connection: close")
+        for k, v in (extra or {}).items():
+            head.append(f"{k}: {v}")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    # ---------- routes ----------
+    async def _dispatch(
+        self,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        reader: asyncio.StreamReader,
+    ) -> Tuple[int, Any, Dict[str, str]]:
+        service = self.service
+        url = urlsplit(target)
+        params = {k: v[-1] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+        parts = [unquote(p) for p in url.path.strip("/").split("/")]
+
+        if parts == ["status"] and method == "GET":
+            etag = service.etag
+            body = {"rows": len(service.catalog), "etag": etag, "pending_writes": service.pending_writes}
+            return 200, body, {"ETag": etag}
+
+        if parts == ["books"] and method == "GET":
+            etag, rows = service.view(params.get("q", ""), params.get("sort", ""), params.get("at") or None)
+            if headers.get("if-none-match") == etag:
+                return 304, None, {"ETag": etag}
+            offset = max(0, _int(params.get("offset"), 0))
+            limit = min(PAGE_MAX, max(0, _int(params.get("limit"), PAGE_DEFAULT)))
+            page = [b.to_dict() for b in rows[offset:offset + limit]]
+            body = {"etag": etag, "total": len(rows), "offset": offset, "limit": limit, "books": page}
+            return 200, body, {"ETag": etag}
+
+        if parts == ["books"] and method == "PUT":
+            data = await self._read_json(reader, headers)
+            previous, etag = await service.replace([Book.from_dict(d) for d in data.get("books", [])])
+            return 200, {"rows": len(service.catalog), "previous": previous, "etag": etag}, {"ETag": etag}
+
+        if len(parts) == 2 and parts[0] == "books" and parts[1]:
+            no = parts[1]
+            if method == "GET":
+                book = service.get(no)
+                etag = record_etag(book)
+                if headers.get("if-none-match") == etag:
+                    return 304, None, {"ETag": etag}
+                return 200, book.to_dict(), {"ETag": etag}
+            if method == "PUT":
+                data = await self._read_json(reader, headers)
+                book = Book.from_dict({**data, "no": no})
+                if not book.title:
+                    raise HttpError(400, "A book needs at least 'no' and 'title'.")
+                replaced = await service.upsert(book, headers.get("if-match"))
+                body = {"created": not replaced, "etag": service.etag, "record_etag": record_etag(book)}
+                return 200, body, {"ETag": record_etag(book)}
+            if method == "DELETE":
+                book = await service.delete(no, headers.get("if-match"))
+                return 200, {"deleted": book.to_dict(), "etag": service.etag}, {}
+
+        if parts == ["batch"] and method == "POST":
+            data = await self._read_json(reader, headers)
+            upserts = [Book.from_dict(d) for d in data.get("upserts", [])]
+            if any(not b.no or not b.title for b in upserts):
+                raise HttpError(400, "A book needs at least 'no' and 'title'.")
+            (upserted, deleted), (previous, etag) = await service.apply(upserts, [str(no) for no in data.get("deletes", [])])
+            body = {"upserted": upserted, "deleted": deleted, "previous": previous, "etag": etag}
+            return 200, body, {"ETag": etag}
+
+        if parts == ["sort"] and method == "POST":
+            data = await self._read_json(reader, headers)
+            previous, etag = await service.sort(str(data.get("sort", "")))
+            return 200, {"previous": previous, "etag": etag}, {"ETag": etag}
+
+        if parts == ["import"] and method == "POST":
+            policy = params.get("merge")
+            if policy is not None and policy not in MERGE_POLICIES:
+                raise HttpError(400, f"merge must be one of {', '.join(MERGE_POLICIES)}")
+            # spool the CSV to disk first: the import itself runs on the writer thread
+            fd, tmp = tempfile.mkstemp(prefix="library_import_", suffix=".csv")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    async for chunk in self._body_chunks(reader, headers):
+                        f.write(chunk)
+                if policy is not None:
+                    summary = await service.merge_csv(tmp, policy, params.get("delete_missing") == "1")
+                    return 200, dict(summary._asdict(), etag=service.etag), {"ETag": service.etag}
+                rows, backup = await service.import_csv(tmp)
+            except ValueError as e:
+                raise HttpError(400, str(e))
+            finally:
+                os.unlink(tmp)
+            return 200, {"rows": rows, "backup": backup, "etag": service.etag}, {"ETag": service.etag}
+
+        if parts == ["compact"] and method == "POST":
+            await service.compact()
+            return 200, {"etag": service.etag}, {}
+
+        raise HttpError(404 if method in ("GET", "PUT", "POST", "DELETE") else 405, f"No route for {method} {url.path}")
+
+
+_REASONS = {
+    200: "OK", 304: "Not Modified", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    412: "Precondition Failed", 413: "Payload Too Large", 500: "Internal Server Error",
+}
+
+
+def _has_body(headers: Dict[str, str]) -> bool:
+    return bool(headers.get("transfer-encoding")) or int(headers.get("content-length", "0") or 0) > 0
+
+
+def _int(text: Optional[str], default: int) -> int:
+    try:
+        return int(text) if text not in (None, "") else default
+    except ValueError:
+        raise HttpError(400, f"Not a number: '{text}'")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python server.py", description="Serve one shared catalog over HTTP/JSON.")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"interface to listen on (default {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--base-dir", help="where config.json and data/ live (default: next to server.py)")
+    parser.add_argument("--storage", choices=("json", "journal", "sqlite"), help="override the configured backend")
+    parser.add_argument("--json-path", help="override books.json")
+    parser.add_argument("--db-path", help="override books.db")
+    args = parser.parse_args(argv)
+
+    # the server itself must open the files, never another server
+    storage = open_storage(args.base_dir, storage=args.storage, json_path=args.json_path, db_path=args.db_path, server_url="")
+    server = CatalogServer(CatalogService(storage), args.host, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
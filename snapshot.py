@@ -0,0 +1,160 @@
+# snapshot.py
+from __future__ import annotations
+
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple, Union, overload
+
+from models import FIELDS, Book
+
+# Binary catalog snapshot, written next to books.json as books.json.snap:
+#
+#   header   MAGIC, version, byte order, offset width, row count,
+#            (mtime_ns, size, inode) of the books.json it was made from
+#   columns  one (offsets_pos, heap_pos) pair per field in FIELDS order
+#   offsets  per column: count + 1 fixed-width offsets into its heap
+#   heaps    per column: the UTF-8 values back to back
+#
+# Row i of a column is heap[offsets[i]:offsets[i + 1]], so any record can be
+# decoded on its own straight out of an mmap without reading the rest.
+
+MAGIC = b"LIBSNAP1"
+VERSION = 2
+
+# magic, version, byte order (b"l"/b"b"), offset typecode (b"I"/b"Q"), count, src mtime_ns, src size, src inode
+_HEADER = struct.Struct("<8sIccxxQqqQ")
+_COLUMN = struct.Struct("<QQ")
+
+_BYTE_ORDER = b"l" if sys.byteorder == "little" else b"b"
+
+# rows decoded per column at a time while iterating
+ITER_BLOCK = 4096
+
+
+def write_snapshot(path: str | Path, books: Sequence[Book], source_stamp: Tuple[int, int, int]) -> None:
+    """
+    Write books to path (via a temp file + rename).
+    source_stamp is (mtime_ns, size, inode) of the books.json the records
+    match; open_snapshot() ignores the file once books.json moves on. Saves
+    rename a new file into place, so the inode tells apart a same-size
+    rewrite within the filesystem's mtime resolution.
+    """
+    path = Path(path)
+    heaps = []
+    for col in FIELDS:
+        heaps.append([getattr(b, col).encode("utf-8") for b in books])
+
+    width = "I" if max((sum(map(len, h)) for h in heaps), default=0) < 2**32 else "Q"
+    item = array(width).itemsize
+    count = len(books)
+
+    pos = _HEADER.size + _COLUMN.size * len(FIELDS)
+    layout = []
+    for values in heaps:
+        offsets_pos = pos
+        heap_pos = offsets_pos + (count + 1) * item
+        layout.append((offsets_pos, heap_pos))
+        pos = heap_pos + sum(map(len, values))
+
+    fd, tmp = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, VERSION, _BYTE_ORDER, width.encode(), count, *source_stamp))
+            for offsets_pos, heap_pos in layout:
+                f.write(_COLUMN.pack(offsets_pos, heap_pos))
+            for values in heaps:
+                offsets = array(width, [0])
+                total = 0
+                for v in values:
+                    total += len(v)
+                    offsets.append(total)
+                offsets.tofile(f)
+                f.write(b"".join(values))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def open_snapshot(path: str | Path, source_stamp: Optional[Tuple[int, int, int]]) -> Optional[SnapshotBooks]:
+    """The snapshot at path if it exists, is readable and matches source_stamp, else None."""
+    if source_stamp is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                return None
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    magic, version, order, width, count, mtime_ns, size, inode = _HEADER.unpack_from(mm, 0)
+    if (magic, version, order) != (MAGIC, VERSION, _BYTE_ORDER) or (mtime_ns, size, inode) != tuple(source_stamp):
+        mm.close()
+        return None
+    return SnapshotBooks(mm, width.decode(), count)
+
+
+class SnapshotBooks(Sequence[Book]):
+    """
+    Read-only, memory-mapped list of Books.
+    Opening costs one header read; a Book is decoded only when it is
+    indexed or iterated, so showing the first screenful touches a few pages
+    of the file no matter how large the catalog is.
+    """
+
+    def __init__(self, mm: mmap.mmap, width: str, count: int):
+        self._mm = mm
+        self._count = count
+        view = memoryview(mm)
+        self._offsets: List[memoryview] = []
+        self._heaps: List[memoryview] = []
+        for i in range(len(FIELDS)):
+            offsets_pos, heap_pos = _COLUMN.unpack_from(mm, _HEADER.size + i * _COLUMN.size)
+            offsets = view[offsets_pos:heap_pos].cast(width)
+            self._offsets.append(offsets)
+            self._heaps.append(view[heap_pos:heap_pos + offsets[count]])
+
+    def __len__(self) -> int:
+        return self._count
+
+    @overload
+    def __getitem__(self, i: int) -> Book: ...
+
+    @overload
+    def __getitem__(self, i: slice) -> List[Book]: ...
+
+    def __getitem__(self, i: Union[int, slice]) -> Union[Book, List[Book]]:
+        if isinstance(i, slice):
+            return [self._row(j) for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("snapshot index out of range")
+        return self._row(i)
+
+    def __iter__(self) -> Iterator[Book]:
+        # decode a block of each column at a time, much cheaper than row by row
+        for start in range(0, self._count, ITER_BLOCK):
+            stop = min(start + ITER_BLOCK, self._count)
+            columns = [self._decode(c, start, stop) for c in range(len(FIELDS))]
+            for values in zip(*columns):
+                yield Book(*values)
+
+    def _decode(self, c: int, start: int, stop: int) -> List[str]:
+        offsets = self._offsets[c][start:stop + 1].tolist()
+        base = offsets[0]
+        blob = self._heaps[c][base:offsets[-1]].tobytes()
+        return [blob[a - base:b - base].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+    def _row(self, i: int) -> Book:
+        values = []
+        for offsets, heap in zip(self._offsets, self._heaps):
+            values.append(str(heap[offsets[i]:offsets[i + 1]], "utf-8"))
+        return Book(*values)
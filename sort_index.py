@@ -0,0 +1,122 @@
+# sort_index.py
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from models import Book
+from sorting import NUMERIC_COLUMNS, SORT_COLUMNS, sort_key
+
+# (sort key, insertion sequence, no) -- seq is unique, so no is never compared
+Entry = Tuple[Any, int, str]
+
+
+class SortIndex:
+    """
+    Per-column sorted permutations of a catalog.
+
+    A column's index is a list of (key, seq, no) entries kept in ascending
+    order, built the first time that column is asked for and then maintained
+    with bisect on every add / remove, so showing the catalog in any column
+    order is a walk over an existing list instead of a sort. seq is the
+    record's position in catalog order when it was first seen; it breaks ties
+    the way a stable sort of the catalog would.
+    """
+
+    def __init__(self, source: Iterable[Book]):
+        # books in catalog order, read when a column is built
+        self._source = source
+        self.clear()
+
+    def clear(self) -> None:
+        """Forget every built column (the catalog order changed)."""
+        self._columns: Dict[str, List[Entry]] = {}
+        self._entries: Dict[str, Dict[str, Entry]] = {}
+        self._seq: Dict[str, int] = {}
+        self._next_seq = 0
+
+    # ---------- maintenance ----------
+    def add(self, book: Book) -> None:
+        """Insert book, or move it if its "no" is already indexed."""
+        if not self._columns:
+            return  # nothing built yet, the first build reads the catalog
+
+        no = book.no
+        seq = self._seq.get(no)
+        if seq is None:
+            seq = self._seq[no] = self._next_seq
+            self._next_seq += 1
+
+        for col, entries in self._columns.items():
+            by_no = self._entries[col]
+            old = by_no.get(no)
+            if old is not None:
+                del entries[bisect_left(entries, old)]
+            entry = (sort_key(col)(book), seq, no)
+            insort(entries, entry)
+            by_no[no] = entry
+
+    def remove(self, no: str) -> None:
+        if not self._columns:
+            return
+        self._seq.pop(no, None)
+        for col, entries in self._columns.items():
+            old = self._entries[col].pop(no, None)
+            if old is not None:
+                del entries[bisect_left(entries, old)]
+
+    # ---------- query ----------
+    def ordered(self, col: str, reverse: bool = False, only: Optional[Set[str]] = None) -> List[str]:
+        """
+        "no" values sorted by col, ties in catalog order (also when reverse,
+        like sorted(..., reverse=True)). Missing price/year values stay last
+        either way. only restricts the result to those nos.
+        """
+        entries = self._column(col)
+        if only is not None:
+            if len(only) * 4 > len(entries):
+                entries = [e for e in entries if e[2] in only]
+            else:
+                by_no = self._entries[col]
+                entries = sorted(by_no[no] for no in only if no in by_no)
+
+        if not reverse:
+            return [e[2] for e in entries]
+
+        # numeric keys are (0, value) / (1, 0) for missing: keep that tail last
+        tail: List[Entry] = []
+        if col in NUMERIC_COLUMNS:
+            split = bisect_left(entries, ((1,),))
+            entries, tail = entries[:split], entries[split:]
+
+        # walk backwards run by run so equal keys keep ascending seq
+        out: List[str] = []
+        i = len(entries)
+        while i > 0:
+            j = i - 1
+            key = entries[j][0]
+            while j > 0 and entries[j - 1][0] == key:
+                j -= 1
+            out.extend(e[2] for e in entries[j:i])
+            i = j
+        out.extend(e[2] for e in tail)
+        return out
+
+    def _column(self, col: str) -> List[Entry]:
+        entries = self._columns.get(col)
+        if entries is not None:
+            return entries
+        if col not in SORT_COLUMNS:
+            raise ValueError(f"Unknown sort column '{col}'. Use one of: {', '.join(SORT_COLUMNS)}")
+
+        if not self._columns:
+            self._seq = {b.no: i for i, b in enumerate(self._source)}
+            self._next_seq = len(self._seq)
+
+        key = sort_key(col)
+        seq = self._seq
+        by_no = {b.no: (key(b), seq[b.no], b.no) for b in self._source}
+        entries = sorted(by_no.values())
+        self._columns[col] = entries
+        self._entries[col] = by_no
+        return entries
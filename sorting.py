@@ -0,0 +1,103 @@
+# sorting.py
+from __future__ import annotations
+
+from operator import attrgetter
+from typing import Any, Callable, List, Sequence, Tuple, Union
+
+from models import Book, PRICE_OK, YEAR_OK
+
+SORT_COLUMNS = ("no", "title", "genre", "author", "price", "year")
+
+# [(column, descending), ...] -- first entry is the primary key
+SortSpec = Sequence[Tuple[str, bool]]
+
+# position of each text column in Book.folded()
+_FOLDED = {"title": 0, "genre": 1, "author": 2}
+
+# numeric columns: (valid bit, parsed value attribute); missing values sort last
+_NUMERIC = {"price": (PRICE_OK, "price_num"), "year": (YEAR_OK, "year_num")}
+NUMERIC_COLUMNS = tuple(_NUMERIC)
+
+
+def _check(col: str) -> None:
+    if col not in SORT_COLUMNS:
+        raise ValueError(f"Unknown sort column '{col}'. Use one of: {', '.join(SORT_COLUMNS)}")
+
+
+def sort_key(col: str) -> Callable[[Book], Any]:
+    """
+    Ascending key for one column: natural order for no, casefolded text for
+    title/genre/author, numbers for price/year with missing or unparsable
+    values after every real number.
+    """
+    _check(col)
+
+    if col in _NUMERIC:
+        bit, attr = _NUMERIC[col]
+        value = attrgetter(attr)
+
+        def numeric_key(x: Book) -> Tuple[int, float]:
+            return (0, value(x)) if x.valid & bit else (1, 0)
+
+        return numeric_key
+
+    if col == "no":
+        return Book.natural_no
+
+    i = _FOLDED[col]
+
+    def key_func(x: Book) -> str:
+        return x.folded()[i]
+
+    return key_func
+
+
+def normalize_spec(sort: Union[Tuple[str, bool], SortSpec]) -> List[Tuple[str, bool]]:
+    """Accept a single (column, descending) pair or a list of them; validates the columns."""
+    if len(sort) == 2 and isinstance(sort[0], str) and isinstance(sort[1], bool):
+        sort = [sort]
+    spec = [(col, bool(desc)) for col, desc in sort]
+    for col, _desc in spec:
+        _check(col)
+    return spec
+
+
+def parse_spec(text: str) -> List[Tuple[str, bool]]:
+    """Parse "genre, author asc, year desc" into a spec (asc is the default)."""
+    spec = []
+    for part in text.split(","):
+        words = part.split()
+        if not words:
+            continue
+        col = words[0].lower()
+        order = words[1].lower() if len(words) > 1 else "asc"
+        if len(words) > 2 or order not in ("asc", "desc"):
+            raise ValueError(f"Bad sort key '{part.strip()}'. Use: column [asc|desc]")
+        _check(col)
+        spec.append((col, order == "desc"))
+    return spec
+
+
+def format_spec(spec: SortSpec) -> str:
+    """The parse_spec() text for a spec, e.g. "genre asc, year desc"."""
+    return ", ".join(f"{col} {'desc' if desc else 'asc'}" for col, desc in normalize_spec(spec))
+
+
+def sort_books(books: List[Book], spec: SortSpec) -> List[Book]:
+    """
+    Stable multi-column sort, e.g. [("genre", False), ("author", False), ("year", True)].
+    One stable pass per key, last key first. Missing price/year values go
+    last in both directions. Returns a new list.
+    """
+    books = list(books)
+    for col, desc in reversed(normalize_spec(spec)):
+        if col in _NUMERIC:
+            bit, attr = _NUMERIC[col]
+            have = [b for b in books if b.valid & bit]
+            missing = [b for b in books if not b.valid & bit]
+            have.sort(key=attrgetter(attr), reverse=desc)
+            have.extend(missing)
+            books = have
+        else:
+            books.sort(key=sort_key(col), reverse=desc)
+    return books
@@ -0,0 +1,453 @@
+# sqlite_storage.py
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import struct
+import threading
+from pathlib import Path
+from typing import List, Any, Dict, Iterable, Iterator, Optional, Tuple
+
+from models import FIELDS, Book, natural_key, parse_float, parse_int
+from sorting import NUMERIC_COLUMNS, SortSpec, normalize_spec
+from storage import BookStorage, ImportCancelled, MergeSummary, merge_books
+
+# "no" values per lookup when merge_csv joins a CSV against the table
+MERGE_LOOKUP = 500
+
+# Every row also stores a sort key per column next to its values, built in
+# Python by _sort_keys so that SQLite's plain BINARY order on it is
+# sorting.sort_key's order: _natural_blob() for no, casefolded text for
+# title/genre/author (UTF-8 compares by code point, like str), the parsed
+# number for price/year (NULL when missing, which _sorted_parts puts last).
+# Each key column has an index, so a sort reads an index instead of sorting.
+SORT_KEY = {col: f"{col}_key" for col in FIELDS}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS books (
+    no     TEXT PRIMARY KEY,
+    pos    INTEGER NOT NULL,
+    title  TEXT NOT NULL DEFAULT '',
+    genre  TEXT NOT NULL DEFAULT '',
+    author TEXT NOT NULL DEFAULT '',
+    price  TEXT NOT NULL DEFAULT '',
+    year   TEXT NOT NULL DEFAULT '',
+    no_key     BLOB,
+    title_key  TEXT,
+    genre_key  TEXT,
+    author_key TEXT,
+    price_key  REAL,
+    year_key   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_books_pos ON books(pos);
+
+-- trigram full-text index over the same "no title genre author price year" text the Search boxes match
+CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(text, tokenize='trigram');
+
+CREATE TRIGGER IF NOT EXISTS books_ai AFTER INSERT ON books BEGIN
+    INSERT INTO books_fts(rowid, text)
+    VALUES (new.rowid, new.no || ' ' || new.title || ' ' || new.genre || ' ' || new.author || ' ' || new.price || ' ' || new.year);
+END;
+CREATE TRIGGER IF NOT EXISTS books_ad AFTER DELETE ON books BEGIN
+    DELETE FROM books_fts WHERE rowid = old.rowid;
+END;
+CREATE TRIGGER IF NOT EXISTS books_au AFTER UPDATE OF no, title, genre, author, price, year ON books BEGIN
+    DELETE FROM books_fts WHERE rowid = old.rowid;
+    INSERT INTO books_fts(rowid, text)
+    VALUES (new.rowid, new.no || ' ' || new.title || ' ' || new.genre || ' ' || new.author || ' ' || new.price || ' ' || new.year);
+END;
+"""
+
+# one index per sort column; pos last, so ties keep the saved order without a
+# sort step. Run after SCHEMA and _ensure_sort_keys, which adds the key
+# columns to databases from before them.
+SORT_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_books_no_key     ON books(no_key, pos);
+CREATE INDEX IF NOT EXISTS idx_books_title_key  ON books(title_key, pos);
+CREATE INDEX IF NOT EXISTS idx_books_genre_key  ON books(genre_key, pos);
+CREATE INDEX IF NOT EXISTS idx_books_author_key ON books(author_key, pos);
+CREATE INDEX IF NOT EXISTS idx_books_price_key  ON books(price_key, pos);
+CREATE INDEX IF NOT EXISTS idx_books_year_key   ON books(year_key, pos);
+-- the raw-column indexes these replace: SQL collation order is not the sort order
+DROP INDEX IF EXISTS idx_books_title;
+DROP INDEX IF EXISTS idx_books_genre;
+DROP INDEX IF EXISTS idx_books_author;
+DROP INDEX IF EXISTS idx_books_price;
+DROP INDEX IF EXISTS idx_books_year;
+"""
+
+_COLS = ", ".join(FIELDS)
+_KEY_COLS = ", ".join(SORT_KEY.values())
+# INSERT column list and placeholders: pos, then the values and their sort keys (_keyed)
+_ROW_COLS = f"pos, {_COLS}, {_KEY_COLS}"
+_KEYED_PARAMS = ", ".join("?" * (2 * len(FIELDS)))
+_SET_KEYS = ", ".join(f"{key} = excluded.{key}" for key in SORT_KEY.values())
+
+
+def _natural_blob(text: str) -> bytes:
+    """
+    natural_key(text) as bytes that compare (memcmp) in the same order: each
+    run is tagged (digits before text), digit runs by length and value and
+    then the digits as written, text runs casefolded; every run ends in a
+    terminator that sorts below any byte that can follow it.
+    """
+    out = bytearray()
+    for kind, number, run in natural_key(text):
+        if kind == 0:
+            digits = str(number).encode()
+            out += b"\x01" + struct.pack(">I", len(digits)) + digits + run.encode() + b"\x00"
+        else:
+            out += b"\x02" + run.encode().replace(b"\x00", b"\x00\x01") + b"\x00\x00"
+    return bytes(out)
+
+
+def _sort_keys(values: Tuple[str, ...]) -> Tuple[Any, ...]:
+    """The SORT_KEY column values for one row's values (FIELDS order)."""
+    no, title, genre, author, price, year = values
+    price_num, price_ok = parse_float(price)
+    year_num, year_ok = parse_int(year)
+    return (
+        _natural_blob(no),
+        title.casefold(),
+        genre.casefold(),
+        author.casefold(),
+        price_num if price_ok else None,
+        year_num if year_ok else None,
+    )
+
+
+def _keyed(values: Tuple[str, ...]) -> Tuple[Any, ...]:
+    """A row's values followed by their sort keys."""
+    return values + _sort_keys(values)
+
+
+class SqliteBookStorage(BookStorage):
+    """
+    Same surface as BookStorage, backed by a SQLite database.
+
+    The persisted order lives in the "pos" column. Edits are indexed
+    statements on single records; filtered exports (iter_books with a query)
+    go through an FTS5 trigram index instead of scanning a Python list, and
+    sorted ones read the sort-key indexes (SORT_KEY).
+    """
+
+    def __init__(self, db_path: str | Path):
+        # load_books reads the database, there is no books.json to snapshot
+        super().__init__(db_path, binary_snapshot=False)
+        self.db_path = self.data_path
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._ensure_sort_keys()
+        self._conn.executescript(SORT_INDEXES)
+
+        # bumped on our own commits (data_version only moves for other connections)
+        self._writes = 0
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _ensure_sort_keys(self) -> None:
+        """Add and fill the SORT_KEY columns in a database created before them."""
+        have = {r[1] for r in self._conn.execute("PRAGMA table_info(books)")}
+        missing = [key for key in SORT_KEY.values() if key not in have]
+        if not missing:
+            return
+        with self._conn:
+            for key in missing:
+                self._conn.execute(f"ALTER TABLE books ADD COLUMN {key}")
+            rows = self._conn.execute(f"SELECT rowid, {_COLS} FROM books").fetchall()
+            self._conn.executemany(
+                f"UPDATE books SET {', '.join(f'{key} = ?' for key in SORT_KEY.values())} WHERE rowid = ?",
+                (_sort_keys(r[1:]) + r[:1] for r in rows),
+            )
+
+    # ---------- stamps ----------
+    def stamp(self) -> Any:
+        with self._lock:
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return (self._writes, data_version)
+
+    # ---------- core I/O ----------
+    def load_books(self) -> List[Book]:
+        stamp = self.stamp()
+        if stamp == self._cache_stamp:
+            self._saw(stamp, self._cache_books, 0)
+            return self._cache_books
+
+        books = self._query(f"SELECT {_COLS} FROM books ORDER BY pos")
+        self._cache_stamp = stamp
+        self._cache_books = books
+        self._saw(stamp, books, 0)
+        return books
+
+    def _changed_elsewhere(self) -> bool:
+        # data_version only moves for other connections' commits
+        return self._replaced or (self._seen_stamp is not None and self.stamp()[1] != self._seen_stamp[1])
+
+    def save_books(self, books: List[Book]) -> bool:
+        """Replace all rows; commits by other processes since our last read are merged in (returns True)."""
+        with self._lock, self._conn:
+            # write lock first, so nobody commits between the check and the rewrite
+            self._conn.execute("BEGIN IMMEDIATE")
+            merged = self._changed_elsewhere()
+            if merged:
+                books = merge_books(self._seen_books, books, self._query(f"SELECT {_COLS} FROM books ORDER BY pos"))
+            rows = [(i,) + _keyed(b.values()) for i, b in enumerate(books)]
+            self._conn.execute("DELETE FROM books")
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO books({_ROW_COLS}) VALUES (?, {_KEYED_PARAMS})",
+                rows,
+            )
+            self._writes += 1
+
+        self._cache_stamp = self.stamp()
+        self._cache_books = list(books)
+        self._saw(self._cache_stamp, self._cache_books, 0)
+        return merged
+
+    def apply_changes(
+        self,
+        books: Optional[Iterable[Book]],
+        upserts: Iterable[Book] = (),
+        deletes: Iterable[str] = (),
+    ) -> bool:
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            merged = self._changed_elsewhere()
+            # one prepared statement per kind, however big the batch
+            self._conn.executemany(
+                f"""
+                INSERT INTO books({_ROW_COLS})
+                VALUES ((SELECT COALESCE(MAX(pos), -1) + 1 FROM books), {_KEYED_PARAMS})
+                ON CONFLICT(no) DO UPDATE SET
+                    title = excluded.title, genre = excluded.genre, author = excluded.author,
+                    price = excluded.price, year = excluded.year, {_SET_KEYS}
+                """,
+                (_keyed(b.values()) for b in upserts),
+            )
+            self._conn.executemany("DELETE FROM books WHERE no = ?", ((no,) for no in deletes))
+            self._writes += 1
+        if not merged:
+            self._seen_stamp = self.stamp()
+        return merged
+
+    def _write_rows_stream(self, chunks: Iterable[List[Tuple[str, ...]]]) -> None:
+        """One transaction for the whole import: a failure or cancel rolls it back."""
+        pos = 0
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM books")
+            for chunk in chunks:
+                rows = [(pos + i,) + _keyed(values) for i, values in enumerate(chunk)]
+                self._conn.executemany(
+                    f"INSERT OR REPLACE INTO books({_ROW_COLS}) VALUES (?, {_KEYED_PARAMS})",
+                    rows,
+                )
+                pos += len(rows)
+            self._writes += 1
+        # see BookStorage._install_snapshot
+        self._replaced = True
+
+    def _merge_rows(
+        self,
+        incoming: Dict[str, Tuple[str, ...]],
+        policy: str,
+        delete_missing: bool,
+        backup_path: Optional[str | Path],
+        cancel: Optional[Any],
+    ) -> MergeSummary:
+        """
+        The join runs against the "no" primary key in one transaction, so
+        only rows that change are written (and re-indexed). A failure or
+        cancel rolls it back.
+        """
+        backup = self.backup_to_path(backup_path) if backup_path else self._backup_to_store(reason="import_csv")
+        counts = dict.fromkeys(("inserted", "updated", "unchanged", "skipped", "deleted"), 0)
+        nos = list(incoming)
+
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for i in range(0, len(nos), MERGE_LOOKUP):
+                if cancel is not None and cancel.is_set():
+                    raise ImportCancelled()
+                part = nos[i:i + MERGE_LOOKUP]
+                # sqlite3 hands back plain tuples in _COLS (FIELDS) order, like the CSV rows
+                found = {
+                    r[0]: r for r in self._conn.execute(
+                        f"SELECT {_COLS} FROM books WHERE no IN ({', '.join('?' * len(part))})", part
+                    )
+                }
+                inserts, updates = [], []
+                for no in part:
+                    row = incoming[no]
+                    current = found.get(no)
+                    if current is None:
+                        if policy == "update":
+                            counts["skipped"] += 1
+                        else:
+                            inserts.append(row)
+                    elif current == row:
+                        counts["unchanged"] += 1
+                    elif policy == "insert":
+                        counts["skipped"] += 1
+                    else:
+                        updates.append(row)
+
+                counts["updated"] += len(updates)
+                counts["inserted"] += len(inserts)
+                self._conn.executemany(
+                    f"""
+                    UPDATE books SET title = ?, genre = ?, author = ?, price = ?, year = ?,
+                        {", ".join(f"{key} = ?" for key in SORT_KEY.values())}
+                    WHERE no = ?
+                    """,
+                    (r[1:] + _sort_keys(r) + r[:1] for r in updates),
+                )
+                self._conn.executemany(
+                    f"""
+                    INSERT INTO books({_ROW_COLS})
+                    VALUES ((SELECT COALESCE(MAX(pos), -1) + 1 FROM books), {_KEYED_PARAMS})
+                    """,
+                    (_keyed(r) for r in inserts),
+                )
+
+            if delete_missing:
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS merge_nos(no TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM merge_nos")
+                self._conn.executemany("INSERT INTO merge_nos(no) VALUES (?)", ((no,) for no in nos))
+                counts["deleted"] = self._conn.execute(
+                    "DELETE FROM books WHERE no NOT IN (SELECT no FROM merge_nos)"
+                ).rowcount
+            self._writes += 1
+
+        self._replaced = True
+        return MergeSummary(backup=backup, **counts)
+
+    # ---------- maintenance ----------
+    def compact(self) -> None:
+        """Merge the full-text index segments and VACUUM the database file."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute("INSERT INTO books_fts(books_fts) VALUES ('optimize')")
+            self._conn.execute("VACUUM")
+
+    # ---------- export queries ----------
+    def _search_sql(self, query: str, order: str = "pos", where: str = "") -> Tuple[str, tuple]:
+        query = query.strip().lower()
+        # an extra condition on the rows (see _sorted_parts)
+        also = f"{where} AND " if where else ""
+
+        if not query:
+            condition = f" WHERE {where}" if where else ""
+            return f"SELECT {_COLS} FROM books{condition} ORDER BY {order}", ()
+
+        if len(query) >= 3:
+            # trigram index: a quoted phrase matches as a substring
+            phrase = '"' + query.replace('"', '""') + '"'
+            return (
+                f"SELECT {_COLS} FROM books WHERE {also}rowid IN "
+                f"(SELECT rowid FROM books_fts WHERE books_fts MATCH ?) ORDER BY {order}",
+                (phrase,),
+            )
+
+        # too short for a trigram -> plain scan of the fts text
+        pattern = "%" + query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        return (
+            f"SELECT {_COLS} FROM books WHERE {also}rowid IN "
+            f"(SELECT rowid FROM books_fts WHERE text LIKE ? ESCAPE '\\') ORDER BY {order}",
+            (pattern,),
+        )
+
+    def iter_books(
+        self,
+        query: Optional[str] = None,
+        sort: Optional[Tuple[str, bool] | SortSpec] = None,
+    ) -> Iterator[Book]:
+        """Streams rows from a cursor on its own connection, so memory stays flat."""
+        parts = self._sorted_parts(normalize_spec(sort)) if sort else [("", "pos")]
+        conn = sqlite3.connect(str(self.db_path))
+        try:
+            for where, order in parts:
+                sql, params = self._search_sql(query or "", order, where)
+                for r in conn.execute(sql, params):
+                    yield Book(*r)
+        finally:
+            conn.close()
+
+    def count_books(self, query: Optional[str] = None) -> int:
+        sql, params = self._search_sql(query or "")
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM ({sql})", params).fetchone()[0]
+
+    def _sorted_parts(self, spec: SortSpec) -> List[Tuple[str, str]]:
+        """
+        (WHERE condition, ORDER BY) queries whose results, one after the
+        other, are the sorted rows. Missing numbers go last either way and
+        ties fall back to the saved order, like sorting.sort_books. A "key IS
+        NULL" ORDER BY term would keep SQLite off the key's index, so a
+        leading numeric column is read in two queries instead: the rows
+        that have a number, in index order, then the ones that do not.
+        """
+        (col, desc), rest = spec[0], spec[1:]
+        if col not in NUMERIC_COLUMNS:
+            return [("", self._order_by_spec(spec))]
+        key = SORT_KEY[col]
+        return [
+            (f"{key} IS NOT NULL", f"{key} {'DESC' if desc else 'ASC'}, {self._order_by_spec(rest)}"),
+            (f"{key} IS NULL", self._order_by_spec(rest)),
+        ]
+
+    def _order_by_spec(self, spec: SortSpec) -> str:
+        # multi-column ORDER BY; NULL (missing) numbers last, ties in saved order
+        terms = []
+        for col, desc in spec:
+            if col in NUMERIC_COLUMNS:
+                terms.append(f"{SORT_KEY[col]} IS NULL")
+            terms.append(f"{SORT_KEY[col]} {'DESC' if desc else 'ASC'}")
+        return ", ".join(terms + ["pos"])
+
+    def _query(self, sql: str, params: tuple = ()) -> List[Book]:
+        with self._lock:
+            cur = self._conn.execute(sql, params)
+            # _COLS is FIELDS order, i.e. Book's positional order
+            return [Book(*r) for r in cur]
+
+    # ---------- backups (written as books.json-style files) ----------
+    def backup_to_path(self, backup_path: str | Path) -> str:
+        """Write the current catalog as JSON to a user-selected path."""
+        backup_path = Path(backup_path)
+        backup_path.parent.mkdir(parents=True, exist_ok=True)
+        with backup_path.open("w", encoding="utf-8") as f:
+            json.dump({"books": [b.to_dict() for b in self.load_books()]}, f, ensure_ascii=False, indent=2)
+        return str(backup_path)
+
+    def _backup_to_store(self, reason: str = "import_csv") -> str:
+        return self._backup_books_to_store(self.load_books(), reason)
+
+
+# ---------- one-shot migration ----------
+def migrate_json_to_sqlite(json_path: str | Path, db_path: str | Path) -> int:
+    """Copy books.json into a (new or existing) SQLite database. Returns the number of books."""
+    books = BookStorage(json_path, binary_snapshot=False).load_books()
+    storage = SqliteBookStorage(db_path)
+    try:
+        storage.save_books(books)
+    finally:
+        storage.close()
+    return len(books)
+
+
+if __name__ == "__main__":
+    import sys
+
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    src = sys.argv[1] if len(sys.argv) > 1 else os.path.join(base_dir, "data", "books.json")
+    dst = sys.argv[2] if len(sys.argv) > 2 else os.path.join(base_dir, "data", "books.db")
+    n = migrate_json_to_sqlite(src, dst)
+    print(f"Migrated {n} books: {src} -> {dst}")
@@ -4,10 +4,220 @@ from __future__ import annotations
 import csv
 import json
 import os
+import re
 import shutil
 import tempfile
+from contextlib import contextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, Tuple
+
+from backup_store import READ_BLOCK, BackupStore
+from filelock import FileLock
+from models import FIELDS, Book
+from search_index import search_text
+from snapshot import open_snapshot, write_snapshot
+from sorting import SortSpec, sort_books
+
+# rows handed to the writer at a time by the streaming import
+IMPORT_CHUNK = 5000
+
+# rows between progress reports / write buffer size for the streaming export
+EXPORT_CHUNK = 10000
+EXPORT_BUFFER = 1024 * 1024
+
+# one book inside the "books" list, laid out the way json.dump(indent=2) does it
+_BOOK_JSON = "    {\n" + ",\n".join(f'      "{f}": %s' for f in FIELDS) + "\n    }"
+_json_str = json.encoder.encode_basestring  # json.dumps(s, ensure_ascii=False) for a str
+
+# books.json starts with its version; this much of the file is enough to read it
+_VERSION_HEAD = re.compile(rb'^\{\s*"version":\s*(\d+)')
+VERSION_PEEK = 64
+
+# progress(rows_done, bytes_done, bytes_total)
+# (export reports rows_done, rows_done, rows_total; rows_total is 0 when unknown)
+ProgressCallback = Callable[[int, int, int], None]
+
+
+class ImportCancelled(Exception):
+    """Raised inside a streaming import when its cancel event is set."""
+
+
+# ---------- csv streams ----------
+def read_csv_books(lines: Iterable[str]) -> Iterator[Book]:
+    """
+    Validated books out of CSV text lines (a file, sys.stdin, ...), one row at a time.
+    Required headers: no,title,genre,author,price,year (any order, any case).
+    Blank rows are skipped; a row without no or title raises ValueError with its line number.
+    """
+    reader = csv.reader(lines)
+    header = next(reader, None)
+    if not header:
+        raise ValueError("CSV has no header row.")
+
+    for values in csv_rows(reader, csv_columns(header)):
+        yield Book(*values)
+
+
+def csv_columns(header: Sequence[str]) -> List[int]:
+    """Position of each of FIELDS in a CSV header row (any order, any case)."""
+    fieldnames = [h.strip().lower() for h in header]
+    fieldnames[0] = fieldnames[0].lstrip("\ufeff")
+    for r in FIELDS:
+        if r not in fieldnames:
+            raise ValueError(f"Missing required column '{r}'. Found: {fieldnames}")
+    return [fieldnames.index(r) for r in FIELDS]
+
+
+def csv_rows(reader: Any, columns: Sequence[int], line_offset: int = 0) -> Iterator[Tuple[str, ...]]:
+    """
+    Stripped FIELDS values of each data row from a csv.reader, skipping blank rows.
+    Errors name line_offset + the reader's line, so a reader over part of a
+    file (csv_parallel) still reports the line in the whole file.
+    """
+    width = max(columns) + 1
+    for row in reader:
+        if len(row) >= width:
+            values = tuple([row[i].strip() for i in columns])
+        else:  # short row: missing cells are empty
+            values = tuple([row[i].strip() if i < len(row) else "" for i in columns])
+
+        if not values[0] or not values[1]:
+            if not any(values):
+                continue
+            raise ValueError(f"Each row must have at least 'no' and 'title' (line {line_offset + reader.line_num}).")
+
+        yield values
+
+
+def iter_books_json(chunks: Iterable[List[Tuple[str, ...]]], version: Optional[int] = None) -> Iterator[str]:
+    """books.json text for chunks of FIELDS-ordered rows, a piece at a time (no "version" if None)."""
+    yield "{\n" + (f'  "version": {version},\n' if version is not None else "") + '  "books": ['
+    sep = "\n"
+    for chunk in chunks:
+        if chunk:
+            yield sep + ",\n".join([_BOOK_JSON % tuple(map(_json_str, row)) for row in chunk])
+            sep = ",\n"
+    yield "\n  ]\n}" if sep == ",\n" else "]\n}"
+
+
+def write_csv_books(
+    f: Any,
+    books: Iterable[Book],
+    columns: Optional[Sequence[str]] = None,
+    progress: Optional[ProgressCallback] = None,
+    total: int = 0,
+) -> int:
+    """
+    Write a header plus one row per book to an open text file (newline="").
+    Returns the number of rows written; progress as for export_csv.
+    """
+    columns = list(columns or FIELDS)
+    for c in columns:
+        if c not in FIELDS:
+            raise ValueError(f"Unknown column '{c}'. Use any of: {', '.join(FIELDS)}")
+
+    rows = 0
+    w = csv.writer(f)
+    w.writerow(columns)
+    for b in books:
+        w.writerow([getattr(b, c) for c in columns])
+        rows += 1
+        if progress and rows % EXPORT_CHUNK == 0:
+            progress(rows, rows, total)
+
+    if progress:
+        progress(rows, rows, total or rows)
+    return rows
+
+
+# ---------- merging ----------
+def apply_edits(books: Iterable[Book], upserts: Iterable[Book] = (), deletes: Iterable[str] = ()) -> List[Book]:
+    """books with upserts / deletes replayed over them (replaced records keep their slot, new ones go last)."""
+    by_no = {b.no: b for b in books}
+    for b in upserts:
+        by_no[b.no] = b
+    for no in deletes:
+        by_no.pop(no, None)
+    return list(by_no.values())
+
+
+def merge_books(base: Optional[Iterable[Book]], ours: Iterable[Book], theirs: Iterable[Book]) -> List[Book]:
+    """
+    Three-way merge, record by record, of two lists that both started from base.
+    A record one side left as it was in base takes the other side's version
+    (including a delete); one both sides changed keeps ours; one deleted on
+    one side but edited on the other keeps the edit. Ours gives the order,
+    records only the other side added go last. Without a base (unknown)
+    nothing is deleted and ours wins every difference.
+    """
+    old = {b.no: b for b in base} if base is not None else None
+    other = {b.no: b for b in theirs}
+
+    merged = []
+    mine = set()
+    for b in ours:
+        mine.add(b.no)
+        if old is not None and old.get(b.no) == b:
+            # untouched here: whatever they have (nothing if they deleted it)
+            if b.no in other:
+                merged.append(other[b.no])
+        else:
+            merged.append(b)
+
+    for no, b in other.items():
+        if no in mine:
+            continue
+        if old is None or no not in old or old[no] != b:
+            merged.append(b)  # added by them, or edited by them after we deleted it
+    return merged
+
+
+class StorageBatch:
+    """
+    Upserts / deletes collected by BookStorage.batch(). The last change to a
+    "no" wins (an upsert after a delete re-adds it, a delete drops an earlier upsert).
+    """
+
+    def __init__(self) -> None:
+        self.upserts: Dict[str, Book] = {}
+        self.deletes: Dict[str, None] = {}
+        # set on commit: True if other processes' changes were merged in (see save_books)
+        self.merged = False
+
+    def upsert(self, book: Book) -> None:
+        self.deletes.pop(book.no, None)
+        self.upserts[book.no] = book
+
+    def delete(self, no: str) -> None:
+        self.upserts.pop(no, None)
+        self.deletes[no] = None
+
+    def __len__(self) -> int:
+        return len(self.upserts) + len(self.deletes)
+
+
+# merge_csv policies: which CSV rows are applied
+MERGE_POLICIES = ("upsert", "insert", "update")
+
+
+class MergeSummary(NamedTuple):
+    """
+    What merge_csv did. skipped counts CSV rows the policy ignored (an
+    existing "no" under insert, a new one under update).
+    """
+    inserted: int
+    updated: int
+    unchanged: int
+    skipped: int
+    deleted: int
+    backup: str
+
+
+def _int_version(value: Any) -> int:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
 
 
 class BookStorage:
@@ -15,25 +225,99 @@ class BookStorage:
     Handles reading/writing books from/to data/books.json
     Also supports importing from CSV with safe backup behavior
     and restoring 4 default SAMPLE books only when user clicks.
+
+    With binary_snapshot on, a memory-mapped copy (books.json.snap, see
+    snapshot.py) is kept next to books.json; while it matches books.json,
+    load_books() returns it without parsing any JSON.
+
+    Several processes can share one books.json: writes hold an advisory
+    lock (books.json.lock), replace the file by rename and bump the
+    "version" stored in it. A process that saves after another one did
+    merges the other's record changes in (merge_books) instead of
+    overwriting them; the write then returns True.
     """
 
-    def __init__(self, data_path: str | Path):
-        self.data_path = Path(data_path)
+    # processes for import_csv_with_backup: 0 = one per core for big files, 1 = always serial
+    import_workers = 0
+
+    # where automatic backups go (see backup_store.py); None = a backups/ folder next to the data
+    backups: Optional[BackupStore] = None
+
+    def __init__(self, data_path: Optional[str | Path], binary_snapshot: bool = True):
+        # None: no local file (RemoteStorage overrides everything that would open one)
+        self.data_path: Optional[Path] = Path(data_path) if data_path is not None else None
+        self.binary_snapshot_path: Optional[Path] = (
+            self.data_path.with_name(self.data_path.name + ".snap") if binary_snapshot and self.data_path else None
+        )
+
+        self.lock: Optional[FileLock] = (
+            FileLock(self.data_path.with_name(self.data_path.name + ".lock")) if self.data_path else None
+        )
+
+        # last normalized list + the file stamp / version it belongs to
+        self._cache_stamp: Optional[Tuple[int, int, int]] = None
+        self._cache_books: Sequence[Book] = []
+        self._cache_version = 0
+
+        # what this process last read or wrote: saves by others are detected against it
+        self.version = 0
+        self._seen_stamp: Any = None
+        self._seen_books: Optional[Sequence[Book]] = None
+        # set by an import / merge / restore: no caller holds the stored list until the next load
+        self._replaced = False
+
+    # ---------- load cache ----------
+    def _file_stamp(self) -> Optional[Tuple[int, int, int]]:
+        """(mtime_ns, size, inode) of books.json, or None if it is missing."""
+        try:
+            st = os.stat(self.data_path)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def stamp(self) -> Any:
+        """Cheap token that changes whenever load_books() would return something new."""
+        return self._file_stamp()
+
+    @staticmethod
+    def normalize_book(b: Dict[str, Any]) -> Book:
+        return Book.from_dict(b)
 
     # ---------- core json I/O ----------
-    def load_books(self) -> List[Dict[str, Any]]:
+    def load_books(self) -> Sequence[Book]:
+        """
+        Returns the normalized books.
+        While books.json is unchanged (same mtime, size and inode) the
+        cached list is returned as-is, so callers must treat it as read-only.
+        A matching binary snapshot is returned instead of parsing JSON; it is
+        a read-only sequence that decodes records as they are accessed.
+        """
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._cache_stamp:
+            self._saw(stamp, self._cache_books, self._cache_version)
+            return self._cache_books
+
+        if stamp is not None and self.binary_snapshot_path is not None:
+            snap = open_snapshot(self.binary_snapshot_path, stamp)
+            if snap is not None:
+                self._cache_stamp = stamp
+                self._cache_books = snap
+                self._cache_version = self._peek_version()
+                self._saw(stamp, snap, self._cache_version)
+                return snap
+
         if not self.data_path.exists():
             # if file missing -> create empty structure (NO auto defaults)
-            self.save_books([])
+            self._replace_books([])
             return []
 
         try:
             with self.data_path.open("r", encoding="utf-8") as f:
                 data = json.load(f)
         except json.JSONDecodeError:
-            # broken json -> backup to temp then reset empty
-            self._backup_to_temp(reason="broken_json")
-            self.save_books([])
+            # broken json -> keep its bytes in the backup store, then reset empty
+            BookStorage._backup_to_store(self, reason="broken_json")
+            self._replace_books([])
             return []
 
         books = data.get("books", [])
@@ -41,23 +325,133 @@ class BookStorage:
             return []
 
         # normalize
-        fixed = []
-        for b in books:
-            fixed.append({
-                "no": str(b.get("no", "")).strip(),
-                "title": str(b.get("title", "")).strip(),
-                "genre": str(b.get("genre", "")).strip(),
-                "author": str(b.get("author", "")).strip(),
-                "price": str(b.get("price", "")).strip(),
-                "year": str(b.get("year", "")).strip(),
-            })
+        fixed = [self.normalize_book(b) for b in books]
+        self._write_binary_snapshot(fixed, stamp)
+
+        self._cache_stamp = stamp
+        self._cache_books = fixed
+        self._cache_version = _int_version(data.get("version"))
+        self._saw(stamp, fixed, self._cache_version)
         return fixed
 
-    def save_books(self, books: List[Dict[str, Any]]) -> None:
+    def save_books(self, books: List[Book]) -> bool:
+        """
+        Replace books.json with books (temp file + rename, so a reader never
+        sees half a file). If another process saved since this one last read
+        or wrote it, the two are merged record by record (merge_books) and
+        True is returned: the caller's copy is then behind the file.
+        """
+        with self.lock.exclusive():
+            merged = self._changed_elsewhere()
+            if merged:
+                base = self._seen_books
+                books = merge_books(base, books, self.load_books())
+            self._write_json(books)
+        return merged
+
+    def _replace_books(self, books: List[Book]) -> None:
+        """Replace books.json outright, whatever other processes did (restore, reset)."""
+        with self.lock.exclusive():
+            self._write_json(books)
+
+    def _write_json(self, books: Sequence[Book]) -> None:
+        # caller holds the lock
+        version = max(self.version, self._peek_version()) + 1
+        tmp = self._dump_tmp(books, version)
+        os.replace(tmp, self.data_path)
+
+        # what we just wrote is what the next load would parse
+        self._cache_stamp = self._file_stamp()
+        self._cache_books = list(books)
+        self._cache_version = version
+        self._saw(self._cache_stamp, self._cache_books, version)
+        self._write_binary_snapshot(self._cache_books, self._cache_stamp)
+
+    def _dump_tmp(self, books: Sequence[Book], version: int) -> str:
         self.data_path.parent.mkdir(parents=True, exist_ok=True)
-        payload = {"books": books}
-        with self.data_path.open("w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
+        fd, tmp = tempfile.mkstemp(prefix=self.data_path.name + ".", suffix=".tmp", dir=self.data_path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"version": version, "books": [b.to_dict() for b in books]}, f, ensure_ascii=False, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp
+
+    # ---------- versions ----------
+    def _saw(self, stamp: Any, books: Optional[Sequence[Book]], version: int) -> None:
+        self._seen_stamp = stamp
+        self._seen_books = books
+        self.version = version
+        self._replaced = False
+
+    def _changed_elsewhere(self) -> bool:
+        """
+        True if storage moved on since this process last read or wrote it,
+        or was replaced wholesale by it since (call under the lock).
+        """
+        return self._replaced or (self._seen_stamp is not None and self.stamp() != self._seen_stamp)
+
+    def _peek_version(self) -> int:
+        """Version at the head of books.json (0 if missing or written before versions existed)."""
+        try:
+            with self.data_path.open("rb") as f:
+                head = f.read(VERSION_PEEK)
+        except OSError:
+            return 0
+        m = _VERSION_HEAD.match(head)
+        return int(m.group(1)) if m else 0
+
+    def _write_binary_snapshot(self, books: Sequence[Book], stamp: Optional[Tuple[int, int, int]]) -> None:
+        """Best effort: a missing or stale snapshot only means the next load parses JSON."""
+        if self.binary_snapshot_path is None or stamp is None:
+            return
+        if len({b.no for b in books}) != len(books):
+            return  # duplicate nos: BookCatalog must see the raw rows to merge them
+        try:
+            write_snapshot(self.binary_snapshot_path, books, stamp)
+        except OSError:
+            pass
+
+    def apply_changes(
+        self,
+        books: Optional[Iterable[Book]],
+        upserts: Iterable[Book] = (),
+        deletes: Iterable[str] = (),
+    ) -> bool:
+        """
+        Persist record edits, all in one write.
+        books is the full current list (or None if the caller has none);
+        this plain JSON storage simply rewrites it, record-level backends
+        only look at upserts/deletes. Without books, or if storage moved on
+        meanwhile (another process saved, or an import, merge or restore
+        replaced the file), the edits are replayed onto the stored list
+        instead; True is returned in the latter case (as for save_books).
+        """
+        with self.lock.exclusive():
+            merged = self._changed_elsewhere()
+            if books is None or merged:
+                books = apply_edits(self.load_books(), upserts, deletes)
+            self._write_json(list(books))
+            return merged
+
+    @contextmanager
+    def batch(self) -> Iterator[StorageBatch]:
+        """
+        Collect many edits and commit them as one atomic write when the block ends:
+
+            with storage.batch() as tx:
+                for b in repriced:
+                    tx.upsert(b)
+
+        Nothing is written if the block raises.
+        """
+        tx = StorageBatch()
+        yield tx
+        if tx:
+            tx.merged = self.apply_changes(None, tx.upserts.values(), tx.deletes)
 
     # ---------- backups ----------
     def backup_to_path(self, backup_path: str | Path) -> str:
@@ -65,102 +459,368 @@ class BookStorage:
         backup_path = Path(backup_path)
         backup_path.parent.mkdir(parents=True, exist_ok=True)
 
-        if self.data_path.exists():
-            shutil.copy2(self.data_path, backup_path)
-        else:
-            self.save_books([])
-            shutil.copy2(self.data_path, backup_path)
+        if not self.data_path.exists():
+            self._replace_books([])
+        shutil.copy2(self.data_path, backup_path)
 
         return str(backup_path)
 
-    def _backup_to_temp(self, reason: str = "import_csv") -> str:
-        """Copy current books.json to a temp file and return its path."""
-        tmp_dir = Path(tempfile.gettempdir())
-        tmp_name = f"books_backup_{reason}_{os.getpid()}.json"
-        tmp_path = tmp_dir / tmp_name
+    def backup_store(self) -> BackupStore:
+        if self.backups is None:
+            self.backups = BackupStore(self.data_path.parent / "backups")
+        return self.backups
 
-        if self.data_path.exists():
-            shutil.copy2(self.data_path, tmp_path)
+    def _backup_to_store(self, reason: str = "import_csv") -> str:
+        """Add current books.json to the backup store; returns the backup's manifest path."""
+        with self.lock.shared():
+            if not self.data_path.exists():
+                self._replace_books([])
+            with self.data_path.open("rb") as f:
+                return self.backup_store().add(iter(lambda: f.read(READ_BLOCK), b""), reason, str(self.data_path))
+
+    def _backup_books_to_store(self, books: Sequence[Book], reason: str) -> str:
+        """Back up books written out in the books.json layout (the same every time, so unchanged stretches dedupe)."""
+        rows = ([b.values() for b in books[i:i + IMPORT_CHUNK]] for i in range(0, len(books), IMPORT_CHUNK))
+        pieces = (piece.encode("utf-8") for piece in iter_books_json(rows))
+        return self.backup_store().add(pieces, reason, str(self.data_path))
+
+    def restore_backup(self, ref: str | Path) -> str:
+        """
+        Replace the catalog with a backup from the store (by manifest path
+        or name), reassembled chunk by chunk into a temp file first, or with
+        a books.json copy written by backup_to_path. The current books are
+        backed up before; returns that backup's manifest.
+        """
+        store = self.backup_store()
+        path = Path(ref)
+        if path.is_file() and path.parent != store.root / "manifests":
+            with path.open("r", encoding="utf-8") as f:
+                books = json.load(f).get("books", [])
         else:
-            self.save_books([])
-            shutil.copy2(self.data_path, tmp_path)
+            fd, tmp = tempfile.mkstemp(prefix="books_restore_", suffix=".json")
+            os.close(fd)
+            try:
+                store.restore(store.manifest_path(ref), tmp)
+                with open(tmp, "r", encoding="utf-8") as f:
+                    books = json.load(f).get("books", [])
+            finally:
+                os.unlink(tmp)
 
-        return str(tmp_path)
+        backup_used = self._backup_to_store(reason="restore")
+        self._write_books_stream([[self.normalize_book(b) for b in books]])
+        return backup_used
 
     # ---------- import from csv ----------
-    def import_from_csv(self, csv_path: str | Path) -> List[Dict[str, Any]]:
+    def iter_csv_books(
+        self,
+        csv_path: str | Path,
+        progress: Optional[ProgressCallback] = None,
+        every: int = IMPORT_CHUNK,
+    ) -> Iterator[Book]:
         """
-        Reads CSV and returns list of book dicts.
+        Streams validated books out of a CSV, one row at a time.
         Required headers: no,title,genre,author,price,year
+        progress (if given) is called every `every` rows and once at the end.
         """
         csv_path = Path(csv_path)
         if not csv_path.exists():
             raise FileNotFoundError(f"CSV file not found: {csv_path}")
 
-        with csv_path.open("r", encoding="utf-8-sig", newline="") as f:
-            reader = csv.DictReader(f)
-            if not reader.fieldnames:
-                raise ValueError("CSV has no header row.")
-
-            fieldnames = [h.strip().lower() for h in reader.fieldnames]
-            required = ["no", "title", "genre", "author", "price", "year"]
-            for r in required:
-                if r not in fieldnames:
-                    raise ValueError(f"Missing required column '{r}'. Found: {fieldnames}")
-
-            header_map = {h.strip().lower(): h for h in reader.fieldnames}
-
-            books: List[Dict[str, Any]] = []
-            for row in reader:
-                book = {
-                    "no": str(row.get(header_map["no"], "")).strip(),
-                    "title": str(row.get(header_map["title"], "")).strip(),
-                    "genre": str(row.get(header_map["genre"], "")).strip(),
-                    "author": str(row.get(header_map["author"], "")).strip(),
-                    "price": str(row.get(header_map["price"], "")).strip(),
-                    "year": str(row.get(header_map["year"], "")).strip(),
-                }
+        total = csv_path.stat().st_size
+        done = 0
 
-                if not any(book.values()):
-                    continue
+        with csv_path.open("rb") as fb:
+            def lines() -> Iterator[str]:
+                # decode line by line ourselves so bytes read can be counted
+                nonlocal done
+                for raw in fb:
+                    done += len(raw)
+                    yield raw.decode("utf-8")
 
-                if not book["no"] or not book["title"]:
-                    raise ValueError("Each row must have at least 'no' and 'title'.")
+            rows = 0
+            for book in read_csv_books(lines()):
+                yield book
+                rows += 1
+                if progress and rows % every == 0:
+                    progress(rows, done, total)
 
-                books.append(book)
+            if progress:
+                progress(rows, total, total)
 
-        return books
+    def import_from_csv(self, csv_path: str | Path) -> List[Book]:
+        """
+        Reads CSV and returns list of books.
+        Required headers: no,title,genre,author,price,year
+        """
+        return list(self.iter_csv_books(csv_path))
 
     def import_csv_with_backup(
         self,
         csv_path: str | Path,
         backup_path: Optional[str | Path] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[Any] = None,
+        chunk_size: int = IMPORT_CHUNK,
+        workers: Optional[int] = None,
     ) -> str:
         """
         Import CSV and overwrite books.json.
         If backup_path provided -> backup there.
-        Else -> backup to temp.
+        Else -> backup to the backup store.
         Returns backup file path used.
+
+        Rows are streamed and written in chunks of chunk_size, so memory
+        stays flat no matter how big the CSV is. Setting cancel (a
+        threading.Event) raises ImportCancelled and leaves the current data
+        exactly as it was before the import.
+
+        workers (default: self.import_workers) > 1 parses the CSV in that many
+        processes (see csv_parallel.py); 0 picks one per core for big files.
         """
+        return self._import_rows(self._csv_row_chunks(csv_path, progress, cancel, chunk_size, workers), backup_path)
+
+    def merge_csv(
+        self,
+        csv_path: str | Path,
+        policy: str = "upsert",
+        delete_missing: bool = False,
+        backup_path: Optional[str | Path] = None,
+        progress: Optional[ProgressCallback] = None,
+        cancel: Optional[Any] = None,
+        workers: Optional[int] = None,
+    ) -> MergeSummary:
+        """
+        Apply a CSV to the catalog by "no" instead of replacing it:
+          upsert - add new numbers, overwrite existing ones
+          insert - only add numbers that are not in the catalog yet
+          update - only overwrite numbers already in the catalog
+        delete_missing also drops books whose number is not in the CSV.
+
+        The CSV rows are held in a dict by "no" (the last row for a number
+        wins); the catalog then streams past it once and the result is
+        written in that same pass, new books last in CSV order. Backup and
+        cancel work as for import_csv_with_backup.
+        """
+        if policy not in MERGE_POLICIES:
+            raise ValueError(f"Unknown merge policy '{policy}'. Use {', '.join(MERGE_POLICIES)}.")
+
+        incoming: Dict[str, Tuple[str, ...]] = {}
+        for chunk in self._csv_row_chunks(csv_path, progress, cancel, IMPORT_CHUNK, workers):
+            for row in chunk:
+                incoming[row[0]] = row
+        return self._merge_rows(incoming, policy, delete_missing, backup_path, cancel)
+
+    def _csv_row_chunks(
+        self,
+        csv_path: str | Path,
+        progress: Optional[ProgressCallback],
+        cancel: Optional[Any],
+        chunk_size: int,
+        workers: Optional[int],
+    ) -> Iterator[List[Tuple[str, ...]]]:
+        from csv_parallel import auto_workers, iter_csv_rows_parallel  # csv_parallel imports this module
+
+        if not Path(csv_path).exists():
+            raise FileNotFoundError(f"CSV file not found: {csv_path}")
+        workers = auto_workers(csv_path, self.import_workers if workers is None else workers)
+        if workers > 1:
+            return iter_csv_rows_parallel(csv_path, workers, progress, cancel)
+
+        books = self.iter_csv_books(csv_path, progress=progress, every=chunk_size)
+        return ([b.values() for b in chunk] for chunk in self._chunked(books, chunk_size, cancel))
+
+    def _merge_rows(
+        self,
+        incoming: Dict[str, Tuple[str, ...]],
+        policy: str,
+        delete_missing: bool,
+        backup_path: Optional[str | Path],
+        cancel: Optional[Any],
+    ) -> MergeSummary:
+        counts = dict.fromkeys(("inserted", "updated", "unchanged", "skipped", "deleted"), 0)
+
+        def merged() -> Iterator[List[Tuple[str, ...]]]:
+            # consumed under _write_rows_stream's lock: the catalog read here is the one replaced
+            chunk: List[Tuple[str, ...]] = []
+            for book in self.load_books():
+                values = book.values()
+                row = incoming.pop(book.no, None)
+                if row is None:
+                    if delete_missing:
+                        counts["deleted"] += 1
+                        continue
+                elif row == values:
+                    counts["unchanged"] += 1
+                elif policy == "insert":
+                    counts["skipped"] += 1
+                else:
+                    counts["updated"] += 1
+                    values = row
+                chunk.append(values)
+                if len(chunk) >= IMPORT_CHUNK:
+                    if cancel is not None and cancel.is_set():
+                        raise ImportCancelled()
+                    yield chunk
+                    chunk = []
+            yield chunk
+
+            # what is left never matched: new books
+            if policy == "update":
+                counts["skipped"] += len(incoming)
+            else:
+                counts["inserted"] += len(incoming)
+                yield from self._chunked(incoming.values(), IMPORT_CHUNK, cancel)
+
+        backup = self._import_rows(merged(), backup_path)
+        return MergeSummary(backup=backup, **counts)
+
+    def import_books(
+        self,
+        books: Iterable[Book],
+        backup_path: Optional[str | Path] = None,
+        cancel: Optional[Any] = None,
+        chunk_size: int = IMPORT_CHUNK,
+    ) -> str:
+        """
+        Replace the whole catalog with a stream of books (e.g. read_csv_books(sys.stdin)),
+        backing up first like import_csv_with_backup. Returns the backup path used.
+        """
+        chunks = self._chunked(books, chunk_size, cancel)
+        return self._import_rows(([b.values() for b in chunk] for chunk in chunks), backup_path)
+
+    def _import_rows(self, chunks: Iterable[List[Tuple[str, ...]]], backup_path: Optional[str | Path] = None) -> str:
+        """import_books for chunks of FIELDS-ordered value tuples."""
         if backup_path:
             backup_used = self.backup_to_path(backup_path)
         else:
-            backup_used = self._backup_to_temp(reason="import_csv")
+            backup_used = self._backup_to_store(reason="import_csv")
 
-        books = self.import_from_csv(csv_path)
-        self.save_books(books)
+        self._write_rows_stream(chunks)
 
         return backup_used
 
+    @staticmethod
+    def _chunked(
+        books: Iterable[Book],
+        chunk_size: int,
+        cancel: Optional[Any] = None,
+    ) -> Iterator[List[Book]]:
+        chunk: List[Book] = []
+        for b in books:
+            chunk.append(b)
+            if len(chunk) >= chunk_size:
+                if cancel is not None and cancel.is_set():
+                    raise ImportCancelled()
+                yield chunk
+                chunk = []
+        if cancel is not None and cancel.is_set():
+            raise ImportCancelled()
+        if chunk:
+            yield chunk
+
+    def _write_books_stream(self, chunks: Iterable[List[Book]]) -> None:
+        self._write_rows_stream([b.values() for b in chunk] for chunk in chunks)
+
+    def _write_rows_stream(self, chunks: Iterable[List[Tuple[str, ...]]]) -> None:
+        """
+        Write chunks to a temp file next to books.json and swap it in only when complete.
+        The lock is held throughout: edits from other processes wait and then land on top.
+        """
+        with self.lock.exclusive():
+            version = max(self.version, self._peek_version()) + 1
+            tmp = self._stream_to_tmp(chunks, version)
+            self._install_snapshot(tmp)
+            self.version = version
+
+    def _stream_to_tmp(self, chunks: Iterable[List[Tuple[str, ...]]], version: int) -> str:
+        self.data_path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=self.data_path.name + ".", suffix=".tmp", dir=self.data_path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                for piece in iter_books_json(chunks, version):
+                    f.write(piece)
+                f.flush()
+                os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return tmp
+
+    def _install_snapshot(self, tmp: str) -> None:
+        os.replace(tmp, self.data_path)
+        self._cache_stamp = None
+        self._cache_books = []
+        # callers still hold the list from before: their next write merges onto this one
+        # (the seen list stays as its base) and reports them behind
+        self._replaced = True
+
+    # ---------- export to csv ----------
+    def iter_books(
+        self,
+        query: Optional[str] = None,
+        sort: Optional[Tuple[str, bool] | SortSpec] = None,
+    ) -> Iterator[Book]:
+        """
+        Yields books in saved order, optionally filtered by a Search-box query
+        and/or sorted by (column, reverse) or a list of such keys.
+        Nothing is copied unless sorting.
+        """
+        books: Iterable[Book] = self.load_books()
+        query = (query or "").strip().lower()
+        if query:
+            books = (b for b in books if query in search_text(b))
+        if sort:
+            books = sort_books(list(books), sort)
+        yield from books
+
+    def count_books(self, query: Optional[str] = None) -> int:
+        """Number of books iter_books(query) would yield, or 0 if that is not cheap to know."""
+        return 0 if (query or "").strip() else len(self.load_books())
+
+    def export_csv(
+        self,
+        path: str | Path,
+        query: Optional[str] = None,
+        sort: Optional[Tuple[str, bool] | SortSpec] = None,
+        columns: Optional[Sequence[str]] = None,
+        progress: Optional[ProgressCallback] = None,
+    ) -> int:
+        """
+        Stream books straight from storage into a CSV file.
+        query / sort / columns mirror the Search box, the Sort page order and
+        its visible columns. Returns the number of rows written.
+        """
+        for c in columns or ():
+            if c not in FIELDS:
+                raise ValueError(f"Unknown column '{c}'. Use any of: {', '.join(FIELDS)}")
+
+        total = self.count_books(query)
+        with open(path, "w", newline="", encoding="utf-8", buffering=EXPORT_BUFFER) as f:
+            return write_csv_books(f, self.iter_books(query, sort), columns, progress, total)
+
+    # ---------- maintenance ----------
+    def compact(self) -> None:
+        """
+        Rewrite storage in its tidiest form. For plain books.json that is one
+        rewrite that merges repeated "no"s (first slot, last values, like
+        BookCatalog does) and rebuilds the binary snapshot.
+        """
+        with self.lock.exclusive():
+            self.save_books(list({b.no: b for b in self.load_books()}.values()))
+
     # ---------- defaults (ONLY by button click) ----------
-    def default_books(self) -> List[Dict[str, Any]]:
+    def default_books(self) -> List[Book]:
         # 4 obvious DEFAULT/SAMPLE placeholders
         return [
-            {"no": "D01", "title": "DEFAULT_SAMPLE_TITLE_1", "genre": "SAMPLE_GENRE", "author": "DEFAULT_AUTHOR_A", "price": "0.00", "year": "0000"},
-            {"no": "D02", "title": "DEFAULT_SAMPLE_TITLE_2", "genre": "SAMPLE_GENRE", "author": "DEFAULT_AUTHOR_B", "price": "0.00", "year": "0000"},
-            {"no": "D03", "title": "DEFAULT_SAMPLE_TITLE_3", "genre": "SAMPLE_GENRE", "author": "DEFAULT_AUTHOR_C", "price": "0.00", "year": "0000"},
-            {"no": "D04", "title": "DEFAULT_SAMPLE_TITLE_4", "genre": "SAMPLE_GENRE", "author": "DEFAULT_AUTHOR_D", "price": "0.00", "year": "0000"},
+            Book(no="D01", title="DEFAULT_SAMPLE_TITLE_1", genre="SAMPLE_GENRE", author="DEFAULT_AUTHOR_A", price="0.00", year="0000"),
+            Book(no="D02", title="DEFAULT_SAMPLE_TITLE_2", genre="SAMPLE_GENRE", author="DEFAULT_AUTHOR_B", price="0.00", year="0000"),
+            Book(no="D03", title="DEFAULT_SAMPLE_TITLE_3", genre="SAMPLE_GENRE", author="DEFAULT_AUTHOR_C", price="0.00", year="0000"),
+            Book(no="D04", title="DEFAULT_SAMPLE_TITLE_4", genre="SAMPLE_GENRE", author="DEFAULT_AUTHOR_D", price="0.00", year="0000"),
         ]
 
-    def restore_defaults(self) -> None:
-        self.save_books(self.default_books())
\ No newline at end of file
+    def restore_defaults(self) -> str:
+        """Replace everything with the sample books; returns the backup taken first."""
+        backup_used = self._backup_to_store(reason="restore_defaults")
+        # a replace, not a save: nothing from other processes should survive it
+        self._write_books_stream([self.default_books()])
+        return backup_used
@@ -0,0 +1,114 @@
+# tasks.py
+from __future__ import annotations
+
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+
+class TaskRunner:
+    """
+    Runs blocking work (storage I/O) off the Tk thread.
+
+    Work goes to a thread pool; finished futures are put on a queue that the
+    Tk mainloop drains with after(), so on_done / on_error always run on the
+    UI thread. Writes go through a single-worker pool to keep their order.
+
+    Tasks submitted on a channel carry that channel's generation number.
+    Submitting again (or calling invalidate) bumps it, and results from older
+    generations are dropped, so a slow load from an earlier keystroke can
+    never overwrite a newer one.
+    """
+
+    POLL_MS = 30
+
+    def __init__(self, root, max_workers: int = 4):
+        self.root = root
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="library-io")
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-write")
+        self._done: "queue.Queue[tuple]" = queue.Queue()
+        self._generations: Dict[str, int] = {}
+        self._running = 0
+        self._polling = False
+        self._busy_listeners: List[Callable[[bool], None]] = []
+
+    # ---------- submit ----------
+    def submit(
+        self,
+        fn: Callable[..., Any],
+        *args: Any,
+        on_done: Optional[Callable[[Any], None]] = None,
+        on_error: Optional[Callable[[BaseException], None]] = None,
+        channel: Optional[str] = None,
+        write: bool = False,
+    ) -> Future:
+        gen = None
+        if channel is not None:
+            gen = self.invalidate(channel)
+
+        pool = self._writer if write else self._pool
+        future = pool.submit(fn, *args)
+        future.add_done_callback(lambda f: self._done.put((f, channel, gen, on_done, on_error)))
+
+        self._running += 1
+        if self._running == 1:
+            self._notify_busy(True)
+        self._schedule_poll()
+        return future
+
+    def invalidate(self, channel: str) -> int:
+        """Mark everything already queued on channel as stale. Returns the new generation."""
+        gen = self._generations.get(channel, 0) + 1
+        self._generations[channel] = gen
+        return gen
+
+    @property
+    def busy(self) -> bool:
+        return self._running > 0
+
+    def on_busy_change(self, callback: Callable[[bool], None]) -> None:
+        self._busy_listeners.append(callback)
+
+    def shutdown(self) -> None:
+        # let queued writes finish, drop pending reads
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        self._writer.shutdown(wait=True)
+
+    # ---------- completion (Tk thread) ----------
+    def _schedule_poll(self) -> None:
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.POLL_MS, self._poll)
+
+    def _poll(self) -> None:
+        self._polling = False
+        while True:
+            try:
+                future, channel, gen, on_done, on_error = self._done.get_nowait()
+            except queue.Empty:
+                break
+
+            self._running -= 1
+            if channel is not None and gen != self._generations.get(channel):
+                continue  # superseded by a newer task on the same channel
+
+            try:
+                error = future.exception()
+                if error is not None:
+                    if on_error is None:
+                        raise error
+                    on_error(error)
+                elif on_done:
+                    on_done(future.result())
+            except Exception as e:
+                # same reporting Tk uses for a failing widget callback
+                self.root.report_callback_exception(type(e), e, e.__traceback__)
+
+        if self._running == 0:
+            self._notify_busy(False)
+        else:
+            self._schedule_poll()
+
+    def _notify_busy(self, busy: bool) -> None:
+        for callback in self._busy_listeners:
+            callback(busy)
@@ -0,0 +1,22 @@
+# tests/conftest.py
+import sys
+from pathlib import Path
+
+import pytest
+
+# the modules sit at the repo root (there is no package), as when running main.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench.generate import generate_books  # noqa: E402
+
+
+@pytest.fixture
+def books():
+    """A few thousand synthetic books (skewed genres and authors, like the benchmarks)."""
+    return list(generate_books(2000, seed=3))
+
+
+@pytest.fixture
+def other_books():
+    """A second, different set to draw edited values from."""
+    return list(generate_books(2000, seed=9))
@@ -0,0 +1,109 @@
+# tests/test_catalog.py
+import random
+
+import pytest
+
+from catalog import BookCatalog
+from models import Book
+from search_index import SearchIndex, search_text
+from sorting import sort_books
+
+QUERIES = ["", "the", "a", "sc", "e", "19", "an", "9", "tion", "golden orchard", "zzq", "1 "]
+
+SPECS = [
+    [("title", False)],
+    [("price", True)],
+    [("year", False)],
+    [("no", True)],
+    [("genre", False), ("author", False), ("year", True)],
+]
+
+
+def scan(catalog, query):
+    """What search() must return: a plain pass over the catalog."""
+    query = query.strip().lower()
+    return [b.no for b in catalog if query in search_text(b)]
+
+
+def nos(books):
+    return [b.no for b in books]
+
+
+def assert_agrees(catalog):
+    for q in QUERIES:
+        expected = scan(catalog, q)
+        assert nos(catalog.search(q)) == expected, q
+        assert nos(catalog.search(q, 7)) == expected[:7], q
+        assert sorted(catalog.search_index.matches(q.strip().lower())) == sorted(expected), q
+
+
+def edited(book, source, no=None):
+    values = dict(zip(("no", "title", "genre", "author", "price", "year"), source.values()))
+    values["no"] = no if no is not None else book.no
+    return Book.from_dict(values)
+
+
+def test_search_agrees_with_a_scan_through_edits(books, other_books):
+    rnd = random.Random(1)
+    catalog = BookCatalog(books)
+    assert_agrees(catalog)
+
+    for step in range(300):
+        live = nos(catalog)
+        r = rnd.random()
+        if r < 0.35:
+            catalog.upsert(edited(catalog.get(rnd.choice(live)), rnd.choice(other_books)))
+        elif r < 0.5:
+            catalog.delete(rnd.choice(live))
+        elif r < 0.65:
+            catalog.upsert(edited(rnd.choice(other_books), rnd.choice(other_books), no=f"new-{step}"))
+        elif r < 0.7:
+            # big enough for the one-pass batch path
+            ups = [edited(catalog.get(no), rnd.choice(other_books)) for no in rnd.sample(live, 150)]
+            ups += [edited(b, b, no=f"batch-{step}-{i}") for i, b in enumerate(rnd.sample(other_books, 100))]
+            catalog.apply(ups, rnd.sample(live, 60))
+        elif r < 0.73:
+            catalog.sort_by([("title", False)])
+        elif r < 0.75:
+            catalog.reorder(list(reversed(nos(catalog))))
+        if step % 25 == 0:
+            assert_agrees(catalog)
+
+    assert_agrees(catalog)
+
+
+def test_undone_delete_goes_back_in_place_and_is_found(books):
+    catalog = BookCatalog(books[:50])
+    book = catalog.get(books[10].no)
+    following = catalog.next_no(book.no)
+    catalog.delete(book.no)
+    catalog.insert_before([(book, following)])
+
+    assert nos(catalog) == nos(books[:50])
+    assert_agrees(catalog)
+
+
+@pytest.mark.parametrize("spec", SPECS)
+@pytest.mark.parametrize("query", ["", "the", "sc"])
+def test_sorted_view_matches_sort_books(books, other_books, spec, query):
+    catalog = BookCatalog(books)
+    catalog.sorted_view(spec)  # build the column index first, so the edits below maintain it
+    for i, no in enumerate(nos(books)[::7]):
+        catalog.upsert(edited(catalog.get(no), other_books[i]))
+    for no in nos(books)[1::11]:
+        catalog.delete(no)
+
+    assert nos(catalog.sorted_view(spec, query)) == nos(sort_books(catalog.search(query), spec))
+
+
+def test_search_index_renumbers_after_many_removals(books):
+    index = SearchIndex()
+    index.build(books)
+    removed = {b.no for b in books[::2]}
+    for no in removed:
+        index.remove(no)
+    kept = [b for b in books if b.no not in removed]
+
+    # compaction keeps the order records were added in
+    assert index.matches("") == nos(kept)
+    assert index.matches("the") == [b.no for b in kept if "the" in search_text(b)]
@@ -0,0 +1,89 @@
+# tests/test_history.py
+from catalog import BookCatalog
+from history import History, OrderChange, RecordChange
+from models import Book
+
+
+def book(no, title="t"):
+    return Book(no, title, "g", "a", "1", "2000")
+
+
+def state(catalog):
+    return [(b.no, b.title) for b in catalog]
+
+
+def apply(catalog, entry):
+    """What MainApp._apply_history does with a RecordChange, minus the saving."""
+    upserts, deletes, placed = entry.swap()
+    catalog.apply(upserts, deletes)
+    catalog.insert_before(placed)
+
+
+def edit(catalog):
+    """Edit 2, delete 3 and 5, add 9, recording each the way MainApp does."""
+    changes = [("2", catalog.get("2"), book("2", "two"), catalog.next_no("2"))]
+    catalog.upsert(book("2", "two"))
+    for no in ["3", "5"]:
+        changes.append((no, catalog.get(no), None, catalog.next_no(no)))
+        catalog.delete(no)
+    changes.append(("9", None, book("9", "nine"), None))
+    catalog.upsert(book("9", "nine"))
+    return RecordChange("Edit", changes)
+
+
+def test_record_change_undo_redo_round_trip():
+    catalog = BookCatalog([book(str(i), f"t{i}") for i in range(1, 6)])
+    before = state(catalog)
+    entry = edit(catalog)
+    after = state(catalog)
+
+    apply(catalog, entry)
+    assert state(catalog) == before  # deletes come back in their old slots
+
+    apply(catalog, entry)
+    assert state(catalog) == after
+
+    apply(catalog, entry)
+    assert state(catalog) == before
+
+
+def test_order_change_swaps_back_and_forth():
+    catalog = BookCatalog([book(n) for n in "31524"])
+    entry = OrderChange("Sort", [b.no for b in catalog])
+    catalog.sort_by([("no", False)])
+
+    catalog.reorder(entry.swap([b.no for b in catalog]))
+    assert [b.no for b in catalog] == list("31524")
+    catalog.reorder(entry.swap([b.no for b in catalog]))
+    assert [b.no for b in catalog] == list("12345")
+
+
+def test_history_stacks():
+    history = History()
+    a, b, c = (OrderChange(label, []) for label in "abc")
+    history.record(a)
+    history.record(b)
+
+    assert history.undo() is b
+    assert history.undo() is a
+    assert history.undo() is None
+    assert history.redo() is a
+    assert (history.undo_label, history.redo_label) == ("a", "b")
+
+    # a new change drops whatever could still be redone
+    history.record(c)
+    assert history.redo() is None
+    assert history.undo() is c
+
+
+def test_history_drops_the_oldest_entries_over_its_cap():
+    first = OrderChange("first", ["x"] * 100)
+    history = History(limit_bytes=first.size * 2)
+    history.record(first)
+    history.record(OrderChange("second", ["x"] * 100))
+    history.record(OrderChange("third", ["x"] * 100))
+
+    assert history.size <= history.limit_bytes
+    assert history.undo().label == "third"
+    assert history.undo().label == "second"
+    assert history.undo() is None
@@ -0,0 +1,106 @@
+# tests/test_storage.py
+import csv
+
+import pytest
+
+from journal_storage import JournaledBookStorage
+from models import FIELDS, Book
+from storage import BookStorage, apply_edits, merge_books
+
+
+def book(no, title="t", price="1"):
+    return Book(no, title, "g", "a", price, "2000")
+
+
+def rows(books):
+    return [b.values() for b in books]
+
+
+def write_csv(path, books):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(FIELDS)
+        w.writerows(rows(books))
+    return path
+
+
+# ---------- merge ----------
+CURRENT = [book("1", "one"), book("2", "two"), book("3", "three")]
+INCOMING = [book("2", "two"), book("3", "THREE"), book("4", "four")]
+
+
+@pytest.mark.parametrize(
+    "policy, delete_missing, expected, counts",
+    [
+        ("upsert", False, ["one", "two", "THREE", "four"], (1, 1, 1, 0, 0)),
+        ("insert", False, ["one", "two", "three", "four"], (1, 0, 1, 1, 0)),
+        ("update", False, ["one", "two", "THREE"], (0, 1, 1, 1, 0)),
+        ("upsert", True, ["two", "THREE", "four"], (1, 1, 1, 0, 1)),
+    ],
+)
+def test_merge_csv_then_restore_round_trip(tmp_path, policy, delete_missing, expected, counts):
+    storage = BookStorage(tmp_path / "books.json", binary_snapshot=False)
+    storage.save_books(CURRENT)
+
+    summary = storage.merge_csv(write_csv(tmp_path / "in.csv", INCOMING), policy, delete_missing)
+
+    assert [b.title for b in storage.load_books()] == expected
+    assert summary[:5] == counts
+
+    # the backup merge_csv took brings back exactly what was there
+    storage.restore_backup(summary.backup)
+    assert rows(storage.load_books()) == rows(CURRENT)
+
+
+def test_merge_csv_rejects_unknown_policy(tmp_path):
+    storage = BookStorage(tmp_path / "books.json", binary_snapshot=False)
+    with pytest.raises(ValueError):
+        storage.merge_csv(write_csv(tmp_path / "in.csv", INCOMING), "replace")
+
+
+def test_merge_books_three_way():
+    base = [book("1", "one"), book("2", "two"), book("3", "three"), book("4", "four")]
+    ours = [book("1", "ONE"), book("2", "two"), book("4", "four"), book("5", "ours")]
+    theirs = [book("1", "uno"), book("2", "dos"), book("3", "tres"), book("6", "theirs")]
+
+    merged = merge_books(base, ours, theirs)
+
+    # both edited 1: ours; only they edited 2: theirs; we deleted 3, they edited it: their edit;
+    # they deleted 4 we left alone: gone; each side's new record stays
+    assert [(b.no, b.title) for b in merged] == [("1", "ONE"), ("2", "dos"), ("5", "ours"), ("3", "tres"), ("6", "theirs")]
+
+
+# ---------- journal ----------
+def test_journal_round_trip(tmp_path, books, other_books):
+    path = tmp_path / "books.json"
+    storage = JournaledBookStorage(path, compact_threshold=1 << 30)
+    storage.save_books(books)
+
+    upserts = [Book.from_dict({**o.to_dict(), "no": b.no}) for b, o in zip(books[::5], other_books)]
+    upserts.append(book("new-1"))
+    deletes = [b.no for b in books[1::9]]
+    storage.apply_changes(None, upserts[:10], deletes[:5])
+    with storage.batch() as tx:
+        for b in upserts[10:]:
+            tx.upsert(b)
+        for no in deletes[5:]:
+            tx.delete(no)
+    expected = rows(apply_edits(books, upserts, deletes))
+
+    # another process replays the journal over the snapshot
+    assert rows(JournaledBookStorage(path).load_books()) == expected
+
+    storage.compact()
+    assert not storage.journal_path.exists() or storage.journal_path.stat().st_size == 0
+    assert rows(JournaledBookStorage(path).load_books()) == expected
+
+
+def test_journal_ignores_a_torn_last_line(tmp_path):
+    path = tmp_path / "books.json"
+    storage = JournaledBookStorage(path, compact_threshold=1 << 30)
+    storage.save_books([book("1")])
+    storage.apply_changes(None, [book("2")])
+    with storage.journal_path.open("a", encoding="utf-8") as f:
+        f.write('{"op": "upsert", "book": {"no": "3"')  # crashed mid-append
+
+    assert [b.no for b in JournaledBookStorage(path).load_books()] == ["1", "2"]
@@ -0,0 +1,37 @@
+# timing.py
+from __future__ import annotations
+
+import json
+import sys
+import time
+from typing import Any, Dict, Optional
+
+
+class StartupReport:
+    """
+    Cold-start milestones, in milliseconds since `started`.
+
+    main.py passes the perf_counter() taken before importing the app, so
+    the report covers imports too. write() emits one JSON object: to stderr
+    for target "stderr", otherwise appended as a line to the file at target
+    (so successive runs can be compared against the budget).
+    """
+
+    def __init__(self, started: Optional[float] = None):
+        self.started = time.perf_counter() if started is None else started
+        self.marks: Dict[str, float] = {}
+        self.info: Dict[str, Any] = {}
+
+    def mark(self, name: str) -> None:
+        self.marks[name] = round((time.perf_counter() - self.started) * 1000.0, 1)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"at": time.strftime("%Y-%m-%dT%H:%M:%S"), "marks_ms": dict(self.marks), **self.info}
+
+    def write(self, target: str) -> None:
+        line = json.dumps(self.as_dict())
+        if target == "stderr":
+            print(line, file=sys.stderr)
+            return
+        with open(target, "a", encoding="utf-8") as f:
+            f.write(line + "\n")